@@ -5,3 +5,19 @@ from django.apps import AppConfig
 class ApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'api'
+
+    def ready(self):
+        from django.db.models.signals import post_delete, post_save, pre_delete
+        from .models import Book
+        from . import catalog_snapshot, fuzzy_index, response_cache, search_index, suggest, tags
+        post_save.connect(search_index.book_saved, sender=Book, dispatch_uid='search_index_book_saved')
+        post_delete.connect(search_index.book_deleted, sender=Book, dispatch_uid='search_index_book_deleted')
+        post_save.connect(fuzzy_index.book_saved, sender=Book, dispatch_uid='fuzzy_index_book_saved')
+        post_delete.connect(fuzzy_index.book_deleted, sender=Book, dispatch_uid='fuzzy_index_book_deleted')
+        post_save.connect(suggest.book_saved, sender=Book, dispatch_uid='suggest_book_saved')
+        post_delete.connect(suggest.book_deleted, sender=Book, dispatch_uid='suggest_book_deleted')
+        post_save.connect(response_cache.book_changed, sender=Book, dispatch_uid='response_cache_book_saved')
+        post_delete.connect(response_cache.book_changed, sender=Book, dispatch_uid='response_cache_book_deleted')
+        post_save.connect(catalog_snapshot.book_changed, sender=Book, dispatch_uid='catalog_snapshot_book_saved')
+        post_delete.connect(catalog_snapshot.book_changed, sender=Book, dispatch_uid='catalog_snapshot_book_deleted')
+        pre_delete.connect(tags.book_deleting, sender=Book, dispatch_uid='tags_book_deleting')
@@ -0,0 +1,82 @@
+"""
+Background jobs
+
+Work that should not hold up a request (splitting or optimizing uploaded
+PDFs, resizing covers...) goes through enqueue(). BACKGROUND_TASKS picks
+where it runs:
+
+- 'thread' (default): on a background thread of this process, after the
+  response. A serverless instance may be frozen or stopped before the job
+  ran; `manage.py process_pending_books` catches up on those books.
+- 'celery': on a Celery worker; a job the broker refuses runs on a thread.
+- 'inline': in the request, right after its transaction commits. Explicit
+  opt-in only: the response waits for the job, slow for large PDFs.
+"""
+
+import queue
+import logging
+import threading
+from django.conf import settings
+from django.db import connection, transaction
+
+logger = logging.getLogger(__name__)
+
+# In-process jobs run one at a time on a single worker thread, so they
+# neither compete with requests for CPU nor contend for SQLite locks
+_jobs = queue.Queue()
+_worker = None
+_worker_lock = threading.Lock()
+
+
+def _work():
+    while True:
+        func, args = _jobs.get()
+        try:
+            func(*args)
+        except Exception as e:
+            logger.error(f"Background job {func.__name__} failed: {e}")
+        finally:
+            connection.close()
+            _jobs.task_done()
+
+
+def _run_in_thread(func, args):
+    global _worker
+    with _worker_lock:
+        if _worker is None or not _worker.is_alive():
+            _worker = threading.Thread(target=_work, name='background-jobs', daemon=True)
+            _worker.start()
+    _jobs.put((func, args))
+
+
+def _run_inline(func, args):
+    try:
+        func(*args)
+    except Exception as e:
+        # The request itself succeeded; the job can be rerun by its management command
+        logger.error(f"Background job {func.__name__} failed: {e}")
+
+
+def enqueue(task_name, *args):
+    """
+    Run api.tasks.<task_name>(*args) once the current transaction (if any)
+    has committed: off the request path, unless BACKGROUND_TASKS = 'inline'.
+    Arguments must be JSON serializable.
+    """
+    from . import tasks
+    task = getattr(tasks, task_name)
+
+    def submit():
+        mode = getattr(settings, 'BACKGROUND_TASKS', 'thread')
+        if mode == 'inline':
+            _run_inline(task, args)
+            return
+        if mode == 'celery':
+            try:
+                task.apply_async(args=args, retry=False)
+                return
+            except Exception as e:
+                logger.warning(f"Could not queue {task_name} on Celery, running it in-process: {e}")
+        _run_in_thread(task, args)
+
+    transaction.on_commit(submit)
@@ -0,0 +1,110 @@
+"""
+Filesystem blob store for DatabaseStorage payloads
+
+Payloads are written under a local directory (which may also be a mounted
+object-store bucket) at content-addressed paths, while names, sizes and
+checksums stay in the database. Identical content always lands on the
+same path, so deduplicated manifests share one file.
+"""
+
+import os
+import hashlib
+import tempfile
+import threading
+from django.conf import settings
+
+LOCATION_DB = 'db'
+LOCATION_FS = 'fs'
+
+TEMP_DIR = '.tmp'
+
+
+class FileSystemBlobStore:
+    def __init__(self, location):
+        self.location = location
+        os.makedirs(os.path.join(location, TEMP_DIR), exist_ok=True)
+
+    @staticmethod
+    def path_for(checksum):
+        return f'{checksum[:2]}/{checksum[2:4]}/{checksum}'
+
+    def full_path(self, path):
+        return os.path.join(self.location, *path.split('/'))
+
+    def open(self, path):
+        return open(self.full_path(path), 'rb')
+
+    def exists(self, path):
+        return os.path.exists(self.full_path(path))
+
+    def write(self, chunks, suffix=''):
+        """
+        Write an iterable of byte chunks to the store.
+        The path is derived from the SHA-256 of the written bytes plus `suffix`.
+        Returns (path, size).
+        """
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.join(self.location, TEMP_DIR))
+        digest = hashlib.sha256()
+        size = 0
+        try:
+            with os.fdopen(fd, 'wb') as tmp:
+                for chunk in chunks:
+                    digest.update(chunk)
+                    size += len(chunk)
+                    tmp.write(chunk)
+                tmp.flush()
+                os.fsync(tmp.fileno())
+            path = self.path_for(digest.hexdigest()) + suffix
+            os.makedirs(os.path.dirname(self.full_path(path)), exist_ok=True)
+            os.replace(tmp_path, self.full_path(path))
+        except BaseException:
+            try:
+                os.unlink(tmp_path)
+            except FileNotFoundError:
+                pass
+            raise
+        return path, size
+
+    def iter_chunks(self, path, block_size=1024 * 1024):
+        with self.open(path) as f:
+            yield from iter(lambda: f.read(block_size), b'')
+
+    def iter_paths(self, older_than):
+        """Yield the paths of stored files (temporary ones included) last modified before `older_than`"""
+        for directory, _, files in os.walk(self.location):
+            relative = os.path.relpath(directory, self.location)
+            for file_name in files:
+                full_path = os.path.join(directory, file_name)
+                try:
+                    if os.path.getmtime(full_path) >= older_than:
+                        continue
+                except FileNotFoundError:
+                    continue
+                yield file_name if relative == '.' else f"{relative.replace(os.sep, '/')}/{file_name}"
+
+    def delete(self, path):
+        try:
+            os.unlink(self.full_path(path))
+        except FileNotFoundError:
+            pass
+
+
+_blob_store = None
+_blob_store_lock = threading.Lock()
+
+
+def get_blob_store():
+    """Return the configured FileSystemBlobStore, or None when it is disabled"""
+    global _blob_store
+    config = getattr(settings, 'DATABASE_STORAGE_BLOB_STORE', None) or {}
+    if not config.get('LOCATION'):
+        return None
+    with _blob_store_lock:
+        if _blob_store is None:
+            _blob_store = FileSystemBlobStore(config['LOCATION'])
+    return _blob_store
+
+
+def get_blob_store_prefixes():
+    config = getattr(settings, 'DATABASE_STORAGE_BLOB_STORE', None) or {}
+    return tuple(config.get('PREFIXES', ()))
@@ -0,0 +1,209 @@
+"""
+In-book content search
+
+After upload the text of every page of a book's PDF is extracted with
+PyPDF2 off the request path and stored as:
+
+- one BookPageText row per page, zlib-compressed, used for snippets;
+- one BookContentPosting row per (stemmed term, book), holding the pages
+  the term occurs on and how often as packed integer arrays.
+
+A query looks up its terms' postings (one indexed query), keeps the pages
+containing every term, ranks them with BM25-style term weights and reads
+the text of the best pages only.
+"""
+
+import re
+import sys
+import math
+import zlib
+import logging
+from array import array
+from collections import Counter, defaultdict
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from PyPDF2 import PdfReader
+from .models import Book, BookContentPosting, BookPageText
+from .search_index import tokenize
+
+logger = logging.getLogger(__name__)
+
+MAX_TERM_LENGTH = 64
+MAX_RESULTS = 50
+SNIPPET_RADIUS = 80
+BATCH_SIZE = 1000
+K1 = 1.2
+
+_WHITESPACE_RE = re.compile(r'\s+')
+
+
+def pack(values, typecode):
+    packed = array(typecode, values)
+    if sys.byteorder == 'big':
+        packed.byteswap()
+    return packed.tobytes()
+
+
+def unpack(data, typecode):
+    values = array(typecode)
+    values.frombytes(bytes(data))
+    if sys.byteorder == 'big':
+        values.byteswap()
+    return values
+
+
+def compress_text(text):
+    return zlib.compress(text.encode('utf-8'), 6)
+
+
+def decompress_text(data):
+    return zlib.decompress(bytes(data)).decode('utf-8')
+
+
+def source_pdf_name(book):
+    """The PDF as uploaded: text does not change when the served copy is optimized"""
+    return book.original_pdf_file.name or book.pdf_file.name
+
+
+def delete_book_text(book_id):
+    BookContentPosting.objects.filter(book_id=book_id).delete()
+    BookPageText.objects.filter(book_id=book_id).delete()
+    Book.objects.filter(pk=book_id).update(content_indexed_at=None)
+
+
+def extract_book_text(book_id, force=False):
+    """
+    Extract and index the text of a book's PDF, replacing what was there.
+    Returns the page count, or None if nothing was done (book gone, already
+    indexed, or its PDF replaced meanwhile).
+    """
+    book = Book.objects.filter(pk=book_id).only('id', 'pdf_file', 'original_pdf_file', 'content_indexed_at').first()
+    if book is None or not book.pdf_file or (book.content_indexed_at and not force):
+        return None
+    source_name = source_pdf_name(book)
+
+    page_texts = []
+    postings = defaultdict(lambda: (array('I'), array('H')))
+    with default_storage.open(source_name) as pdf:
+        reader = PdfReader(pdf)
+        for number, page in enumerate(reader.pages, start=1):
+            try:
+                text = _WHITESPACE_RE.sub(' ', page.extract_text() or '').strip()
+            except Exception as e:
+                logger.warning(f"Could not extract text of page {number} of book {book_id}: {e}")
+                text = ''
+            page_texts.append(BookPageText(book_id=book_id, page=number, text=compress_text(text)))
+            for term, count in Counter(tokenize(text)).items():
+                pages, counts = postings[term[:MAX_TERM_LENGTH]]
+                pages.append(number)
+                counts.append(min(count, 0xFFFF))
+    page_count = len(page_texts)
+
+    with transaction.atomic():
+        current = Book.objects.select_for_update().filter(pk=book_id).only('pdf_file', 'original_pdf_file').first()
+        if current is None or source_pdf_name(current) != source_name:
+            logger.info(f"PDF of book {book_id} changed while extracting text; discarded it")
+            return None
+        BookContentPosting.objects.filter(book_id=book_id).delete()
+        BookPageText.objects.filter(book_id=book_id).delete()
+        BookPageText.objects.bulk_create(page_texts, batch_size=BATCH_SIZE)
+        BookContentPosting.objects.bulk_create((
+            BookContentPosting(book_id=book_id, term=term, pages=pack(pages, 'I'), counts=pack(counts, 'H'))
+            for term, (pages, counts) in postings.items()
+        ), batch_size=BATCH_SIZE)
+        Book.objects.filter(pk=book_id).update(content_indexed_at=timezone.now())
+    return page_count
+
+
+def make_snippet(text, words):
+    """About 2 * SNIPPET_RADIUS characters of `text` around the first query word found"""
+    start = 0
+    for word in words:
+        match = re.search(rf'\b{re.escape(word)}', text, re.IGNORECASE)
+        if match:
+            start = match.start()
+            break
+    first = max(0, start - SNIPPET_RADIUS)
+    last = min(len(text), start + SNIPPET_RADIUS)
+    # Do not cut words in half
+    if first > 0:
+        space = text.find(' ', first)
+        first = space + 1 if 0 <= space < start else first
+    if last < len(text):
+        space = text.rfind(' ', start, last)
+        last = space if space > start else last
+    return ('…' if first > 0 else '') + text[first:last] + ('…' if last < len(text) else '')
+
+
+def search_book_content(query, limit=20, book_id=None, books=None):
+    """
+    Best pages containing every query word:
+    [{'book_id', 'page', 'score', 'snippet'}], best first. With `books` (a
+    Book queryset), only pages of those books are ranked and returned.
+    """
+    terms = list(dict.fromkeys(term[:MAX_TERM_LENGTH] for term in tokenize(query)))
+    if not terms:
+        return []
+    rows = BookContentPosting.objects.filter(term__in=terms)
+    if book_id:
+        rows = rows.filter(book_id=book_id)
+
+    by_book = defaultdict(dict)
+    doc_freqs = Counter()
+    for term, row_book_id, pages, counts in rows.values_list('term', 'book_id', 'pages', 'counts').iterator():
+        by_book[row_book_id][term] = (unpack(pages, 'I'), unpack(counts, 'H'))
+        doc_freqs[term] += 1
+    if len(doc_freqs) < len(terms):
+        return []
+    if books is not None and by_book:
+        # Before ranking, so excluded books cannot crowd out the others
+        allowed = set(books.filter(pk__in=list(by_book)).values_list('pk', flat=True))
+        by_book = {row_book_id: book_terms for row_book_id, book_terms in by_book.items() if row_book_id in allowed}
+
+    # Term weights over indexed books, as BM25 idf
+    indexed = Book.objects.filter(content_indexed_at__isnull=False).count() or 1
+    idf = {term: math.log(1 + (indexed - freq + 0.5) / (freq + 0.5)) for term, freq in doc_freqs.items()}
+
+    scored = []
+    for row_book_id, book_terms in by_book.items():
+        if len(book_terms) < len(terms):
+            continue
+        page_scores = None
+        for term in sorted(book_terms, key=lambda t: len(book_terms[t][0])):
+            pages, counts = book_terms[term]
+            term_scores = {
+                page: idf[term] * count * (K1 + 1) / (count + K1) for page, count in zip(pages, counts)
+            }
+            if page_scores is None:
+                page_scores = term_scores
+            else:
+                page_scores = {page: score + term_scores[page] for page, score in page_scores.items() if page in term_scores}
+            if not page_scores:
+                break
+        for page, score in (page_scores or {}).items():
+            scored.append((score, row_book_id, page))
+
+    scored.sort(key=lambda item: (-item[0], item[1], item[2]))
+    scored = scored[:max(1, min(limit, MAX_RESULTS))]
+    if not scored:
+        return []
+
+    condition = Q()
+    for _, row_book_id, page in scored:
+        condition |= Q(book_id=row_book_id, page=page)
+    texts = {
+        (row_book_id, page): decompress_text(text)
+        for row_book_id, page, text in BookPageText.objects.filter(condition).values_list('book_id', 'page', 'text')
+    }
+    words = re.findall(r'\w+', query) + terms
+    return [
+        {
+            'book_id': row_book_id,
+            'page': page,
+            'score': round(score, 4),
+            'snippet': make_snippet(texts.get((row_book_id, page), ''), words),
+        }
+        for score, row_book_id, page in scored
+    ]
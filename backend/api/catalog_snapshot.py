@@ -0,0 +1,101 @@
+"""
+Catalog snapshot
+
+books/snapshot/ serves the whole catalog in one response, for clients that
+filter and sort locally: one JSON object of parallel columns (every book's
+id in `id`, its title at the same position in `title`...), so field names
+are not repeated per book, gzip-compressed ahead of time.
+
+Each worker keeps the encoded snapshot in memory (api/index_holder.py) and
+serves it with a strong ETag, the SHA-256 of the JSON. It is rebuilt in the
+background after a book changes in this worker, and when the catalog
+version of api/response_cache.py shows a change made elsewhere; requests
+meanwhile get the previous snapshot.
+"""
+
+import gzip
+import json
+import hashlib
+from django.core.files.storage import default_storage
+from django.db import transaction
+from .index_holder import IndexHolder
+from .response_cache import get_catalog_version
+
+# Snapshot format, bumped when columns change meaning
+FORMAT_VERSION = 1
+
+COLUMNS = (
+    'id', 'title', 'author', 'department', 'semester', 'isPremium', 'featured', 'price',
+    'coverThumbnailUrl', 'uploadedAt',
+)
+
+
+class CatalogSnapshot:
+    __slots__ = ('catalog_version', 'count', 'body', 'gzipped', 'digest')
+
+    def __init__(self, catalog_version, count, body):
+        self.catalog_version = catalog_version
+        self.count = count
+        self.body = body
+        # mtime=0 so the same catalog always compresses to the same bytes
+        self.gzipped = gzip.compress(body, compresslevel=9, mtime=0)
+        self.digest = hashlib.sha256(body).hexdigest()
+
+
+def thumbnail_name(cover_image, cover_variants):
+    """Stored name of the smallest cover variant (WebP first), else the cover itself"""
+    for variant_format in ('webp', 'jpeg'):
+        sizes = [variant for variant in cover_variants or () if variant['format'] == variant_format]
+        if sizes:
+            return min(sizes, key=lambda variant: variant['width'])['name']
+    return cover_image or None
+
+
+def build_snapshot():
+    """Encode every book, newest first"""
+    from .models import Book
+    # Read before the books: a change committed meanwhile shows as a newer version
+    catalog_version = get_catalog_version()
+    columns = {name: [] for name in COLUMNS}
+    rows = Book.objects.order_by('-uploaded_at').values_list(
+        'id', 'title', 'author', 'department', 'semester', 'is_premium', 'featured', 'price',
+        'cover_image', 'cover_variants', 'uploaded_at'
+    )
+    for (book_id, title, author, department, semester, is_premium, featured, price,
+         cover_image, cover_variants, uploaded_at) in rows.iterator(chunk_size=2000):
+        thumbnail = thumbnail_name(cover_image, cover_variants)
+        columns['id'].append(book_id)
+        columns['title'].append(title)
+        columns['author'].append(author)
+        columns['department'].append(department)
+        columns['semester'].append(semester)
+        columns['isPremium'].append(is_premium)
+        columns['featured'].append(featured)
+        columns['price'].append(float(price) if price is not None else None)
+        # Site-relative: resolve against the snapshot URL
+        columns['coverThumbnailUrl'].append(default_storage.url(thumbnail) if thumbnail else None)
+        columns['uploadedAt'].append(int(uploaded_at.timestamp()))
+    count = len(columns['id'])
+    body = json.dumps(
+        {'format': FORMAT_VERSION, 'count': count, 'columns': columns},
+        ensure_ascii=False, separators=(',', ':')
+    ).encode('utf-8')
+    return CatalogSnapshot(catalog_version, count, body)
+
+
+_holder = IndexHolder('catalog-snapshot', build_snapshot, 'CATALOG_SNAPSHOT_MAX_AGE')
+
+
+def get_catalog_snapshot():
+    snapshot = _holder.get()
+    if snapshot.catalog_version != get_catalog_version():
+        # Changed through another worker (or a background task)
+        _holder.refresh()
+    return snapshot
+
+
+# Signal receiver, connected in ApiConfig.ready()
+
+def book_changed(sender, **kwargs):
+    if _holder.loaded:
+        transaction.on_commit(_holder.refresh)
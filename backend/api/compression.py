@@ -0,0 +1,171 @@
+"""
+Compression codecs for DatabaseStorage payloads
+
+Payloads can be stored as a single zlib or lzma stream (stdlib only). The
+codec is recorded on the manifest, so rows written with different settings
+can be read side by side. A zlib stream is exactly the HTTP 'deflate'
+content coding, so it can be sent to clients without recompressing.
+"""
+
+import io
+import lzma
+import zlib
+
+CODEC_NONE = ''
+CODEC_ZLIB = 'zlib'
+CODEC_LZMA = 'lzma'
+
+CODECS = (CODEC_ZLIB, CODEC_LZMA)
+
+# HTTP Content-Encoding that can carry each codec's stream unchanged
+HTTP_ENCODINGS = {CODEC_ZLIB: 'deflate'}
+
+# Store raw when compressing the first chunk saves less than this
+MIN_SAVINGS = 0.05
+
+# Upper bound on bytes produced per decompress() call
+DECODE_BLOCK_SIZE = 256 * 1024
+
+
+def compressor(codec):
+    if codec == CODEC_ZLIB:
+        return zlib.compressobj(6)
+    if codec == CODEC_LZMA:
+        return lzma.LZMACompressor(preset=6)
+    raise ValueError(f"Unknown codec {codec!r}")
+
+
+def decompressor(codec):
+    if codec == CODEC_ZLIB:
+        return zlib.decompressobj()
+    if codec == CODEC_LZMA:
+        return lzma.LZMADecompressor()
+    raise ValueError(f"Unknown codec {codec!r}")
+
+
+def worth_compressing(codec, sample):
+    """Compress a sample of the content to see if the codec pays off (e.g. not for JPEGs)"""
+    if not codec or not sample:
+        return False
+    encoder = compressor(codec)
+    compressed = len(encoder.compress(sample)) + len(encoder.flush())
+    return compressed < len(sample) * (1 - MIN_SAVINGS)
+
+
+def encode_chunks(chunks, codec):
+    """Yield the compressed stream for an iterable of byte chunks"""
+    if not codec:
+        yield from chunks
+        return
+    encoder = compressor(codec)
+    for chunk in chunks:
+        data = encoder.compress(chunk)
+        if data:
+            yield data
+    data = encoder.flush()
+    if data:
+        yield data
+
+
+def decode_chunks(chunks, codec):
+    """Yield the decompressed stream for an iterable of compressed chunks"""
+    if not codec:
+        yield from chunks
+        return
+    decoder = DecodingReader(_ChunkStream(chunks), codec)
+    yield from iter(lambda: decoder.read(DECODE_BLOCK_SIZE), b'')
+
+
+class _ChunkStream(io.RawIOBase):
+    """Minimal readable file over an iterable of byte chunks"""
+
+    def __init__(self, chunks):
+        super().__init__()
+        self._chunks = iter(chunks)
+        self._pending = b''
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while not self._pending:
+            self._pending = next(self._chunks, None)
+            if self._pending is None:
+                self._pending = b''
+                return 0
+        count = min(len(buffer), len(self._pending))
+        buffer[:count] = self._pending[:count]
+        self._pending = self._pending[count:]
+        return count
+
+
+class DecodingReader(io.RawIOBase):
+    """
+    Seekable read-only view of the decompressed content of a stored stream.
+
+    Reads decompress incrementally with a bounded output size, so memory
+    stays at a block or two. Seeking forward decodes and discards; seeking
+    backward restarts from the beginning of the stored stream. Reading a
+    span therefore costs decoding everything before it, which is why content
+    served by range is stored uncompressed (storage.RANGE_SERVED_TYPES).
+    """
+
+    def __init__(self, stored, codec, size=None):
+        super().__init__()
+        self.stored = stored
+        self.codec = codec
+        self.size = size
+        self.chunk_size = getattr(stored, 'chunk_size', DECODE_BLOCK_SIZE)
+        self._restart()
+
+    def _restart(self):
+        if self.stored.seekable():
+            self.stored.seek(0)
+        self._decoder = decompressor(self.codec)
+        self._pos = 0
+        self._pending = b''
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return self.stored.seekable()
+
+    def tell(self):
+        return self._pos
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self._pos
+        elif whence == io.SEEK_END:
+            offset += self.size
+        if offset < self._pos:
+            self._restart()
+        while self._pos < offset:
+            if not self.read(min(offset - self._pos, DECODE_BLOCK_SIZE)):
+                break
+        return self._pos
+
+    def _decode_more(self):
+        if self._decoder.eof:
+            return b''
+        # Drain buffered input before feeding more stored bytes
+        source = self._decoder.unconsumed_tail if self.codec == CODEC_ZLIB else b''
+        while True:
+            if not source and not (self.codec == CODEC_LZMA and not self._decoder.needs_input):
+                source = self.stored.read(DECODE_BLOCK_SIZE)
+                if not source:
+                    return b''
+            data = self._decoder.decompress(source, max_length=DECODE_BLOCK_SIZE)
+            source = self._decoder.unconsumed_tail if self.codec == CODEC_ZLIB else b''
+            if data or self._decoder.eof:
+                return data
+
+    def readinto(self, buffer):
+        if not self._pending:
+            self._pending = self._decode_more()
+        count = min(len(buffer), len(self._pending))
+        buffer[:count] = self._pending[:count]
+        self._pending = self._pending[count:]
+        self._pos += count
+        return count
@@ -0,0 +1,117 @@
+"""
+Cover image variants
+
+Each cover is resized to COVER_VARIANT_WIDTHS in WebP and JPEG and stored
+next to the original, so list pages can load thumbnails through srcset
+instead of the full upload. The source is decoded once: for JPEGs Pillow's
+draft mode lets the decoder scale down to the largest width needed while
+decoding, and every smaller width is resized from the previous one.
+"""
+
+import io
+import os
+import logging
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.utils import timezone
+from PIL import Image, ImageOps
+from .models import Book
+from .storage import unhashed_name
+from .response_cache import invalidate_catalog
+
+logger = logging.getLogger(__name__)
+
+# format -> (Pillow format, extension, save options)
+VARIANT_FORMATS = {
+    'webp': ('WEBP', 'webp', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', 'jpg', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+
+def get_cover_widths():
+    return sorted(getattr(settings, 'COVER_VARIANT_WIDTHS', [160, 320, 640]))
+
+
+def render_cover_variants(source, widths):
+    """
+    Yield (width, format, bytes) for each requested width no wider than the
+    source (or just the source width for small covers), largest first.
+    """
+    image = Image.open(source)
+    widths = [width for width in widths if width < image.width] or [image.width]
+    largest = max(widths)
+    # JPEG only: decode at a reduced scale (1/2, 1/4, 1/8) that still covers `largest`
+    image.draft('RGB', (largest, max(1, image.height * largest // image.width)))
+    image = ImageOps.exif_transpose(image)
+    if image.mode != 'RGB':
+        background = Image.new('RGB', image.size, 'white')
+        image = image.convert('RGBA')
+        background.paste(image, mask=image.getchannel('A'))
+        image = background
+
+    for width in sorted(widths, reverse=True):
+        if width != image.width:
+            image = image.resize((width, max(1, round(image.height * width / image.width))), Image.LANCZOS)
+        for variant_format, (pil_format, _, options) in VARIANT_FORMATS.items():
+            buffer = io.BytesIO()
+            image.save(buffer, pil_format, **options)
+            yield width, variant_format, buffer.getvalue()
+
+
+def delete_cover_variants(variants):
+    for variant in variants or []:
+        default_storage.delete(variant['name'])
+
+
+def generate_cover_variants(book_id, force=False):
+    """
+    Create the resized covers of a book, replacing existing ones.
+    Returns the number of variants, or None if nothing was done.
+    """
+    book = Book.objects.filter(pk=book_id).only('id', 'cover_image', 'cover_variants').first()
+    if book is None or not book.cover_image or (book.cover_variants and not force):
+        return None
+    source_name = book.cover_image.name
+    base = os.path.splitext(unhashed_name(source_name))[0]
+
+    variants = []
+    try:
+        with default_storage.open(source_name) as source:
+            for width, variant_format, data in render_cover_variants(source, get_cover_widths()):
+                extension = VARIANT_FORMATS[variant_format][1]
+                name = default_storage.save(f'{base}.w{width}.{extension}', ContentFile(data))
+                variants.append({'width': width, 'format': variant_format, 'name': name})
+    except Exception:
+        delete_cover_variants(variants)
+        raise
+
+    with transaction.atomic():
+        current = Book.objects.select_for_update().filter(pk=book_id).values_list('cover_image', 'cover_variants').first()
+        stale = current is None or current[0] != source_name
+        if not stale:
+            previous = current[1]
+            Book.objects.filter(pk=book_id).update(
+                cover_variants=sorted(variants, key=lambda v: (v['format'], v['width'])),
+                updated_at=timezone.now()
+            )
+            invalidate_catalog()
+
+    if stale:
+        logger.info(f"Cover of book {book_id} changed while resizing; discarded variants")
+        delete_cover_variants(variants)
+        return None
+    delete_cover_variants(previous)
+    return len(variants)
+
+
+def cover_srcset(request, book):
+    """{'webp': 'url 160w, ...', 'jpeg': ...} for a book's cover variants, or None"""
+    if not book.cover_variants:
+        return None
+    srcset = {}
+    for variant in book.cover_variants:
+        url = request.build_absolute_uri(default_storage.url(variant['name']))
+        srcset.setdefault(variant['format'], []).append(f"{url} {variant['width']}w")
+    return {variant_format: ', '.join(entries) for variant_format, entries in srcset.items()}
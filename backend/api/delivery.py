@@ -0,0 +1,87 @@
+"""
+Signed media URLs and proxy offload
+
+A signed URL carries what is needed to find a file on local disk (name,
+checksum, blob store path, content type) under an HMAC signature, so it is
+validated without a database query. When the bytes are in the local file
+cache or the blob store, the response is handed to the front proxy with
+X-Accel-Redirect or X-Sendfile and the worker is released immediately.
+"""
+
+import os
+from django.conf import settings
+from django.core import signing
+from django.urls import reverse
+from .blob_store import LOCATION_FS, get_blob_store
+from .file_cache import get_file_cache
+from .models import DatabaseFile
+
+SIGNING_SALT = 'api.media'
+
+OFFLOAD_ACCEL = 'x-accel-redirect'
+OFFLOAD_SENDFILE = 'x-sendfile'
+
+DEFAULT_SIGNED_URL_TTL = 300
+
+
+def get_delivery_settings():
+    return getattr(settings, 'MEDIA_DELIVERY', None) or {}
+
+
+def get_signed_url_ttl():
+    return get_delivery_settings().get('SIGNED_URL_TTL', DEFAULT_SIGNED_URL_TTL)
+
+
+def sign_media_url(name):
+    """Return an expiring signed URL path for a stored file, or None if there is no such file"""
+    db_file = (
+        DatabaseFile.objects.select_related('manifest')
+        .only('name', 'checksum', 'content_type', 'manifest__codec', 'manifest__location', 'manifest__path')
+        .filter(name=name)
+        .first()
+    )
+    if db_file is None:
+        return None
+    manifest = db_file.manifest
+    # Compressed blobs can't be sent as-is, so only raw ones are offloaded from the blob store
+    blob_path = manifest.path if manifest and manifest.location == LOCATION_FS and not manifest.codec else None
+    token = signing.dumps(
+        {'n': name, 'c': db_file.checksum, 'p': blob_path, 't': db_file.content_type},
+        salt=SIGNING_SALT,
+        compress=True
+    )
+    return reverse('serve-signed-file', args=[token])
+
+
+def read_media_token(token):
+    """Return the payload of a signed media token. Raises signing.BadSignature (incl. SignatureExpired)."""
+    return signing.loads(token, salt=SIGNING_SALT, max_age=get_signed_url_ttl())
+
+
+def offload_headers(name, checksum, blob_path):
+    """
+    Return the {header: value} that hands a local copy of the file to the
+    front proxy, or None when offloading is off or there is no local copy.
+    """
+    config = get_delivery_settings()
+    mode = (config.get('OFFLOAD') or '').lower()
+    if mode not in (OFFLOAD_ACCEL, OFFLOAD_SENDFILE):
+        return None
+
+    cache = get_file_cache()
+    blob_store = get_blob_store()
+    path = cache.get(name, checksum) if cache and checksum else None
+    if path:
+        root, prefix = cache.location, config.get('ACCEL_CACHE_PREFIX')
+    elif blob_store and blob_path:
+        path = blob_store.full_path(blob_path)
+        root, prefix = blob_store.location, config.get('ACCEL_BLOB_PREFIX')
+    else:
+        return None
+
+    if mode == OFFLOAD_SENDFILE:
+        return {'X-Sendfile': os.path.abspath(path)}
+    if not prefix:
+        return None
+    relative = os.path.relpath(path, root).replace(os.sep, '/')
+    return {'X-Accel-Redirect': prefix.rstrip('/') + '/' + relative}
@@ -0,0 +1,75 @@
+"""
+Facet counts for the catalog filters
+
+list_books(facets=department,semester,isPremium,tags) returns, next to the
+books, how many matching books have each value of the requested facets.
+The column facets come from one GROUP BY over the searched catalog, with
+the facet filters left out of the query and applied to the grouped rows
+instead: the counts of a facet honour every filter but its own, so the
+sidebar still shows the other departments once one is selected. Tag
+counts come from the BookTag index (api/tags.py), under every filter.
+"""
+
+from collections import Counter
+from django.db.models import Count
+from .tags import tag_counts
+
+# Facet name (as in the API) -> Book field
+FACET_FIELDS = {
+    'department': 'department',
+    'semester': 'semester',
+    'isPremium': 'is_premium',
+}
+FACETS = (*FACET_FIELDS, 'tags')
+# Most used tags returned by the tags facet
+MAX_TAG_VALUES = 50
+
+
+def parse_facets(value):
+    """Requested facet names from a comma-separated list; ValueError on unknown ones"""
+    names = [name.strip() for name in (value or '').split(',') if name.strip()]
+    unknown = [name for name in names if name not in FACETS]
+    if unknown:
+        raise ValueError(f"Unknown facets: {', '.join(unknown)}. Choose from {', '.join(FACETS)}")
+    return list(dict.fromkeys(names))
+
+
+def apply_facet_filters(queryset, filters):
+    """Filter `queryset` by {facet name: value}"""
+    return queryset.filter(**{FACET_FIELDS[name]: value for name, value in filters.items()})
+
+
+def facet_counts(queryset, facets, filters):
+    """
+    {facet: [{'value', 'count'}]} most frequent first, for the books of
+    `queryset` (searched, but not yet filtered by `filters`, which maps
+    facet name -> value).
+    """
+    results = {}
+    column_facets = [name for name in facets if name in FACET_FIELDS]
+    if column_facets:
+        names = list(dict.fromkeys([*column_facets, *filters]))
+        fields = [FACET_FIELDS[name] for name in names]
+        rows = queryset.order_by().values(*fields).annotate(book_count=Count('*'))
+
+        counts = {name: Counter() for name in column_facets}
+        for row in rows:
+            values = dict(zip(names, (row[field] for field in fields)))
+            failing = [name for name, value in filters.items() if values[name] != value]
+            if len(failing) > 1:
+                continue
+            for name in column_facets:
+                # A row counts for a facet when it passes every other facet's filter
+                if not failing or failing[0] == name:
+                    counts[name][values[name]] += row['book_count']
+        for name, counter in counts.items():
+            results[name] = [
+                {'value': value, 'count': count}
+                for value, count in sorted(counter.items(), key=lambda item: (-item[1], str(item[0])))
+            ]
+    if 'tags' in facets:
+        results['tags'] = [
+            {'value': name, 'count': count}
+            for name, count in tag_counts(apply_facet_filters(queryset, filters))[:MAX_TAG_VALUES]
+        ]
+    return {name: results[name] for name in facets}
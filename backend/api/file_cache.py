@@ -0,0 +1,193 @@
+"""
+Local disk cache for DatabaseStorage files
+
+Keeps recently served files on local disk so repeat reads skip the remote
+database. Entries are keyed by file name plus content hash, so a replaced
+file can never be served stale. The cache is bounded by a byte budget and
+evicts least recently used entries first.
+"""
+
+import os
+import hashlib
+import tempfile
+import threading
+import logging
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+TEMP_PREFIX = '.tmp-'
+
+# Bytes requested per read while filling an entry
+CHUNK_READ_SIZE = 256 * 1024
+
+
+class DiskFileCache:
+    """
+    LRU file cache on local disk.
+
+    Writes go to a temp file in the cache directory and are published with
+    os.replace(), so concurrent workers never see a partial entry. Recency is
+    tracked through file mtimes, which every worker sharing the directory
+    sees. Counters are per process.
+    """
+
+    def __init__(self, location, max_bytes):
+        self.location = location
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.fills = 0
+        self._lock = threading.Lock()
+        self._filling = set()
+        self._approx_bytes = None
+        os.makedirs(location, exist_ok=True)
+
+    def path_for(self, name, checksum):
+        key = hashlib.sha256(f'{name}\0{checksum}'.encode('utf-8')).hexdigest()
+        return os.path.join(self.location, key[:2], key)
+
+    def get(self, name, checksum):
+        """Return the local path for a cached file, or None on a miss"""
+        path = self.path_for(name, checksum)
+        try:
+            os.utime(path)  # Mark as recently used
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return path
+
+    def put(self, name, checksum, chunks):
+        """
+        Write an iterable of byte chunks as the entry for (name, checksum).
+        Returns the cached path, or None if the content did not match `checksum`.
+        """
+        for _ in self.tee(name, checksum, chunks):
+            pass
+        path = self.path_for(name, checksum)
+        return path if os.path.exists(path) else None
+
+    def tee(self, name, checksum, chunks):
+        """
+        Yield `chunks` unchanged while writing them into the cache.
+        The entry is only published once all chunks were consumed and the
+        content matches `checksum`; a client disconnect leaves nothing behind.
+        """
+        path = self.path_for(name, checksum)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(prefix=TEMP_PREFIX, dir=os.path.dirname(path))
+        digest = hashlib.sha256()
+        size = 0
+        published = False
+        try:
+            with os.fdopen(fd, 'wb') as tmp:
+                for chunk in chunks:
+                    digest.update(chunk)
+                    size += len(chunk)
+                    tmp.write(chunk)
+                    yield chunk
+            if digest.hexdigest() == checksum:
+                os.replace(tmp_path, path)
+                published = True
+            else:
+                logger.warning(f"Checksum mismatch while caching {name}")
+        finally:
+            if not published:
+                try:
+                    os.unlink(tmp_path)
+                except FileNotFoundError:
+                    pass
+        if published:
+            self.fills += 1
+            self._account(size)
+
+    def fill_in_background(self, name, checksum, open_reader):
+        """
+        Populate an entry from the file returned by `open_reader()` on a worker thread.
+        Used on range-request misses so the response is not delayed by a full read.
+        """
+        with self._lock:
+            if (name, checksum) in self._filling:
+                return
+            self._filling.add((name, checksum))
+
+        def fill():
+            from django.db import connection
+            try:
+                reader = open_reader()
+                self.put(name, checksum, iter(lambda: reader.read(CHUNK_READ_SIZE), b''))
+            except Exception as e:
+                logger.warning(f"File cache fill failed for {name}: {e}")
+            finally:
+                with self._lock:
+                    self._filling.discard((name, checksum))
+                connection.close()
+
+        threading.Thread(target=fill, daemon=True).start()
+
+    def _entries(self):
+        for shard in os.scandir(self.location):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                if entry.name.startswith(TEMP_PREFIX):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                yield entry.path, stat.st_size, stat.st_mtime
+
+    def _account(self, added_bytes):
+        with self._lock:
+            if self._approx_bytes is None:
+                self._approx_bytes = sum(size for _, size, _ in self._entries())
+            else:
+                self._approx_bytes += added_bytes
+            over_budget = self._approx_bytes > self.max_bytes
+        if over_budget:
+            self.evict()
+
+    def evict(self):
+        """Remove least recently used entries until the cache fits its budget"""
+        entries = sorted(self._entries(), key=lambda entry: entry[2])
+        total = sum(size for _, size, _ in entries)
+        for path, size, _ in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            self.evictions += 1
+        with self._lock:
+            self._approx_bytes = total
+
+    def stats(self):
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'fills': self.fills,
+            'bytes': self._approx_bytes,
+            'maxBytes': self.max_bytes,
+        }
+
+
+_file_cache = None
+_file_cache_lock = threading.Lock()
+
+
+def get_file_cache():
+    """Return the configured DiskFileCache, or None when caching is disabled"""
+    global _file_cache
+    config = getattr(settings, 'DATABASE_STORAGE_CACHE', None) or {}
+    if not config.get('LOCATION'):
+        return None
+    with _file_cache_lock:
+        if _file_cache is None:
+            _file_cache = DiskFileCache(config['LOCATION'], config.get('MAX_BYTES', 1024 * 1024 * 1024))
+    return _file_cache
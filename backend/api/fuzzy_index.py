@@ -0,0 +1,185 @@
+"""
+Typo-tolerant title / author search
+
+A trigram index over the distinct words of book titles and authors, held
+in memory by each worker. A query word ("machne") is padded and split into
+trigrams ("  m", " ma", "mac", ...); the words sharing enough of them are
+found through the trigram postings and scored by Jaccard similarity
+(0.5 for "machine"), as pg_trgm does. Books are then ranked by the
+average best similarity of each query word to one of their words, so
+"machne lerning" finds "Machine Learning". Candidates always come from the
+index: the vocabulary is much smaller than the catalog, and no book row
+is read at query time.
+
+The index is built from one streamed query on first use, kept current in
+this worker by post_save / post_delete signals, and rebuilt in the
+background once older than FUZZY_INDEX_MAX_AGE seconds so changes made
+through other workers show up (see api/index_holder.py).
+"""
+
+import re
+import heapq
+import threading
+import unicodedata
+from array import array
+from collections import Counter, defaultdict
+from operator import itemgetter
+from django.conf import settings
+from .index_holder import IndexHolder
+
+FIELDS = ('title', 'author')
+
+# Minimum similarity for a word, and for a book (average over query words)
+DEFAULT_THRESHOLD = 0.3
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+# Matches fetched at most for a caller that filters them further (api/search.py)
+MAX_CANDIDATES = 5000
+# Similar words considered per query word
+MAX_WORD_CANDIDATES = 50
+
+_WORD_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def normalize(text):
+    """Lowercase words of `text` with accents removed"""
+    if not text:
+        return []
+    text = unicodedata.normalize('NFKD', text.lower())
+    text = ''.join(char for char in text if not unicodedata.combining(char))
+    return _WORD_RE.findall(text)
+
+
+def trigrams(word):
+    padded = f'  {word} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class TrigramIndex:
+    def __init__(self):
+        self.words = []                          # word number -> word
+        self.word_numbers = {}                   # word -> word number
+        self.word_sizes = array('B')             # word number -> distinct trigram count
+        self.postings = defaultdict(lambda: array('I'))   # trigram -> word numbers, ascending
+        self.word_books = defaultdict(set)       # word number -> book ids
+        self.book_words = {}                     # book id -> word numbers
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self.book_words)
+
+    def _word_number(self, word):
+        number = self.word_numbers.get(word)
+        if number is None:
+            number = len(self.words)
+            self.words.append(word)
+            self.word_numbers[word] = number
+            grams = trigrams(word)
+            self.word_sizes.append(min(len(grams), 255))
+            for gram in grams:
+                self.postings[gram].append(number)
+        return number
+
+    def add(self, book_id, values):
+        """Index (or re-index) a book; `values` maps field name -> text"""
+        with self._lock:
+            self.remove(book_id)
+            numbers = set()
+            for field in FIELDS:
+                numbers.update(self._word_number(word) for word in normalize(values.get(field)))
+            for number in numbers:
+                self.word_books[number].add(book_id)
+            self.book_words[book_id] = tuple(numbers)
+
+    def remove(self, book_id):
+        # Words stay in the vocabulary; a word with no books left simply matches nothing
+        with self._lock:
+            for number in self.book_words.pop(book_id, ()):
+                books = self.word_books.get(number)
+                if books is not None:
+                    books.discard(book_id)
+                    if not books:
+                        del self.word_books[number]
+
+    def similar_words(self, word, threshold):
+        """[(word number, similarity)] of indexed words at least `threshold` similar to `word`"""
+        grams = trigrams(word)
+        shared = Counter()
+        for gram in grams:
+            postings = self.postings.get(gram)
+            if postings:
+                shared.update(postings)   # counted in C
+        size = len(grams)
+        word_sizes = self.word_sizes
+        # Jaccard >= threshold needs at least threshold * |query| shared trigrams
+        minimum = threshold * size
+        word_books = self.word_books
+        matches = []
+        for number, common in shared.items():
+            if common >= minimum:
+                similarity = common / (size + word_sizes[number] - common)
+                if similarity >= threshold and number in word_books:
+                    matches.append((number, similarity))
+        return heapq.nlargest(MAX_WORD_CANDIDATES, matches, key=itemgetter(1))
+
+    def search(self, query, threshold=DEFAULT_THRESHOLD, limit=DEFAULT_LIMIT):
+        """[(book_id, similarity)] best first, similarity in (0, 1]"""
+        with self._lock:
+            query_words = list(dict.fromkeys(normalize(query)))
+            if not query_words:
+                return []
+            totals = defaultdict(float)
+            for word in query_words:
+                # Least similar words first, so each book ends up with its best match
+                best = {}
+                for number, similarity in reversed(self.similar_words(word, threshold)):
+                    best.update(dict.fromkeys(self.word_books[number], similarity))
+                for book_id, similarity in best.items():
+                    totals[book_id] += similarity
+            minimum = threshold * len(query_words)
+            matches = (item for item in totals.items() if item[1] >= minimum)
+            best = heapq.nlargest(limit, matches, key=itemgetter(1))
+            return [(book_id, total / len(query_words)) for book_id, total in best]
+
+
+def build_index():
+    """Index every title and author from one streamed query"""
+    from .models import Book
+    index = TrigramIndex()
+    for book_id, *values in Book.objects.order_by().values_list('id', *FIELDS).iterator(chunk_size=2000):
+        index.add(book_id, dict(zip(FIELDS, values)))
+    return index
+
+
+_holder = IndexHolder('fuzzy', build_index, 'FUZZY_INDEX_MAX_AGE')
+
+
+def get_fuzzy_index():
+    return _holder.get()
+
+
+def get_threshold():
+    return getattr(settings, 'FUZZY_SEARCH_THRESHOLD', DEFAULT_THRESHOLD)
+
+
+def fuzzy_search(query, limit=DEFAULT_LIMIT, threshold=None):
+    """[(book_id, similarity)] of the books whose title / author best match `query`"""
+    if threshold is None:
+        threshold = get_threshold()
+    return get_fuzzy_index().search(
+        query, threshold=threshold, limit=max(1, min(limit, MAX_CANDIDATES))
+    )
+
+
+# Signal receivers, connected in ApiConfig.ready()
+
+def book_saved(sender, instance, **kwargs):
+    if instance.deleted_at is not None:
+        # Soft-deleted: only its tombstone remains
+        book_deleted(sender, instance)
+        return
+    _holder.apply_on_commit('add', instance.pk, {field: getattr(instance, field) for field in FIELDS})
+
+
+def book_deleted(sender, instance, **kwargs):
+    _holder.apply_on_commit('remove', instance.pk)
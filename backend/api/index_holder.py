@@ -0,0 +1,89 @@
+"""
+Per-worker in-memory indexes
+
+An IndexHolder owns one worker's copy of an index built from the database
+(fuzzy titles, suggestions...). The index is built on first use, updated
+after commit by the signal receivers of this worker, and rebuilt in the
+background once older than its max age, so changes made through other
+workers (or by queryset.update(), which sends no signals) show up. Changes
+committed while a rebuild runs are replayed onto the new index.
+"""
+
+import time
+import logging
+import threading
+from django.conf import settings
+from django.db import connection, transaction
+
+logger = logging.getLogger(__name__)
+
+
+class IndexHolder:
+    def __init__(self, name, build, max_age_setting, default_max_age=300):
+        self.name = name
+        self.build = build
+        self.max_age_setting = max_age_setting
+        self.default_max_age = default_max_age
+        self._index = None
+        self._built_at = None
+        self._lock = threading.Lock()
+        self._refreshing = threading.Event()
+        self._pending = []
+
+    @property
+    def loaded(self):
+        return self._index is not None
+
+    def get_max_age(self):
+        return getattr(settings, self.max_age_setting, self.default_max_age)
+
+    def get(self):
+        """Return the index, building it on first use and refreshing it when stale"""
+        if self._index is None:
+            with self._lock:
+                if self._index is None:
+                    self._index = self.build()
+                    self._built_at = time.monotonic()
+                    logger.info(f"Built {self.name} index")
+        elif time.monotonic() - self._built_at > self.get_max_age():
+            self.refresh()
+        return self._index
+
+    def refresh(self):
+        """Rebuild in the background, answering from the current index meanwhile"""
+        with self._lock:
+            if self._index is None or self._refreshing.is_set():
+                return
+            self._pending.clear()
+            self._refreshing.set()
+        threading.Thread(target=self._refresh, name=f'{self.name}-index', daemon=True).start()
+
+    def _refresh(self):
+        try:
+            index = self.build()
+            with self._lock:
+                for method, args in self._pending:
+                    getattr(index, method)(*args)
+                self._index = index
+                self._built_at = time.monotonic()
+        except Exception as e:
+            logger.error(f"Could not rebuild the {self.name} index: {e}")
+        finally:
+            with self._lock:
+                self._pending.clear()
+                self._refreshing.clear()
+            connection.close()
+
+    def apply(self, method, *args):
+        """Call index.<method>(*args), and again on the index being rebuilt"""
+        # Under the lock, so a rebuild cannot swap in its index between the two
+        with self._lock:
+            getattr(self._index, method)(*args)
+            if self._refreshing.is_set():
+                self._pending.append((method, args))
+
+    def apply_on_commit(self, method, *args):
+        """apply() once the current transaction commits; a worker without the index has nothing to update"""
+        if self._index is None:
+            return
+        transaction.on_commit(lambda: self.apply(method, *args))
@@ -0,0 +1,34 @@
+"""
+Discard resumable uploads that were abandoned: sessions not touched for
+--hours, whether still receiving chunks or completed but never attached
+to a book.
+"""
+
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from api.models import UploadSession
+from api.uploads import discard_upload_session
+
+
+class Command(BaseCommand):
+    help = 'Delete resumable upload sessions idle for longer than --hours'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hours', type=int, default=24, help='Idle time after which a session is discarded')
+        parser.add_argument('--dry-run', action='store_true', help='Only report what would be discarded')
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(hours=options['hours'])
+        stale = UploadSession.objects.filter(updated_at__lt=cutoff)
+        if options['dry_run']:
+            self.stdout.write(f'{stale.count()} upload session(s) would be discarded')
+            return
+
+        discarded = 0
+        for session in stale.iterator():
+            discard_upload_session(session)
+            discarded += 1
+        self.stdout.write(self.style.SUCCESS(f'Discarded {discarded} upload session(s)'))
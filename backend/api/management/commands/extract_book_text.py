@@ -0,0 +1,73 @@
+"""
+Backfill the in-book search index: extract the per-page text of book PDFs.
+
+Books already indexed are skipped unless --force is given. Extraction is
+CPU bound, so books are spread over worker processes, each with its own
+database connection.
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from api.models import Book
+
+
+def _init_worker():
+    # A no-op for forked workers; spawned ones start with an empty app registry
+    django.setup()
+
+
+def _extract(book_id, force):
+    from api.book_text import extract_book_text
+    try:
+        return book_id, extract_book_text(book_id, force=force), None
+    except Exception as e:
+        return book_id, None, str(e)
+
+
+class Command(BaseCommand):
+    help = 'Extract book PDF text for in-book search'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--book', action='append', dest='books', help='Only this book id (repeatable)')
+        parser.add_argument('--force', action='store_true', help='Re-extract books that were already indexed')
+        parser.add_argument('--processes', type=int, default=max(1, (os.cpu_count() or 2) // 2),
+                            help='Worker processes (default: half the CPUs)')
+        parser.add_argument('--limit', type=int, default=None, help='Stop after this many books')
+        parser.add_argument('--dry-run', action='store_true', help='Only report what would be extracted')
+
+    def handle(self, *args, **options):
+        books = Book.objects.exclude(pdf_file='').order_by('uploaded_at')
+        if options['books']:
+            books = books.filter(pk__in=options['books'])
+        if not options['force']:
+            books = books.filter(content_indexed_at__isnull=True)
+        book_ids = list(books.values_list('pk', flat=True)[:options['limit']])
+
+        if options['dry_run']:
+            self.stdout.write(f'{len(book_ids)} book(s) would be extracted')
+            return
+        processes = max(1, min(options['processes'], len(book_ids)))
+        self.stdout.write(f'Extracting {len(book_ids)} book(s) with {processes} process(es)')
+
+        pages = failed = 0
+        # Forked workers must open their own database connections
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=processes, initializer=_init_worker) as pool:
+            futures = [pool.submit(_extract, book_id, options['force']) for book_id in book_ids]
+            for future in futures:
+                book_id, page_count, error = future.result()
+                if error:
+                    failed += 1
+                    self.stderr.write(f'Book {book_id}: {error}')
+                else:
+                    pages += page_count or 0
+                    self.stdout.write(f'Book {book_id}: {page_count} page(s)')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Done: {len(book_ids) - failed} book(s), {pages} page(s) indexed, {failed} failed'
+        ))
@@ -0,0 +1,42 @@
+"""
+Backfill the WebP / JPEG width variants of book covers.
+
+Books that already have variants are skipped unless --force is given,
+e.g. after changing COVER_VARIANT_WIDTHS.
+"""
+
+from django.core.management.base import BaseCommand
+
+from api.covers import generate_cover_variants, get_cover_widths
+from api.models import Book
+
+
+class Command(BaseCommand):
+    help = 'Generate resized WebP and JPEG cover variants for existing books'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--book', action='append', dest='books', help='Only this book id (repeatable)')
+        parser.add_argument('--force', action='store_true', help='Regenerate books that already have variants')
+        parser.add_argument('--dry-run', action='store_true', help='Only report what would be generated')
+
+    def handle(self, *args, **options):
+        books = Book.objects.exclude(cover_image='').order_by('uploaded_at')
+        if options['books']:
+            books = books.filter(pk__in=options['books'])
+        if not options['force']:
+            books = books.filter(cover_variants=[])
+        book_ids = list(books.values_list('pk', flat=True))
+
+        if options['dry_run']:
+            self.stdout.write(f'{len(book_ids)} book(s) would get cover variants at widths {get_cover_widths()}')
+            return
+
+        done = failed = 0
+        for book_id in book_ids:
+            try:
+                if generate_cover_variants(book_id, force=options['force']) is not None:
+                    done += 1
+            except Exception as e:
+                failed += 1
+                self.stderr.write(f'Book {book_id}: {e}')
+        self.stdout.write(self.style.SUCCESS(f'Done: {done} book(s) processed, {failed} failed'))
@@ -0,0 +1,113 @@
+"""
+Move DatabaseStorage payloads out of DatabaseFileChunk rows into the
+filesystem blob store.
+
+Each manifest is copied to the blob store, read back and checked against
+its SHA-256, then flipped to location='fs' and its chunks deleted in one
+transaction. The location column records progress, so an interrupted run
+simply resumes with the manifests still in the database. File names and
+URLs never change, and readers that are mid-stream when a manifest moves
+fall back to the blob store.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Q
+
+from api.blob_store import LOCATION_DB, LOCATION_FS, get_blob_store, get_blob_store_prefixes
+from api.compression import decode_chunks
+from api.models import DatabaseFile, DatabaseFileManifest, DatabaseFileChunk
+from api.storage import ContentStats, iter_manifest_chunks
+
+
+class Command(BaseCommand):
+    help = 'Move stored file payloads from the database into the filesystem blob store'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=50, help='Manifests fetched per batch')
+        parser.add_argument('--workers', type=int, default=4, help='Manifests copied in parallel')
+        parser.add_argument('--limit', type=int, default=None, help='Stop after this many manifests')
+        parser.add_argument('--all-prefixes', action='store_true',
+                            help='Move every payload, not only the prefixes routed to the blob store')
+        parser.add_argument('--dry-run', action='store_true', help='Only report what would be moved')
+
+    def handle(self, *args, **options):
+        blob_store = get_blob_store()
+        if blob_store is None:
+            raise CommandError('DATABASE_STORAGE_BLOB_STORE has no LOCATION (set BLOB_STORE_DIR)')
+
+        pending = DatabaseFileManifest.objects.filter(location=LOCATION_DB, checksum__isnull=False)
+        if not options['all_prefixes']:
+            prefixes = get_blob_store_prefixes()
+            if not prefixes:
+                raise CommandError('No blob store PREFIXES configured; use --all-prefixes')
+            prefix_filter = Q()
+            for prefix in prefixes:
+                prefix_filter |= Q(name__startswith=prefix)
+            pending = pending.filter(
+                pk__in=DatabaseFile.objects.filter(prefix_filter).values('manifest_id')
+            )
+
+        if options['dry_run']:
+            total = pending.count()
+            self.stdout.write(f'{total} manifest(s) would be moved to {blob_store.location}')
+            return
+
+        moved = failed = 0
+        last_id = 0
+        limit = options['limit']
+        with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+            while limit is None or moved + failed < limit:
+                batch_size = options['batch_size']
+                if limit is not None:
+                    batch_size = min(batch_size, limit - moved - failed)
+                batch = list(
+                    pending.filter(pk__gt=last_id).order_by('pk').values_list('pk', flat=True)[:batch_size]
+                )
+                if not batch:
+                    break
+                last_id = batch[-1]
+                for manifest_id, error in pool.map(lambda pk: self.move_manifest(blob_store, pk), batch):
+                    if error:
+                        failed += 1
+                        self.stderr.write(f'Manifest {manifest_id}: {error}')
+                    else:
+                        moved += 1
+                self.stdout.write(f'Moved {moved} manifest(s), {failed} failed')
+
+        self.stdout.write(self.style.SUCCESS(f'Done: {moved} moved, {failed} failed'))
+
+    def move_manifest(self, blob_store, manifest_id):
+        """Copy one manifest to the blob store and switch it over. Returns (id, error)."""
+        try:
+            manifest = DatabaseFileManifest.objects.get(pk=manifest_id)
+            if manifest.location != LOCATION_DB:
+                return manifest_id, None
+
+            chunks = iter_manifest_chunks(manifest)
+            # Compressed payloads are moved as-is; the path is content-addressed, so a
+            # rerun after an interruption rewrites the same file
+            path, stored_size = blob_store.write(chunks, suffix=f'.{manifest.codec}' if manifest.codec else '')
+
+            # Read the copy back and check the content against the manifest
+            stats = ContentStats()
+            for _ in stats.track(decode_chunks(blob_store.iter_chunks(path), manifest.codec)):
+                pass
+            if stats.checksum != manifest.checksum or stats.size != manifest.size or stored_size != manifest.stored_size:
+                if not DatabaseFileManifest.objects.filter(location=LOCATION_FS, path=path).exists():
+                    blob_store.delete(path)
+                return manifest_id, f'checksum mismatch ({stats.checksum} != {manifest.checksum})'
+
+            with transaction.atomic():
+                updated = DatabaseFileManifest.objects.filter(pk=manifest_id, location=LOCATION_DB).update(
+                    location=LOCATION_FS, path=path
+                )
+                if updated:
+                    DatabaseFileChunk.objects.filter(manifest_id=manifest_id).delete()
+            return manifest_id, None
+        except Exception as e:
+            return manifest_id, str(e)
+        finally:
+            connection.close()
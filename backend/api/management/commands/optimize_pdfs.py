@@ -0,0 +1,71 @@
+"""
+Run the upload-time PDF optimization over the existing catalog.
+
+Books already optimized are skipped unless --force is given; a rerun
+always starts from the original upload. Books whose served PDF changes
+are split into page segments again.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from api.models import Book
+from api.pdf_optimize import get_qpdf, optimize_book_pdf
+from api.pdf_pages import split_book_pdf
+
+
+class Command(BaseCommand):
+    help = 'Linearize / optimize book PDFs, keeping the original uploads'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--book', action='append', dest='books', help='Only this book id (repeatable)')
+        parser.add_argument('--force', action='store_true', help='Reprocess books that were already optimized')
+        parser.add_argument('--workers', type=int, default=2, help='Books processed in parallel')
+        parser.add_argument('--limit', type=int, default=None, help='Stop after this many books')
+        parser.add_argument('--dry-run', action='store_true', help='Only report what would be processed')
+
+    def handle(self, *args, **options):
+        books = Book.objects.exclude(pdf_file='').order_by('uploaded_at')
+        if options['books']:
+            books = books.filter(pk__in=options['books'])
+        if not options['force']:
+            books = books.filter(pdf_optimizer='')
+        book_ids = list(books.values_list('pk', flat=True)[:options['limit']])
+
+        optimizer = 'qpdf (linearize)' if get_qpdf() else 'PyPDF2 (qpdf not found, no linearization)'
+        if options['dry_run']:
+            self.stdout.write(f'{len(book_ids)} book(s) would be optimized with {optimizer}')
+            return
+        self.stdout.write(f'Optimizing {len(book_ids)} book(s) with {optimizer}')
+
+        changed = failed = 0
+        with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+            for book_id, result, error in pool.map(lambda pk: self.process(pk, options['force']), book_ids):
+                if error:
+                    failed += 1
+                    self.stderr.write(f'Book {book_id}: {error}')
+                elif result:
+                    changed += 1
+
+        totals = Book.objects.filter(pk__in=book_ids, pdf_optimized_size__isnull=False).values_list(
+            'pdf_original_size', 'pdf_optimized_size'
+        )
+        before = sum(original for original, _ in totals)
+        after = sum(optimized for _, optimized in totals)
+        self.stdout.write(self.style.SUCCESS(
+            f'Done: {changed} rewritten, {failed} failed; {before} -> {after} bytes'
+        ))
+
+    def process(self, book_id, force):
+        """Optimize one book and re-split it if the served PDF changed. Returns (id, changed, error)."""
+        try:
+            changed = optimize_book_pdf(book_id, force=force)
+            if changed:
+                split_book_pdf(book_id)
+            return book_id, changed, None
+        except Exception as e:
+            return book_id, False, str(e)
+        finally:
+            connection.close()
@@ -0,0 +1,55 @@
+"""
+Run the upload processing jobs books are still missing: PDF optimization
+and page splitting, cover variants, in-book text extraction.
+
+enqueue() runs them on a background thread by default, which a serverless
+instance may stop before they ran. Schedule this command (every few
+minutes) to catch up; books uploaded less than --minutes ago are left to
+the jobs that may still be running.
+"""
+
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from django.utils import timezone
+
+from api import tasks
+from api.models import Book
+
+# Task -> condition of the books it has not run for yet
+PENDING = (
+    ('process_book_pdf', Q(page_count__isnull=True) | Q(pdf_optimized_at__isnull=True)),
+    ('resize_book_cover', Q(cover_variants=[]) & ~Q(cover_image='')),
+    ('extract_book_content', Q(content_indexed_at__isnull=True)),
+)
+
+
+class Command(BaseCommand):
+    help = 'Run the PDF, cover and text jobs that books uploaded earlier are still missing'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--minutes', type=int, default=15, help='Skip books uploaded more recently than this')
+        parser.add_argument('--limit', type=int, default=None, help='Books per job at most')
+        parser.add_argument('--dry-run', action='store_true', help='Only report what would be run')
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(minutes=options['minutes'])
+        books = Book.objects.exclude(pdf_file='').filter(uploaded_at__lt=cutoff).order_by('uploaded_at')
+
+        failed = 0
+        for task_name, pending in PENDING:
+            book_ids = list(books.filter(pending).values_list('pk', flat=True)[:options['limit']])
+            if options['dry_run']:
+                self.stdout.write(f'{task_name}: {len(book_ids)} book(s)')
+                continue
+            for book_id in book_ids:
+                try:
+                    getattr(tasks, task_name)(book_id)
+                except Exception as e:
+                    failed += 1
+                    self.stderr.write(f'{task_name} {book_id}: {e}')
+            self.stdout.write(f'{task_name}: {len(book_ids)} book(s)')
+
+        if not options['dry_run']:
+            self.stdout.write(self.style.SUCCESS(f'Done, {failed} failed'))
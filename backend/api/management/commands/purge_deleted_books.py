@@ -0,0 +1,20 @@
+"""
+Delete the tombstones of books deleted longer ago than
+BOOK_TOMBSTONE_RETENTION_DAYS.
+
+Deleted books stay in the database so books/changes/ can report them;
+clients whose cursor is older than the retention get a 410 and sync from
+scratch, so they never miss a purged tombstone. Run it daily from cron.
+"""
+
+from django.core.management.base import BaseCommand
+
+from api.book_changes import purge_deleted_books
+
+
+class Command(BaseCommand):
+    help = 'Delete the tombstones of books deleted longer ago than BOOK_TOMBSTONE_RETENTION_DAYS'
+
+    def handle(self, *args, **options):
+        count = purge_deleted_books()
+        self.stdout.write(self.style.SUCCESS(f'Purged {count} deleted book(s)'))
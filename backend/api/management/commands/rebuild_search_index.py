@@ -0,0 +1,24 @@
+"""
+Rebuild the book search index from the Book table.
+
+The SQLite FTS5 table needs this after editing books outside the API
+(admin, shell, bulk imports); MySQL's FULLTEXT index is maintained by
+InnoDB. With SEARCH_BACKEND = 'memory' it writes SEARCH_INDEX_SNAPSHOT,
+which running workers load on their next search: run it periodically so
+workers see each other's changes.
+"""
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from api.search import get_search_backend
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text book search index'
+
+    def handle(self, *args, **options):
+        backend = get_search_backend()
+        with transaction.atomic():
+            count = backend.rebuild()
+        self.stdout.write(self.style.SUCCESS(f'{backend.name}: indexed {count} book(s)'))
@@ -0,0 +1,18 @@
+"""
+Rebuild the Tag / BookTag rows and tag counts from Book.tags.
+
+The API keeps them in sync as books are uploaded, edited and deleted;
+run this after changing books outside it (admin, shell, bulk imports).
+"""
+
+from django.core.management.base import BaseCommand
+
+from api.tags import rebuild_tags
+
+
+class Command(BaseCommand):
+    help = 'Rebuild book tags and their counts from Book.tags'
+
+    def handle(self, *args, **options):
+        count = rebuild_tags()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {count} tag(s)'))
@@ -0,0 +1,33 @@
+"""
+Delete blob store files no manifest points to: payloads written by upload
+transactions that rolled back afterwards, and temporary files left by a
+crash mid-write. Only files older than --hours are considered, so uploads
+still in progress are left alone.
+"""
+
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.blob_store import get_blob_store
+from api.storage import sweep_orphan_blobs
+
+
+class Command(BaseCommand):
+    help = 'Delete blob store files not referenced by any manifest and older than --hours'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hours', type=int, default=24, help='Age after which an unreferenced file is deleted')
+        parser.add_argument('--dry-run', action='store_true', help='Only report what would be deleted')
+
+    def handle(self, *args, **options):
+        blob_store = get_blob_store()
+        if blob_store is None:
+            raise CommandError('DATABASE_STORAGE_BLOB_STORE has no LOCATION (set BLOB_STORE_DIR)')
+
+        older_than = time.time() - options['hours'] * 3600
+        count = sweep_orphan_blobs(blob_store, older_than, dry_run=options['dry_run'])
+        if options['dry_run']:
+            self.stdout.write(f'{count} unreferenced blob file(s) would be deleted')
+            return
+        self.stdout.write(self.style.SUCCESS(f'Deleted {count} unreferenced blob file(s)'))
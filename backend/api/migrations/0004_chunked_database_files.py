@@ -0,0 +1,47 @@
+# Generated by Django 5.2.18 on 2026-10-17 18:09
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_databasefile'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DatabaseFileManifest',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('size', models.PositiveBigIntegerField()),
+                ('checksum', models.CharField(help_text='SHA-256 hex digest of the content', max_length=64)),
+                ('chunk_size', models.PositiveIntegerField()),
+                ('chunk_count', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='databasefile',
+            name='content',
+            field=models.BinaryField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='databasefile',
+            name='manifest',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='files', to='api.databasefilemanifest'),
+        ),
+        migrations.CreateModel(
+            name='DatabaseFileChunk',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('seq', models.PositiveIntegerField()),
+                ('data', models.BinaryField()),
+                ('manifest', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='chunks', to='api.databasefilemanifest')),
+            ],
+            options={
+                'unique_together': {('manifest', 'seq')},
+            },
+        ),
+    ]
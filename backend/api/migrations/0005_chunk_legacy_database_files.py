@@ -0,0 +1,56 @@
+import hashlib
+
+from django.db import migrations
+from django.db.models import BinaryField
+from django.db.models.functions import Substr
+
+CHUNK_SIZE = 256 * 1024
+
+
+def chunk_legacy_files(apps, schema_editor):
+    """Move single-row DatabaseFile payloads into DatabaseFileChunk rows"""
+    DatabaseFile = apps.get_model('api', 'DatabaseFile')
+    DatabaseFileManifest = apps.get_model('api', 'DatabaseFileManifest')
+    DatabaseFileChunk = apps.get_model('api', 'DatabaseFileChunk')
+
+    legacy_ids = DatabaseFile.objects.filter(manifest__isnull=True).values_list('id', flat=True)
+    for file_id in list(legacy_ids):
+        size = DatabaseFile.objects.filter(pk=file_id).values_list('size', flat=True).first() or 0
+        manifest = DatabaseFileManifest.objects.create(size=size, checksum='', chunk_size=CHUNK_SIZE)
+        digest = hashlib.sha256()
+        seq = 0
+        for offset in range(0, size, CHUNK_SIZE):
+            # Read one chunk at a time so large BLOBs never load whole
+            data = DatabaseFile.objects.filter(pk=file_id).annotate(
+                span=Substr('content', offset + 1, CHUNK_SIZE, output_field=BinaryField())
+            ).values_list('span', flat=True).first()
+            data = bytes(data or b'')
+            digest.update(data)
+            DatabaseFileChunk.objects.create(manifest=manifest, seq=seq, data=data)
+            seq += 1
+        manifest.checksum = digest.hexdigest()
+        manifest.chunk_count = seq
+        manifest.save(update_fields=['checksum', 'chunk_count'])
+        DatabaseFile.objects.filter(pk=file_id).update(manifest=manifest, content=None)
+
+
+def join_chunked_files(apps, schema_editor):
+    """Reassemble chunked files into the single-row layout"""
+    DatabaseFile = apps.get_model('api', 'DatabaseFile')
+    DatabaseFileChunk = apps.get_model('api', 'DatabaseFileChunk')
+
+    for db_file in DatabaseFile.objects.filter(manifest__isnull=False).defer('content'):
+        chunks = DatabaseFileChunk.objects.filter(manifest_id=db_file.manifest_id).order_by('seq')
+        content = b''.join(bytes(data) for data in chunks.values_list('data', flat=True))
+        DatabaseFile.objects.filter(pk=db_file.pk).update(content=content, manifest=None)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_chunked_database_files'),
+    ]
+
+    operations = [
+        migrations.RunPython(chunk_legacy_files, join_chunked_files),
+    ]
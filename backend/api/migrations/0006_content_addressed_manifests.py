@@ -0,0 +1,58 @@
+# Generated by Django 5.2.18 on 2026-10-17 18:11
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def merge_duplicate_manifests(apps, schema_editor):
+    """Point files with identical content at one manifest and count references"""
+    DatabaseFile = apps.get_model('api', 'DatabaseFile')
+    DatabaseFileManifest = apps.get_model('api', 'DatabaseFileManifest')
+
+    duplicates = (
+        DatabaseFileManifest.objects.exclude(checksum='')
+        .values('checksum').annotate(n=Count('id')).filter(n__gt=1)
+    )
+    for row in duplicates:
+        ids = list(
+            DatabaseFileManifest.objects.filter(checksum=row['checksum']).order_by('id').values_list('id', flat=True)
+        )
+        keep, extra = ids[0], ids[1:]
+        DatabaseFile.objects.filter(manifest_id__in=extra).update(manifest_id=keep)
+        DatabaseFileManifest.objects.filter(pk__in=extra).delete()
+
+    DatabaseFileManifest.objects.filter(checksum='').update(checksum=None)
+    for manifest in DatabaseFileManifest.objects.annotate(n=Count('files')):
+        DatabaseFileManifest.objects.filter(pk=manifest.pk).update(ref_count=manifest.n)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_chunk_legacy_database_files'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='databasefilemanifest',
+            name='ref_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AlterField(
+            model_name='databasefile',
+            name='manifest',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='files', to='api.databasefilemanifest'),
+        ),
+        migrations.AlterField(
+            model_name='databasefilemanifest',
+            name='checksum',
+            field=models.CharField(blank=True, help_text='SHA-256 hex digest of the content (empty while being written)', max_length=64, null=True),
+        ),
+        migrations.RunPython(merge_duplicate_manifests, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='databasefilemanifest',
+            name='checksum',
+            field=models.CharField(blank=True, help_text='SHA-256 hex digest of the content (empty while being written)', max_length=64, null=True, unique=True),
+        ),
+    ]
@@ -0,0 +1,37 @@
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models import F, OuterRef, Subquery
+
+
+def backfill_validators(apps, schema_editor):
+    DatabaseFile = apps.get_model('api', 'DatabaseFile')
+    DatabaseFileManifest = apps.get_model('api', 'DatabaseFileManifest')
+
+    DatabaseFile.objects.update(
+        modified_at=F('created_at'),
+        checksum=Subquery(
+            DatabaseFileManifest.objects.filter(pk=OuterRef('manifest_id')).values('checksum')[:1]
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_content_addressed_manifests'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='databasefile',
+            name='checksum',
+            field=models.CharField(blank=True, help_text='SHA-256 hex digest, used as the ETag', max_length=64, null=True),
+        ),
+        migrations.AddField(
+            model_name='databasefile',
+            name='modified_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.RunPython(backfill_validators, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-17 18:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_databasefile_validators'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='databasefilemanifest',
+            name='location',
+            field=models.CharField(choices=[('db', 'Database'), ('fs', 'Filesystem')], default='db', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='databasefilemanifest',
+            name='path',
+            field=models.CharField(blank=True, help_text="Path inside the blob store when location is 'fs'", max_length=255, null=True),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-17 19:05
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def backfill_stored_size(apps, schema_editor):
+    DatabaseFileManifest = apps.get_model('api', 'DatabaseFileManifest')
+    DatabaseFileManifest.objects.update(stored_size=F('size'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_manifest_location'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='databasefilemanifest',
+            name='codec',
+            field=models.CharField(blank=True, default='', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='databasefilemanifest',
+            name='stored_size',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_stored_size, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-17 18:21
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_manifest_codec'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UploadSession',
+            fields=[
+                ('id', models.CharField(help_text='UUID', max_length=128, primary_key=True, serialize=False)),
+                ('name', models.CharField(help_text='Storage name the file will be saved under', max_length=255)),
+                ('size', models.PositiveBigIntegerField(help_text='Total size announced by the client')),
+                ('checksum', models.CharField(blank=True, default='', help_text='Expected SHA-256 of the whole file, if the client sent one', max_length=64)),
+                ('received', models.PositiveBigIntegerField(default=0, help_text='Bytes confirmed so far; clients resume from here')),
+                ('completed', models.BooleanField(default=False)),
+                ('content_type', models.CharField(blank=True, help_text='Sniffed on completion', max_length=100, null=True)),
+                ('created_by', models.CharField(help_text='Firebase UID of admin', max_length=128)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('manifest', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='upload_sessions', to='api.databasefilemanifest')),
+            ],
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-17 18:25
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_upload_session'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='book',
+            name='page_count',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='BookPageSegment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('first_page', models.PositiveIntegerField(help_text='1-based, inclusive')),
+                ('last_page', models.PositiveIntegerField(help_text='1-based, inclusive')),
+                ('file', models.FileField(upload_to='books/pages/')),
+                ('size', models.PositiveIntegerField()),
+                ('book', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='page_segments', to='api.book')),
+            ],
+            options={
+                'ordering': ['first_page'],
+                'unique_together': {('book', 'first_page')},
+            },
+        ),
+    ]
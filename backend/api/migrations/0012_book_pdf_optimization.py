@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-17 18:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0011_book_page_segments'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='book',
+            name='original_pdf_file',
+            field=models.FileField(blank=True, null=True, upload_to='books/pdfs/'),
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='pdf_optimized_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='pdf_optimized_size',
+            field=models.PositiveBigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='pdf_optimizer',
+            field=models.CharField(blank=True, default='', help_text="'qpdf', 'pypdf2', or 'none' when the rewrite did not help", max_length=20),
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='pdf_original_size',
+            field=models.PositiveBigIntegerField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-17 18:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0013_book_cover_variants'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['uploaded_at', 'id'], name='book_uploaded_at_id_idx'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+from django.db import migrations
+
+FTS_COLUMNS = 'title, author, description, isbn, tags'
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'mysql':
+        schema_editor.execute(f'ALTER TABLE api_book ADD FULLTEXT INDEX book_fulltext_idx ({FTS_COLUMNS})')
+    elif vendor == 'sqlite':
+        schema_editor.execute(
+            f'CREATE VIRTUAL TABLE api_book_fts USING fts5(book_id UNINDEXED, {FTS_COLUMNS}, '
+            "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+        )
+        coalesced = ', '.join(f"COALESCE({column}, '')" for column in FTS_COLUMNS.split(', '))
+        schema_editor.execute(f'INSERT INTO api_book_fts (book_id, {FTS_COLUMNS}) SELECT id, {coalesced} FROM api_book')
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'mysql':
+        schema_editor.execute('ALTER TABLE api_book DROP INDEX book_fulltext_idx')
+    elif vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE IF EXISTS api_book_fts')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0014_book_uploaded_at_id_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
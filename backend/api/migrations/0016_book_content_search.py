@@ -0,0 +1,45 @@
+# Generated by Django 5.2.18 on 2026-10-17 18:43
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0015_book_fulltext_search'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='book',
+            name='content_indexed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='BookContentPosting',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=64)),
+                ('pages', models.BinaryField(help_text='Little-endian uint32 page numbers, ascending')),
+                ('counts', models.BinaryField(help_text='Little-endian uint16 occurrences on each of those pages')),
+                ('book', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='content_postings', to='api.book')),
+            ],
+            options={
+                'unique_together': {('term', 'book')},
+            },
+        ),
+        migrations.CreateModel(
+            name='BookPageText',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('page', models.PositiveIntegerField(help_text='1-based')),
+                ('text', models.BinaryField()),
+                ('book', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='page_texts', to='api.book')),
+            ],
+            options={
+                'ordering': ['page'],
+                'unique_together': {('book', 'page')},
+            },
+        ),
+    ]
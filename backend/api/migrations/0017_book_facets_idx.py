@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-17 18:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0016_book_content_search'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['department', 'semester', 'is_premium'], name='book_facets_idx'),
+        ),
+    ]
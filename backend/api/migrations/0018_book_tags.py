@@ -0,0 +1,66 @@
+# Generated by Django 5.2.18 on 2026-10-17 18:57
+
+import re
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def parse_tags(text):
+    # As api.tags.parse_tags at the time of this migration
+    names = (re.sub(r'\s+', ' ', name).strip().lower()[:50] for name in (text or '').split(','))
+    return list(dict.fromkeys(name for name in names if name))
+
+
+def populate_tags(apps, schema_editor):
+    Book = apps.get_model('api', 'Book')
+    Tag = apps.get_model('api', 'Tag')
+    BookTag = apps.get_model('api', 'BookTag')
+    book_tags = {
+        book_id: parse_tags(tags)
+        for book_id, tags in Book.objects.exclude(tags__isnull=True).exclude(tags='').values_list('id', 'tags').iterator()
+    }
+    counts = {}
+    for names in book_tags.values():
+        for name in names:
+            counts[name] = counts.get(name, 0) + 1
+    Tag.objects.bulk_create([Tag(name=name, book_count=count) for name, count in counts.items()], batch_size=1000)
+    tag_ids = dict(Tag.objects.values_list('name', 'id'))
+    BookTag.objects.bulk_create((
+        BookTag(book_id=book_id, tag_id=tag_ids[name])
+        for book_id, names in book_tags.items() for name in names
+    ), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0017_book_facets_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tag',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(help_text='Lowercase, single-spaced', max_length=50, unique=True)),
+                ('book_count', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='BookTag',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('book', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='book_tags', to='api.book')),
+                ('tag', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='book_tags', to='api.tag')),
+            ],
+            options={
+                'unique_together': {('tag', 'book')},
+            },
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='tag_set',
+            field=models.ManyToManyField(blank=True, related_name='books', through='api.BookTag', to='api.tag'),
+        ),
+        migrations.RunPython(populate_tags, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-17 20:40
+
+from django.core.management import call_command
+from django.db import migrations
+
+
+def create_cache_table(apps, schema_editor):
+    # The catalog response cache defaults to a database table shared by every
+    # instance; does nothing when CACHES uses another backend
+    call_command('createcachetable', database=schema_editor.connection.alias, verbosity=0)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0019_book_changes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_cache_table, migrations.RunPython.noop),
+    ]
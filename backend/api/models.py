@@ -44,6 +44,13 @@ class AdminProfile(models.Model):
     def __str__(self):
         return f"Admin: {self.name} ({self.email})"
 
+class BookManager(models.Manager):
+    """Live books only; deleted books stay as tombstones for delta sync (Book.all_objects)"""
+
+    def get_queryset(self):
+        return super().get_queryset().filter(deleted_at__isnull=True)
+
+
 class Book(models.Model):
     id = models.CharField(max_length=128, primary_key=True, help_text="UUID")
     title = models.CharField(max_length=255)
@@ -63,16 +70,109 @@ class Book(models.Model):
     price = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
     featured = models.BooleanField(default=False)
     tags = models.TextField(blank=True, null=True, help_text="Comma-separated tags")
+    # The same tags as Tag rows, kept in sync with `tags` by api/tags.py
+    tag_set = models.ManyToManyField('Tag', through='BookTag', related_name='books', blank=True)
     
     # Metadata
     uploaded_by = models.CharField(max_length=128, help_text="Firebase UID of admin")
     uploaded_at = models.DateTimeField(auto_now_add=True)
     views = models.IntegerField(default=0)
     downloads = models.IntegerField(default=0)
+    # Set once the PDF has been split into BookPageSegment rows
+    page_count = models.PositiveIntegerField(blank=True, null=True)
+    # Upload-time PDF optimization: pdf_file is the served (optimized) variant and
+    # original_pdf_file the file as uploaded, when they differ
+    original_pdf_file = models.FileField(upload_to='books/pdfs/', blank=True, null=True)
+    pdf_original_size = models.PositiveBigIntegerField(blank=True, null=True)
+    pdf_optimized_size = models.PositiveBigIntegerField(blank=True, null=True)
+    pdf_optimizer = models.CharField(max_length=20, blank=True, default='', help_text="'qpdf', 'pypdf2', or 'none' when the rewrite did not help")
+    pdf_optimized_at = models.DateTimeField(blank=True, null=True)
+    # Set once the PDF text has been extracted into BookPageText / BookContentPosting rows
+    content_indexed_at = models.DateTimeField(blank=True, null=True)
+    # Resized copies of cover_image: [{'width': 320, 'format': 'webp', 'name': ...}, ...]
+    cover_variants = models.JSONField(default=list, blank=True)
+    # Last change clients see (books/changes/); queryset.update() callers set it themselves
+    updated_at = models.DateTimeField(auto_now=True)
+    # Set instead of deleting the row, so clients syncing changes learn about the deletion
+    deleted_at = models.DateTimeField(blank=True, null=True)
+
+    objects = BookManager()
+    all_objects = models.Manager()
+
+    class Meta:
+        indexes = [
+            # Newest-first listing and its keyset pagination
+            models.Index(fields=['uploaded_at', 'id'], name='book_uploaded_at_id_idx'),
+            # Department / semester filters, and covers the facet counts' GROUP BY
+            models.Index(fields=['department', 'semester', 'is_premium'], name='book_facets_idx'),
+            # Keyset scan of books/changes/
+            models.Index(fields=['updated_at', 'id'], name='book_updated_at_id_idx'),
+        ]
 
     def __str__(self):
         return self.title
 
+class BookPageSegment(models.Model):
+    """A range of pages of a book's PDF, stored as its own small PDF for lazy reading"""
+    book = models.ForeignKey(Book, on_delete=models.CASCADE, related_name='page_segments')
+    first_page = models.PositiveIntegerField(help_text="1-based, inclusive")
+    last_page = models.PositiveIntegerField(help_text="1-based, inclusive")
+    file = models.FileField(upload_to='books/pages/')
+    size = models.PositiveIntegerField()
+
+    class Meta:
+        unique_together = ('book', 'first_page')
+        ordering = ['first_page']
+
+    def __str__(self):
+        return f"{self.book_id} pages {self.first_page}-{self.last_page}"
+
+class BookPageText(models.Model):
+    """Text of one page of a book's PDF, zlib-compressed, for in-book search snippets"""
+    book = models.ForeignKey(Book, on_delete=models.CASCADE, related_name='page_texts')
+    page = models.PositiveIntegerField(help_text="1-based")
+    text = models.BinaryField()
+
+    class Meta:
+        unique_together = ('book', 'page')
+        ordering = ['page']
+
+    def __str__(self):
+        return f"{self.book_id} page {self.page} text"
+
+class BookContentPosting(models.Model):
+    """The pages of a book containing a stemmed term, for in-book search"""
+    term = models.CharField(max_length=64)
+    book = models.ForeignKey(Book, on_delete=models.CASCADE, related_name='content_postings')
+    pages = models.BinaryField(help_text="Little-endian uint32 page numbers, ascending")
+    counts = models.BinaryField(help_text="Little-endian uint16 occurrences on each of those pages")
+
+    class Meta:
+        # Also the index term lookups go through
+        unique_together = ('term', 'book')
+
+    def __str__(self):
+        return f"{self.term!r} in {self.book_id}"
+
+class Tag(models.Model):
+    """A tag of one or more books, with the number of books carrying it"""
+    name = models.CharField(max_length=50, unique=True, help_text="Lowercase, single-spaced")
+    book_count = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return self.name
+
+class BookTag(models.Model):
+    book = models.ForeignKey(Book, on_delete=models.CASCADE, related_name='book_tags')
+    tag = models.ForeignKey(Tag, on_delete=models.CASCADE, related_name='book_tags')
+
+    class Meta:
+        # Also the index tag filters go through (tag -> books)
+        unique_together = ('tag', 'book')
+
+    def __str__(self):
+        return f"{self.book_id} #{self.tag_id}"
+
 class Purchase(models.Model):
     user = models.ForeignKey(UserProfile, on_delete=models.CASCADE, related_name='purchases')
     book = models.ForeignKey(Book, on_delete=models.CASCADE, related_name='purchases')
@@ -86,12 +186,85 @@ class Purchase(models.Model):
     def __str__(self):
         return f"{self.user.name} - {self.book.title}"
 
+class DatabaseFileManifest(models.Model):
+    """
+    Content-addressed blob stored as fixed-size DatabaseFileChunk rows.
+    Several DatabaseFile names can share one manifest; ref_count tracks them.
+    """
+    size = models.PositiveBigIntegerField()
+    checksum = models.CharField(max_length=64, unique=True, blank=True, null=True, help_text="SHA-256 hex digest of the content (empty while being written)")
+    chunk_size = models.PositiveIntegerField()
+    chunk_count = models.PositiveIntegerField(default=0)
+    ref_count = models.PositiveIntegerField(default=0)
+    # Compression applied to the stored payload ('' for raw) and its stored length
+    codec = models.CharField(max_length=10, blank=True, default='')
+    stored_size = models.PositiveBigIntegerField(default=0)
+    # Where the payload lives: DatabaseFileChunk rows, or a file in the blob store
+    location = models.CharField(max_length=10, choices=[('db', 'Database'), ('fs', 'Filesystem')], default='db')
+    path = models.CharField(max_length=255, blank=True, null=True, help_text="Path inside the blob store when location is 'fs'")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{(self.checksum or 'pending')[:12]} ({self.size} bytes)"
+
+class DatabaseFileChunk(models.Model):
+    manifest = models.ForeignKey(DatabaseFileManifest, on_delete=models.CASCADE, related_name='chunks')
+    seq = models.PositiveIntegerField()
+    data = models.BinaryField()
+
+    class Meta:
+        unique_together = ('manifest', 'seq')
+
+    def __str__(self):
+        return f"{self.manifest_id}#{self.seq}"
+
+class DatabaseFileQuerySet(models.QuerySet):
+    def with_content(self):
+        """Include the legacy single-row payload column, for the rare caller that needs it"""
+        return self.defer(None)
+
+
+class DatabaseFileManager(models.Manager.from_queryset(DatabaseFileQuerySet)):
+    """Never selects `content` unless asked to, so listings and lookups stay metadata-only"""
+
+    def get_queryset(self):
+        return super().get_queryset().defer('content')
+
+
 class DatabaseFile(models.Model):
     name = models.CharField(max_length=255, unique=True)
-    content = models.BinaryField()
+    # Legacy single-row payload; chunked files leave this empty and use `manifest`
+    content = models.BinaryField(blank=True, null=True)
+    manifest = models.ForeignKey(DatabaseFileManifest, on_delete=models.PROTECT, blank=True, null=True, related_name='files')
     size = models.PositiveIntegerField()
     content_type = models.CharField(max_length=100, blank=True, null=True)
+    # Validators for conditional GET, readable without touching the payload
+    checksum = models.CharField(max_length=64, blank=True, null=True, help_text="SHA-256 hex digest, used as the ETag")
     created_at = models.DateTimeField(auto_now_add=True)
+    modified_at = models.DateTimeField(auto_now=True)
+
+    objects = DatabaseFileManager()
 
     def __str__(self):
         return self.name
+
+class UploadSession(models.Model):
+    """
+    Resumable upload in progress. Each PUT chunk is written straight into a
+    DatabaseFileChunk row of `manifest`, which is sealed (hashed and
+    deduplicated) on completion and handed to a DatabaseFile on attach.
+    """
+    id = models.CharField(max_length=128, primary_key=True, help_text="UUID")
+    name = models.CharField(max_length=255, help_text="Storage name the file will be saved under")
+    size = models.PositiveBigIntegerField(help_text="Total size announced by the client")
+    checksum = models.CharField(max_length=64, blank=True, default='', help_text="Expected SHA-256 of the whole file, if the client sent one")
+    manifest = models.ForeignKey(DatabaseFileManifest, on_delete=models.PROTECT, related_name='upload_sessions')
+    received = models.PositiveBigIntegerField(default=0, help_text="Bytes confirmed so far; clients resume from here")
+    completed = models.BooleanField(default=False)
+    content_type = models.CharField(max_length=100, blank=True, null=True, help_text="Sniffed on completion")
+    created_by = models.CharField(max_length=128, help_text="Firebase UID of admin")
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name} ({self.received}/{self.size} bytes)"
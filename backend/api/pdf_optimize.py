@@ -0,0 +1,121 @@
+"""
+Upload-time PDF optimization
+
+Book PDFs are rewritten off the request path so viewers can draw the first
+page sooner. When qpdf is installed the file is linearized ("fast web
+view") and packed into object streams. Otherwise PyPDF2 rewrites it with
+compressed content streams, which drops incremental-update leftovers but
+cannot linearize, so that rewrite is only kept when it is smaller. The
+rewrite becomes the served pdf_file and the upload is kept as
+original_pdf_file.
+"""
+
+import os
+import shutil
+import logging
+import subprocess
+import tempfile
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.utils import timezone
+from PyPDF2 import PdfReader, PdfWriter
+from .models import Book
+from .storage import unhashed_name
+from .response_cache import invalidate_catalog
+
+logger = logging.getLogger(__name__)
+
+OPTIMIZER_QPDF = 'qpdf'
+OPTIMIZER_PYPDF2 = 'pypdf2'
+OPTIMIZER_NONE = 'none'
+
+QPDF_ARGS = ['--linearize', '--object-streams=generate']
+QPDF_TIMEOUT = 300
+
+COPY_BLOCK_SIZE = 256 * 1024
+
+
+def get_qpdf():
+    return shutil.which(getattr(settings, 'QPDF_BINARY', 'qpdf'))
+
+
+def optimize_pdf(source_path, target_path):
+    """Rewrite the PDF at `source_path` into `target_path`; returns the optimizer used"""
+    qpdf = get_qpdf()
+    if qpdf:
+        result = subprocess.run(
+            [qpdf, *QPDF_ARGS, source_path, target_path], capture_output=True, timeout=QPDF_TIMEOUT
+        )
+        # Exit status 3 means success with warnings
+        if result.returncode in (0, 3):
+            return OPTIMIZER_QPDF
+        logger.warning(f"qpdf failed on {source_path}: {result.stderr.decode(errors='replace')[:200]}")
+
+    reader = PdfReader(source_path)
+    writer = PdfWriter()
+    writer.append(reader)
+    for page in writer.pages:
+        page.compress_content_streams()
+    if reader.metadata:
+        writer.add_metadata(reader.metadata)
+    with open(target_path, 'wb') as target:
+        writer.write(target)
+    return OPTIMIZER_PYPDF2
+
+
+def optimize_book_pdf(book_id, force=False):
+    """
+    Optimize a book's PDF, always starting from the original upload.
+    Returns True when the served file changed.
+    """
+    book = Book.objects.filter(pk=book_id).only('id', 'pdf_file', 'original_pdf_file', 'pdf_optimizer').first()
+    if book is None or not book.pdf_file or (book.pdf_optimizer and not force):
+        return False
+    served_name = book.pdf_file.name
+    original_name = book.original_pdf_file.name or ''
+    source_name = original_name or served_name
+
+    with tempfile.TemporaryDirectory() as tmp:
+        source_path = os.path.join(tmp, 'source.pdf')
+        target_path = os.path.join(tmp, 'optimized.pdf')
+        with default_storage.open(source_name) as source, open(source_path, 'wb') as copy:
+            shutil.copyfileobj(source, copy, COPY_BLOCK_SIZE)
+        optimizer = optimize_pdf(source_path, target_path)
+        original_size = os.path.getsize(source_path)
+        optimized_size = os.path.getsize(target_path)
+
+        if optimizer == OPTIMIZER_PYPDF2 and optimized_size >= original_size:
+            optimizer, optimized_size, new_name = OPTIMIZER_NONE, original_size, source_name
+        else:
+            with open(target_path, 'rb') as optimized:
+                new_name = default_storage.save(unhashed_name(source_name), File(optimized))
+
+    with transaction.atomic():
+        current = Book.objects.select_for_update().filter(pk=book_id).values_list('pdf_file', 'original_pdf_file').first()
+        stale = current is None or (current[0], current[1] or '') != (served_name, original_name)
+        if not stale:
+            Book.objects.filter(pk=book_id).update(
+                pdf_file=new_name,
+                original_pdf_file=source_name if new_name != source_name else None,
+                file_size=f'{round(optimized_size / (1024 * 1024), 2)} MB',
+                pdf_original_size=original_size,
+                pdf_optimized_size=optimized_size,
+                pdf_optimizer=optimizer,
+                pdf_optimized_at=timezone.now(),
+                updated_at=timezone.now()
+            )
+            invalidate_catalog()
+
+    if stale:
+        # The PDF was replaced meanwhile; drop our rewrite
+        if new_name != source_name:
+            default_storage.delete(new_name)
+        logger.info(f"PDF of book {book_id} changed while optimizing; discarded result")
+        return False
+    if served_name not in (new_name, source_name):
+        # Rewrite from a previous run, no longer served
+        default_storage.delete(served_name)
+    logger.info(f"Optimized book {book_id} with {optimizer}: {original_size} -> {optimized_size} bytes")
+    return new_name != served_name
@@ -0,0 +1,82 @@
+"""
+Per-page PDF segments
+
+After upload, each book PDF is split into small standalone PDFs of
+PDF_PAGES_PER_SEGMENT pages (one page by default), stored through the
+default storage under books/pages/. The reader can then fetch the page it
+shows instead of the whole book.
+"""
+
+import io
+import logging
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from PyPDF2 import PdfReader, PdfWriter
+from .models import Book, BookPageSegment
+
+logger = logging.getLogger(__name__)
+
+
+def get_pages_per_segment():
+    return max(1, getattr(settings, 'PDF_PAGES_PER_SEGMENT', 1))
+
+
+def delete_page_segments(book_id):
+    """Remove a book's segments and their stored files"""
+    names = list(BookPageSegment.objects.filter(book_id=book_id).values_list('file', flat=True))
+    BookPageSegment.objects.filter(book_id=book_id).delete()
+    Book.objects.filter(pk=book_id).update(page_count=None)
+    for name in names:
+        default_storage.delete(name)
+
+
+def split_book_pdf(book_id):
+    """
+    Split a book's PDF into page segments, replacing any existing ones.
+    Only one segment is held in memory at a time. Returns the page count,
+    or None if the book is gone or its PDF changed while splitting.
+    """
+    book = Book.objects.filter(pk=book_id).only('id', 'pdf_file').first()
+    if book is None or not book.pdf_file:
+        return None
+    source_name = book.pdf_file.name
+    per_segment = get_pages_per_segment()
+
+    segments = []
+    try:
+        with default_storage.open(source_name) as pdf:
+            reader = PdfReader(pdf)
+            page_count = len(reader.pages)
+            for first in range(0, page_count, per_segment):
+                last = min(first + per_segment, page_count)
+                writer = PdfWriter()
+                for index in range(first, last):
+                    writer.add_page(reader.pages[index])
+                buffer = io.BytesIO()
+                writer.write(buffer)
+                name = default_storage.save(f'books/pages/{book_id}/{first + 1:05d}.pdf', ContentFile(buffer.getvalue()))
+                segments.append(BookPageSegment(
+                    book_id=book_id, first_page=first + 1, last_page=last, file=name, size=buffer.tell()
+                ))
+    except Exception:
+        for segment in segments:
+            default_storage.delete(segment.file.name)
+        raise
+
+    with transaction.atomic():
+        current = Book.objects.select_for_update().filter(pk=book_id).values_list('pdf_file', flat=True).first()
+        stale = current != source_name
+        if not stale:
+            old_names = list(BookPageSegment.objects.filter(book_id=book_id).values_list('file', flat=True))
+            BookPageSegment.objects.filter(book_id=book_id).delete()
+            BookPageSegment.objects.bulk_create(segments)
+            Book.objects.filter(pk=book_id).update(page_count=page_count)
+    # Drop whichever set of files lost
+    for name in ([segment.file.name for segment in segments] if stale else old_names):
+        default_storage.delete(name)
+    if stale:
+        logger.info(f"PDF of book {book_id} changed while splitting; discarded segments")
+        return None
+    return page_count
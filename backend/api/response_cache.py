@@ -0,0 +1,112 @@
+"""
+Catalog response cache
+
+list_books and get_book_details responses are cached under their
+normalized query parameters and the current catalog version, a counter
+kept in the cache itself. Any change to a book bumps the version once the
+change commits, so every cached response goes stale at once without
+deleting anything (old entries simply expire). The counter starts from the
+clock, so an evicted counter never comes back to a version already used.
+Book saves and deletes bump it through signals; code changing books with
+queryset.update() or bulk operations calls invalidate_catalog() itself.
+
+When a key is missing, one request builds it while concurrent requests
+for the same key wait for its result (single flight, through an atomic
+cache.add() lock), instead of all hitting the database at once.
+
+User-specific fields (access, signed URLs) are never cached: views add
+them to the cached data.
+"""
+
+import json
+import time
+import hashlib
+import logging
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+VERSION_KEY = 'catalog:version'
+# Longest a build may hold its lock, and how long others wait for it
+LOCK_TIMEOUT = 30
+WAIT_TIMEOUT = 5
+POLL_INTERVAL = 0.02
+
+
+def get_cache():
+    return caches[getattr(settings, 'CATALOG_CACHE_ALIAS', 'default')]
+
+
+def get_timeout():
+    return getattr(settings, 'CATALOG_CACHE_TIMEOUT', 300)
+
+
+def get_catalog_version(cache=None):
+    cache = cache or get_cache()
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, time.time_ns() // 1000, timeout=None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def bump_catalog_version():
+    cache = get_cache()
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        # No counter: a new one starts past every version used so far
+        get_catalog_version(cache)
+
+
+def invalidate_catalog():
+    """Make cached catalog responses stale once the current transaction commits"""
+    transaction.on_commit(bump_catalog_version)
+
+
+def request_key(request, name):
+    """Cache key of a request: view name, host (responses hold absolute URLs) and sorted non-empty params"""
+    params = sorted((key, value) for key, values in request.GET.lists() for value in values if value != '')
+    raw = json.dumps([name, request.scheme, request.get_host(), params], separators=(',', ':'))
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+
+def get_or_build(cache, key, build, timeout):
+    """cache[key], built by one caller at a time; `build` returning None is not cached"""
+    value = cache.get(key)
+    if value is not None:
+        return value
+    lock_key = f'{key}:lock'
+    if cache.add(lock_key, 1, LOCK_TIMEOUT):
+        try:
+            value = build()
+            if value is not None:
+                cache.set(key, value, timeout)
+            return value
+        finally:
+            cache.delete(lock_key)
+    # Another request is building it
+    deadline = time.monotonic() + WAIT_TIMEOUT
+    while time.monotonic() < deadline:
+        time.sleep(POLL_INTERVAL)
+        value = cache.get(key)
+        if value is not None:
+            return value
+        if cache.get(lock_key) is None:
+            break
+    return build()
+
+
+def cached_response(request, name, build):
+    """The data `build()` returns for this request, from the cache when the catalog has not changed"""
+    cache = get_cache()
+    key = f'catalog:{get_catalog_version(cache)}:{name}:{request_key(request, name)}'
+    return get_or_build(cache, key, build, get_timeout())
+
+
+# Signal receiver, connected in ApiConfig.ready()
+
+def book_changed(sender, **kwargs):
+    invalidate_catalog()
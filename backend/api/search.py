@@ -0,0 +1,274 @@
+"""
+Full-text book search
+
+The catalog search box goes through search_books(), which filters a Book
+queryset down to the matches and annotates each with `search_rank`
+(higher is more relevant). The backend follows the database in use:
+
+- MySQL: a FULLTEXT index over the searched columns, queried with
+  MATCH ... AGAINST in boolean mode. InnoDB keeps the index in sync itself,
+  but leaves stopwords and words shorter than innodb_ft_min_token_size
+  out of it, so the query does not require those.
+- SQLite (USE_SQLITE): an FTS5 table, api_book_fts, ranked with bm25() and
+  weighted by column. index_book() / remove_book() keep it in sync and must
+  be called whenever a book's searched fields change.
+- 'memory': a BM25 inverted index held by each worker (see
+  api/search_index.py), for databases without a full-text engine. Signals
+  keep it in sync.
+- Anything else: the plain icontains scan, unranked.
+
+SEARCH_BACKEND = 'mysql' | 'sqlite' | 'memory' | 'basic' overrides the choice.
+Whatever the backend, a query that looks like an ISBN is matched as a
+prefix of the book ISBNs, hyphens and spaces ignored.
+
+fuzzy_search_books() is the typo-tolerant alternative, matching titles
+and authors through the trigram index of api/fuzzy_index.py.
+"""
+
+import re
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q, Case, When, Value, FloatField
+from django.db.models.functions import Replace, Upper
+from django.db.models.lookups import StartsWith
+from .search_index import get_search_index, rebuild_search_index
+from .fuzzy_index import MAX_CANDIDATES as FUZZY_MAX_CANDIDATES, MAX_LIMIT as FUZZY_MAX_RESULTS, fuzzy_search
+
+# Searched Book columns, in the order the FULLTEXT index / FTS5 table declare them
+SEARCH_FIELDS = ('title', 'author', 'description', 'isbn', 'tags')
+
+FULLTEXT_INDEX = 'book_fulltext_idx'
+FTS_TABLE = 'api_book_fts'
+
+# bm25() weights per FTS5 column (book_id first, never matched)
+FTS_WEIGHTS = (0.0, 10.0, 6.0, 1.0, 8.0, 4.0)
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+# Whole ISBN-10 / ISBN-13, or the start of an ISBN-13 (typed 978-0-26...)
+_ISBN_RE = re.compile(r'^(?:97[89]\d{3,10}|\d{9}[\dX])$')
+
+# InnoDB's default full-text stopwords (INFORMATION_SCHEMA.INNODB_FT_DEFAULT_STOPWORD)
+INNODB_STOPWORDS = frozenset((
+    'a about an are as at be by com de en for from how i in is it la of on or that the this to '
+    'was what when where who will with und www'
+).split())
+
+
+def tokenize_query(query):
+    return _TOKEN_RE.findall(query.lower())
+
+
+def isbn_prefix(query):
+    """The query as a bare ISBN (prefix) when it looks like one, else None"""
+    compact = re.sub(r'[\s-]', '', query).upper()
+    if compact.startswith('ISBN'):
+        compact = compact[4:].lstrip(':')
+    return compact if _ISBN_RE.match(compact) else None
+
+
+def filter_isbn(queryset, prefix):
+    """Books whose ISBN, without hyphens and spaces, starts with `prefix`"""
+    compact = Upper(Replace(Replace('isbn', Value('-'), Value('')), Value(' '), Value('')))
+    return queryset.filter(StartsWith(compact, prefix)).annotate(search_rank=Value(1.0, output_field=FloatField()))
+
+
+def filter_ranked(queryset, results):
+    """Restrict `queryset` to the books of [(book_id, score)] results, annotated with `search_rank`"""
+    if not results:
+        return queryset.none().annotate(search_rank=Value(0.0, output_field=FloatField()))
+    return queryset.filter(pk__in=[book_id for book_id, _ in results]).annotate(search_rank=Case(
+        *[When(pk=book_id, then=Value(score)) for book_id, score in results],
+        default=Value(0.0), output_field=FloatField()
+    ))
+
+
+class BasicSearchBackend:
+    """Substring match on every searched column; no ranking, no index to maintain"""
+    name = 'basic'
+
+    def filter(self, queryset, query):
+        condition = Q()
+        for field in SEARCH_FIELDS:
+            condition |= Q(**{f'{field}__icontains': query})
+        return queryset.filter(condition).annotate(search_rank=Value(0.0, output_field=FloatField()))
+
+    def index_book(self, book):
+        pass
+
+    def remove_book(self, book_id):
+        pass
+
+    def rebuild(self):
+        return 0
+
+
+class MySQLFullTextBackend(BasicSearchBackend):
+    name = 'mysql'
+
+    @staticmethod
+    def is_indexed(token):
+        """False for the words InnoDB leaves out of FULLTEXT indexes, which a +word can never match"""
+        min_size = getattr(settings, 'MYSQL_FT_MIN_TOKEN_SIZE', 3)
+        return len(token) >= min_size and token not in INNODB_STOPWORDS
+
+    @classmethod
+    def boolean_query(cls, tokens):
+        """
+        Every indexed word required, the last one as a prefix (search as you
+        type). Unindexed words are left out, except a last one, which still
+        ranks books with a word starting with it higher. None when no word
+        can be required.
+        """
+        words = [f'+{token}' for token in tokens[:-1] if cls.is_indexed(token)]
+        last = tokens[-1]
+        if cls.is_indexed(last):
+            words.append(f'+{last}*')
+        elif not words:
+            return None
+        else:
+            words.append(f'{last}*')
+        return ' '.join(words)
+
+    def filter(self, queryset, query):
+        tokens = tokenize_query(query)
+        boolean_query = self.boolean_query(tokens) if tokens else None
+        if boolean_query is None:
+            # Only short words or stopwords ("os", "c"): the index cannot find them
+            return super().filter(queryset, query)
+        table = queryset.model._meta.db_table
+        columns = ', '.join(f'{table}.{field}' for field in SEARCH_FIELDS)
+        match = f'MATCH ({columns}) AGAINST (%s IN BOOLEAN MODE)'
+        return queryset.extra(
+            select={'search_rank': match}, select_params=[boolean_query],
+            where=[match], params=[boolean_query]
+        )
+
+
+class SQLiteFTSBackend(BasicSearchBackend):
+    name = 'sqlite'
+
+    @staticmethod
+    def match_query(tokens):
+        # Quoted so FTS5 operators in user input are taken literally; the
+        # last word is a prefix (search as you type)
+        phrases = [f'"{token}"' for token in tokens[:-1]]
+        phrases.append(f'"{tokens[-1]}"*')
+        return ' '.join(phrases)
+
+    def filter(self, queryset, query):
+        tokens = tokenize_query(query)
+        if not tokens:
+            return super().filter(queryset, query)
+        table = queryset.model._meta.db_table
+        weights = ', '.join(str(weight) for weight in FTS_WEIGHTS)
+        return queryset.extra(
+            tables=[FTS_TABLE],
+            select={'search_rank': f'-bm25({FTS_TABLE}, {weights})'},
+            where=[f'{FTS_TABLE}.book_id = {table}.id', f'{FTS_TABLE} MATCH %s'],
+            params=[self.match_query(tokens)]
+        )
+
+    def index_book(self, book):
+        values = [getattr(book, field) or '' for field in SEARCH_FIELDS]
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE book_id = %s', [book.pk])
+            cursor.execute(
+                f'INSERT INTO {FTS_TABLE} (book_id, {", ".join(SEARCH_FIELDS)}) VALUES (%s, %s, %s, %s, %s, %s)',
+                [book.pk, *values]
+            )
+
+    def remove_book(self, book_id):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE book_id = %s', [book_id])
+
+    def rebuild(self):
+        columns = ', '.join(SEARCH_FIELDS)
+        coalesced = ', '.join(f"COALESCE({field}, '')" for field in SEARCH_FIELDS)
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE}')
+            cursor.execute(f'INSERT INTO {FTS_TABLE} (book_id, {columns}) SELECT id, {coalesced} FROM api_book '
+                           'WHERE deleted_at IS NULL')
+            cursor.execute(f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('optimize')")
+            cursor.execute(f'SELECT COUNT(*) FROM {FTS_TABLE}')
+            return cursor.fetchone()[0]
+
+
+class MemoryBM25Backend(BasicSearchBackend):
+    name = 'memory'
+
+    # Best matches handed to the database as an id list
+    MAX_RESULTS = 500
+
+    def filter(self, queryset, query):
+        return filter_ranked(queryset, get_search_index().search(query, limit=self.MAX_RESULTS))
+
+    def rebuild(self):
+        return rebuild_search_index()
+
+
+BACKENDS = {
+    backend.name: backend
+    for backend in (BasicSearchBackend, MySQLFullTextBackend, SQLiteFTSBackend, MemoryBM25Backend)
+}
+
+
+def get_search_backend():
+    """Return the search backend for the configured (or current) database"""
+    name = getattr(settings, 'SEARCH_BACKEND', None)
+    if not name:
+        name = connection.vendor if connection.vendor in BACKENDS else BasicSearchBackend.name
+    return BACKENDS[name]()
+
+
+def search_books(queryset, query):
+    """Filter `queryset` to books matching `query`, annotated with `search_rank`"""
+    prefix = isbn_prefix(query)
+    if prefix:
+        return filter_isbn(queryset, prefix)
+    return get_search_backend().filter(queryset, query)
+
+
+class FuzzyMatches:
+    """A query's best matches in the fuzzy index, fetched once and widened on demand"""
+
+    # Matches fetched per result wanted, as filters may drop most of them
+    CANDIDATE_FACTOR = 5
+
+    def __init__(self, query):
+        self.query = query
+        self.results = []
+        self.complete = False
+
+    def top(self, count):
+        if len(self.results) < count and not self.complete:
+            self.results = fuzzy_search(self.query, limit=count)
+            self.complete = len(self.results) < count or count >= FUZZY_MAX_CANDIDATES
+        return self.results[:count]
+
+
+def fuzzy_search_books(queryset, query, limit=FUZZY_MAX_RESULTS, matches=None):
+    """
+    Typo-tolerant title / author match, annotated with `search_rank`
+    (similarity, 0-1): the best `limit` matches among the books of
+    `queryset`, so filter it before, not after. Pass the same FuzzyMatches
+    as `matches` to rank one query against several querysets.
+    """
+    matches = matches or FuzzyMatches(query)
+    count = limit * FuzzyMatches.CANDIDATE_FACTOR
+    while True:
+        candidates = matches.top(count)
+        kept = set(queryset.filter(pk__in=[book_id for book_id, _ in candidates]).values_list('pk', flat=True))
+        results = [item for item in candidates if item[0] in kept]
+        if len(results) >= limit or matches.complete:
+            return filter_ranked(queryset, results[:limit])
+        count *= FuzzyMatches.CANDIDATE_FACTOR
+
+
+def index_book(book):
+    """Add or refresh a book in the search index, in the caller's transaction"""
+    get_search_backend().index_book(book)
+
+
+def remove_book(book_id):
+    get_search_backend().remove_book(book_id)
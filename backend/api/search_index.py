@@ -0,0 +1,381 @@
+"""
+In-process BM25 search index
+
+For deployments without a database full-text engine (SEARCH_BACKEND =
+'memory'). Every searched Book field is tokenized and stemmed into an
+inverted index held by the worker:
+
+- postings per term are three parallel arrays (document number, field,
+  term frequency), appended in document order, so the whole catalog costs a
+  few bytes per word occurrence;
+- documents are scored with BM25F, each field's frequency weighted by
+  FIELD_BOOSTS and normalized by that field's average length;
+- the index is built from one streamed query, or loaded from the snapshot
+  at SEARCH_INDEX_SNAPSHOT written by `manage.py rebuild_search_index`, and
+  kept current by post_save / post_delete signals. Replaced or deleted books
+  are tombstoned and the arrays compacted once tombstones pile up.
+
+Other workers pick up a newer snapshot on their next search; changes made
+through another worker show up once the snapshot is rewritten.
+"""
+
+import os
+import re
+import math
+import heapq
+import pickle
+import logging
+import tempfile
+import threading
+from array import array
+from bisect import bisect_left
+from collections import defaultdict
+from operator import itemgetter
+from django.conf import settings
+from django.db import transaction
+from .stemmer import stem
+
+logger = logging.getLogger(__name__)
+
+# Field -> BM25F weight. Title matches count most, then author and tags, then the rest.
+FIELD_BOOSTS = {
+    'title': 3.0,
+    'author': 2.0,
+    'tags': 2.0,
+    'isbn': 1.5,
+    'description': 1.0,
+}
+FIELDS = tuple(FIELD_BOOSTS)
+
+K1 = 1.2
+B = 0.75
+
+# Expansions of the last (possibly unfinished) query word
+MAX_PREFIX_TERMS = 50
+# Compact once this share of document numbers belongs to removed books
+COMPACT_RATIO = 0.25
+
+SNAPSHOT_VERSION = 1
+
+STOPWORDS = frozenset(
+    'a an and are as at be by for from in into is it of on or the to with'.split()
+)
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def tokenize(text):
+    """Lowercased, stemmed words of `text`, stopwords removed"""
+    if not text:
+        return []
+    return [stem(word) for word in _TOKEN_RE.findall(text.lower()) if word not in STOPWORDS]
+
+
+class InvertedIndex:
+    def __init__(self):
+        self.book_ids = []                                   # doc number -> book id, None once removed
+        self.doc_numbers = {}                                # book id -> doc number
+        self.doc_terms = []                                  # doc number -> terms, to undo a document
+        self.lengths = {field: array('I') for field in FIELDS}
+        self.total_lengths = dict.fromkeys(FIELDS, 0)
+        self.postings = {}                                   # term -> (docs 'I', fields 'B', freqs 'H')
+        self.doc_freqs = {}                                  # term -> live documents containing it
+        self.removed = 0
+        self.snapshot_mtime = None
+        self._sorted_terms = None
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self.doc_numbers)
+
+    # Building
+
+    def add(self, book_id, values):
+        """Index (or re-index) a book; `values` maps field name -> text"""
+        with self._lock:
+            self.remove(book_id)
+            doc = len(self.book_ids)
+            self.book_ids.append(book_id)
+            self.doc_numbers[book_id] = doc
+            terms = set()
+            for field_number, field in enumerate(FIELDS):
+                tokens = tokenize(values.get(field))
+                self.lengths[field].append(len(tokens))
+                self.total_lengths[field] += len(tokens)
+                counts = defaultdict(int)
+                for token in tokens:
+                    counts[token] += 1
+                for term, count in counts.items():
+                    entry = self.postings.get(term)
+                    if entry is None:
+                        entry = self.postings[term] = (array('I'), array('B'), array('H'))
+                        self._sorted_terms = None
+                    entry[0].append(doc)
+                    entry[1].append(field_number)
+                    entry[2].append(min(count, 0xFFFF))
+                    terms.add(term)
+            for term in terms:
+                self.doc_freqs[term] = self.doc_freqs.get(term, 0) + 1
+            self.doc_terms.append(tuple(terms))
+
+    def remove(self, book_id):
+        with self._lock:
+            doc = self.doc_numbers.pop(book_id, None)
+            if doc is None:
+                return
+            self.book_ids[doc] = None
+            for field in FIELDS:
+                self.total_lengths[field] -= self.lengths[field][doc]
+            for term in self.doc_terms[doc]:
+                self.doc_freqs[term] -= 1
+            self.doc_terms[doc] = ()
+            self.removed += 1
+            if self.removed > 1000 and self.removed > COMPACT_RATIO * len(self.book_ids):
+                self.compact()
+
+    def compact(self):
+        """Drop removed documents from the postings and renumber the rest"""
+        with self._lock:
+            renumber = array('i', [-1]) * len(self.book_ids)
+            book_ids, doc_terms = [], []
+            lengths = {field: array('I') for field in FIELDS}
+            for doc, book_id in enumerate(self.book_ids):
+                if book_id is None:
+                    continue
+                renumber[doc] = len(book_ids)
+                book_ids.append(book_id)
+                doc_terms.append(self.doc_terms[doc])
+                for field in FIELDS:
+                    lengths[field].append(self.lengths[field][doc])
+
+            postings = {}
+            for term, (docs, fields, freqs) in self.postings.items():
+                if not self.doc_freqs.get(term):
+                    self.doc_freqs.pop(term, None)
+                    continue
+                entry = (array('I'), array('B'), array('H'))
+                for doc, field_number, freq in zip(docs, fields, freqs):
+                    if renumber[doc] >= 0:
+                        entry[0].append(renumber[doc])
+                        entry[1].append(field_number)
+                        entry[2].append(freq)
+                postings[term] = entry
+
+            self.book_ids, self.doc_terms, self.lengths, self.postings = book_ids, doc_terms, lengths, postings
+            self.doc_numbers = {book_id: doc for doc, book_id in enumerate(book_ids)}
+            self.removed = 0
+            self._sorted_terms = None
+
+    # Searching
+
+    def _prefix_terms(self, prefix):
+        if self._sorted_terms is None:
+            self._sorted_terms = sorted(self.postings)
+        terms = self._sorted_terms
+        matches = []
+        i = bisect_left(terms, prefix)
+        while i < len(terms) and terms[i].startswith(prefix):
+            if self.doc_freqs.get(terms[i]):
+                matches.append(terms[i])
+            i += 1
+        matches.sort(key=lambda term: self.doc_freqs[term], reverse=True)
+        return matches[:MAX_PREFIX_TERMS]
+
+    def _query_groups(self, query):
+        """One list of index terms per query word; any term of a group satisfies the word"""
+        words = [word for word in _TOKEN_RE.findall(query.lower()) if word not in STOPWORDS]
+        groups = [[stem(word)] for word in words]
+        if words and len(words[-1]) >= 2:
+            # The last word may still be being typed
+            last = words[-1]
+            expansions = self._prefix_terms(last)
+            groups[-1] = list(dict.fromkeys(groups[-1] + expansions))
+        return groups
+
+    def _entries(self, term, candidates):
+        """(doc, field, freq) postings of `term`, restricted to `candidates` when given"""
+        docs, fields, freqs = self.postings[term]
+        if candidates is None or len(candidates) * 16 > len(docs):
+            for entry in zip(docs, fields, freqs):
+                if candidates is None or entry[0] in candidates:
+                    yield entry
+            return
+        # Few candidates left: binary search them in the (doc-ordered) postings
+        count = len(docs)
+        for doc in sorted(candidates):
+            i = bisect_left(docs, doc)
+            while i < count and docs[i] == doc:
+                yield doc, fields[i], freqs[i]
+                i += 1
+
+    def search(self, query, limit=None):
+        """[(book_id, score)] of books matching every query word, best first"""
+        with self._lock:
+            groups = self._query_groups(query)
+            if not groups:
+                return []
+            live = len(self.doc_numbers)
+            book_ids = self.book_ids
+            lengths = [self.lengths[field] for field in FIELDS]
+            # BM25F field weight of a document: boost / (1 - B + B * length / average length)
+            boosts = [FIELD_BOOSTS[field] for field in FIELDS]
+            slopes = [B / ((self.total_lengths[field] / live if live else 0) or 1) for field in FIELDS]
+
+            # Rarest word first: later words only score documents still in the running
+            groups.sort(key=lambda group: sum(len(self.postings[term][0]) for term in group if term in self.postings))
+            scores = None
+            for group in groups:
+                group_scores = defaultdict(float)
+                for term in group:
+                    doc_freq = self.doc_freqs.get(term)
+                    if not doc_freq:
+                        continue
+                    idf = math.log(1 + (live - doc_freq + 0.5) / (doc_freq + 0.5))
+                    weighted = defaultdict(float)
+                    for doc, field_number, freq in self._entries(term, scores):
+                        if book_ids[doc] is None:
+                            continue
+                        weighted[doc] += boosts[field_number] * freq / (1 - B + slopes[field_number] * lengths[field_number][doc])
+                    for doc, tf in weighted.items():
+                        group_scores[doc] += idf * tf * (K1 + 1) / (tf + K1)
+                if scores is None:
+                    scores = group_scores
+                else:
+                    scores = {doc: score + group_scores[doc] for doc, score in scores.items() if doc in group_scores}
+                if not scores:
+                    return []
+
+            if limit is None:
+                ranked = sorted(scores.items(), key=itemgetter(1), reverse=True)
+            else:
+                ranked = heapq.nlargest(limit, scores.items(), key=itemgetter(1))
+            return [(book_ids[doc], score) for doc, score in ranked]
+
+    # Snapshots
+
+    def save(self, path):
+        """Write the index to `path` atomically"""
+        with self._lock:
+            state = {
+                'version': SNAPSHOT_VERSION,
+                'book_ids': self.book_ids,
+                'doc_terms': self.doc_terms,
+                'lengths': self.lengths,
+                'total_lengths': self.total_lengths,
+                'postings': self.postings,
+                'doc_freqs': self.doc_freqs,
+                'removed': self.removed,
+            }
+            directory = os.path.dirname(os.path.abspath(path))
+            fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.search-index-')
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+                os.replace(tmp_path, path)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+
+    @classmethod
+    def load(cls, path):
+        """Read a snapshot written by save(); returns None if it is missing or outdated"""
+        try:
+            with open(path, 'rb') as f:
+                mtime = os.fstat(f.fileno()).st_mtime
+                state = pickle.load(f)
+        except FileNotFoundError:
+            return None
+        if state.get('version') != SNAPSHOT_VERSION:
+            return None
+        index = cls()
+        for key in ('book_ids', 'doc_terms', 'lengths', 'total_lengths', 'postings', 'doc_freqs', 'removed'):
+            setattr(index, key, state[key])
+        index.doc_numbers = {book_id: doc for doc, book_id in enumerate(index.book_ids) if book_id is not None}
+        index.snapshot_mtime = mtime
+        return index
+
+
+def build_index():
+    """Index the whole catalog from one streamed query"""
+    from .models import Book
+    index = InvertedIndex()
+    rows = Book.objects.order_by().values_list('id', *FIELDS).iterator(chunk_size=2000)
+    for book_id, *values in rows:
+        index.add(book_id, dict(zip(FIELDS, values)))
+    return index
+
+
+def get_snapshot_path():
+    return getattr(settings, 'SEARCH_INDEX_SNAPSHOT', '') or None
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def _snapshot_mtime(path):
+    try:
+        return os.stat(path).st_mtime
+    except (FileNotFoundError, TypeError):
+        return None
+
+
+def get_search_index():
+    """Return this worker's index, loading the newest snapshot or building it on first use"""
+    global _index
+    path = get_snapshot_path()
+    index = _index
+    if index is not None:
+        mtime = _snapshot_mtime(path) if path else None
+        if mtime is None or mtime == index.snapshot_mtime:
+            return index
+    with _index_lock:
+        if _index is None or (path and _snapshot_mtime(path) not in (None, _index.snapshot_mtime)):
+            loaded = InvertedIndex.load(path) if path else None
+            if loaded is not None:
+                _index = loaded
+                logger.info(f"Loaded search index snapshot {path} ({len(loaded)} books)")
+            elif _index is None:
+                _index = build_index()
+                logger.info(f"Built search index ({len(_index)} books)")
+        return _index
+
+
+def rebuild_search_index():
+    """Rebuild from the database, replace this worker's index and write the snapshot"""
+    global _index
+    index = build_index()
+    path = get_snapshot_path()
+    if path:
+        index.save(path)
+        index.snapshot_mtime = _snapshot_mtime(path)
+    with _index_lock:
+        _index = index
+    return len(index)
+
+
+def warm_up_search_index():
+    """Load or build the index in the background, so the first search does not wait for it"""
+    threading.Thread(target=get_search_index, name='search-index', daemon=True).start()
+
+
+# Signal receivers, connected in ApiConfig.ready(). A worker that has not
+# loaded an index yet has nothing to update.
+
+def book_saved(sender, instance, **kwargs):
+    if _index is None:
+        return
+    if instance.deleted_at is not None:
+        # Soft-deleted: only its tombstone remains
+        book_deleted(sender, instance)
+        return
+    values = {field: getattr(instance, field) for field in FIELDS}
+    book_id = instance.pk
+    transaction.on_commit(lambda: _index.add(book_id, values))
+
+
+def book_deleted(sender, instance, **kwargs):
+    if _index is None:
+        return
+    book_id = instance.pk
+    transaction.on_commit(lambda: _index.remove(book_id))
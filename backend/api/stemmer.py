@@ -0,0 +1,137 @@
+"""
+Porter stemmer for English
+
+The original algorithm (M.F. Porter, 1980), used to reduce search terms
+and indexed words to a common stem ("connected", "connection" and
+"connecting" all become "connect").
+"""
+
+from functools import lru_cache
+
+VOWELS = frozenset('aeiou')
+
+
+def _is_consonant(word, i):
+    if word[i] in VOWELS:
+        return False
+    if word[i] == 'y':
+        return i == 0 or not _is_consonant(word, i - 1)
+    return True
+
+
+def _measure(stem):
+    """Number of vowel-consonant sequences (the m in [C](VC){m}[V])"""
+    m = 0
+    previous_vowel = False
+    for i in range(len(stem)):
+        consonant = _is_consonant(stem, i)
+        if consonant and previous_vowel:
+            m += 1
+        previous_vowel = not consonant
+    return m
+
+
+def _has_vowel(stem):
+    return any(not _is_consonant(stem, i) for i in range(len(stem)))
+
+
+def _ends_double_consonant(word):
+    return len(word) >= 2 and word[-1] == word[-2] and _is_consonant(word, len(word) - 1)
+
+
+def _ends_cvc(word):
+    """consonant-vowel-consonant, the last consonant not w, x or y"""
+    return (
+        len(word) >= 3
+        and _is_consonant(word, len(word) - 3)
+        and not _is_consonant(word, len(word) - 2)
+        and _is_consonant(word, len(word) - 1)
+        and word[-1] not in 'wxy'
+    )
+
+
+def _replace(word, rules, min_measure):
+    """Apply the first rule whose suffix matches; stop there even if m is too small"""
+    for suffix, replacement in rules:
+        if word.endswith(suffix):
+            stem = word[:len(word) - len(suffix)]
+            if _measure(stem) > min_measure:
+                return stem + replacement
+            return word
+    return word
+
+
+STEP2 = (
+    ('ational', 'ate'), ('tional', 'tion'), ('enci', 'ence'), ('anci', 'ance'), ('izer', 'ize'),
+    ('abli', 'able'), ('alli', 'al'), ('entli', 'ent'), ('eli', 'e'), ('ousli', 'ous'),
+    ('ization', 'ize'), ('ation', 'ate'), ('ator', 'ate'), ('alism', 'al'), ('iveness', 'ive'),
+    ('fulness', 'ful'), ('ousness', 'ous'), ('aliti', 'al'), ('iviti', 'ive'), ('biliti', 'ble'),
+)
+STEP3 = (
+    ('icate', 'ic'), ('ative', ''), ('alize', 'al'), ('iciti', 'ic'), ('ical', 'ic'), ('ful', ''), ('ness', ''),
+)
+STEP4 = (
+    'al', 'ance', 'ence', 'er', 'ic', 'able', 'ible', 'ant', 'ement', 'ment', 'ent',
+    'ion', 'ou', 'ism', 'ate', 'iti', 'ous', 'ive', 'ize',
+)
+
+
+def _step1ab(word):
+    if word.endswith('sses'):
+        word = word[:-2]
+    elif word.endswith('ies'):
+        word = word[:-2]
+    elif word.endswith('s') and not word.endswith('ss'):
+        word = word[:-1]
+
+    if word.endswith('eed'):
+        if _measure(word[:-3]) > 0:
+            word = word[:-1]
+        return word
+    for suffix in ('ed', 'ing'):
+        if word.endswith(suffix) and _has_vowel(word[:-len(suffix)]):
+            word = word[:-len(suffix)]
+            if word.endswith(('at', 'bl', 'iz')):
+                return word + 'e'
+            if _ends_double_consonant(word) and word[-1] not in 'lsz':
+                return word[:-1]
+            if _measure(word) == 1 and _ends_cvc(word):
+                return word + 'e'
+            return word
+    return word
+
+
+def _step4(word):
+    # Longest matching suffix first, as the algorithm lists them by the penultimate letter
+    for suffix in sorted(STEP4, key=len, reverse=True):
+        if word.endswith(suffix):
+            stem = word[:-len(suffix)]
+            if suffix == 'ion' and not stem.endswith(('s', 't')):
+                return word
+            return stem if _measure(stem) > 1 else word
+    return word
+
+
+def _step5(word):
+    if word.endswith('e'):
+        stem = word[:-1]
+        m = _measure(stem)
+        if m > 1 or (m == 1 and not _ends_cvc(stem)):
+            word = stem
+    if _measure(word) > 1 and _ends_double_consonant(word) and word.endswith('l'):
+        word = word[:-1]
+    return word
+
+
+@lru_cache(maxsize=50000)
+def stem(word):
+    """Stem a lowercase word; words of up to two letters are returned as is"""
+    if len(word) <= 2 or not word.isalpha():
+        return word
+    word = _step1ab(word)
+    if word.endswith('y') and _has_vowel(word[:-1]):
+        word = word[:-1] + 'i'
+    word = _replace(word, STEP2, 0)
+    word = _replace(word, STEP3, 0)
+    word = _step4(word)
+    return _step5(word)
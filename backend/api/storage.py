@@ -1,40 +1,543 @@
+import io
 import os
+import hashlib
+import itertools
+import mimetypes
 from django.core.files.storage import Storage
-from django.core.files.base import ContentFile
+from django.core.files.base import File
 from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import BinaryField, F
+from django.db.models.functions import Substr
 from django.utils.deconstruct import deconstructible
 from django.urls import reverse
-from .models import DatabaseFile
+from .models import DatabaseFile, DatabaseFileManifest, DatabaseFileChunk
+from .file_cache import get_file_cache
+from .blob_store import LOCATION_FS, get_blob_store, get_blob_store_prefixes
+from .compression import CODEC_NONE, DecodingReader, encode_chunks, worth_compressing
+
+# Size of each DatabaseFileChunk row; also the read granularity for legacy rows
+DEFAULT_CHUNK_SIZE = 256 * 1024
+
+# Hex digits of the SHA-256 embedded in content-addressed names
+NAME_HASH_LENGTH = 12
+
+# FileField's default max_length, which Book and UserProfile file fields use
+NAME_MAX_LENGTH = 100
+
+# Read by Range requests (PDF.js): never compressed, since a compressed
+# payload has to be decoded from its first byte up to every requested span
+RANGE_SERVED_TYPES = ('application/pdf',)
+
+
+def get_chunk_size():
+    return getattr(settings, 'DATABASE_STORAGE_CHUNK_SIZE', DEFAULT_CHUNK_SIZE)
+
+
+def hashed_name(name, checksum):
+    """
+    Embed a short content hash in a file name:
+    books/covers/intro.jpg -> books/covers/intro.3fa2b1c4d5e6.jpg
+    """
+    dir_name, file_name = os.path.split(name)
+    file_root, file_ext = os.path.splitext(file_name)
+    tag = f'.{checksum[:NAME_HASH_LENGTH]}'
+    # Leave room for the '_abc1234' suffix get_available_name() may add
+    room = NAME_MAX_LENGTH - len(dir_name) - 1 - len(tag) - len(file_ext) - 8
+    return os.path.join(dir_name, f'{file_root[:max(room, 1)]}{tag}{file_ext}')
+
+
+def unhashed_name(name):
+    """Undo hashed_name(): books/covers/intro.3fa2b1c4d5e6.jpg -> books/covers/intro.jpg"""
+    root, ext = os.path.splitext(name)
+    tag = os.path.splitext(root)[1]
+    if len(tag) == NAME_HASH_LENGTH + 1 and all(c in '0123456789abcdef' for c in tag[1:]):
+        root = root[:-len(tag)]
+    return root + ext
+
+
+def is_content_addressed(name, checksum):
+    """True when `name` embeds the hash of its content, so its bytes can never change"""
+    return bool(checksum) and f'.{checksum[:NAME_HASH_LENGTH]}' in os.path.basename(name)
+
+
+class DatabaseFileReader(io.RawIOBase):
+    """
+    Seekable, read-only file object over the stored bytes of a DatabaseFile.
+
+    Chunks are fetched lazily one at a time, so reading or copying a file
+    keeps at most one chunk in memory. Legacy single-row files are read in
+    chunk-sized slices with SUBSTRING instead of loading the whole BLOB.
+    For compressed manifests these are the compressed bytes; use
+    open_payload() to read the content itself.
+    """
+
+    def __init__(self, db_file):
+        super().__init__()
+        self.db_file = db_file
+        self.name = db_file.name
+        self.manifest = db_file.manifest
+        self.size = self.manifest.stored_size if self.manifest else db_file.size
+        self.chunk_size = self.manifest.chunk_size if self.manifest else get_chunk_size()
+        self._pos = 0
+        self._chunk_seq = None
+        self._chunk_data = b''
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._pos
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_SET:
+            pos = offset
+        elif whence == io.SEEK_CUR:
+            pos = self._pos + offset
+        elif whence == io.SEEK_END:
+            pos = self.size + offset
+        else:
+            raise ValueError(f"Invalid whence ({whence})")
+        if pos < 0:
+            raise ValueError(f"Negative seek position {pos}")
+        self._pos = pos
+        return pos
+
+    def _load_chunk(self, seq):
+        if seq == self._chunk_seq:
+            return self._chunk_data
+        if self.manifest:
+            data = DatabaseFileChunk.objects.filter(
+                manifest_id=self.manifest.pk, seq=seq
+            ).values_list('data', flat=True).first()
+            if data is None and seq * self.chunk_size < self.size:
+                data = self._load_moved_chunk(seq)
+        else:
+            data = DatabaseFile.objects.filter(pk=self.db_file.pk).annotate(
+                span=Substr('content', seq * self.chunk_size + 1, self.chunk_size, output_field=BinaryField())
+            ).values_list('span', flat=True).first()
+        self._chunk_seq = seq
+        self._chunk_data = bytes(data or b'')
+        return self._chunk_data
+
+    def _load_moved_chunk(self, seq):
+        """Read a chunk from the blob store if the payload was moved there mid-read"""
+        self.manifest.refresh_from_db(fields=['location', 'path'])
+        blob_store = get_blob_store()
+        if self.manifest.location != LOCATION_FS or blob_store is None:
+            return None
+        with blob_store.open(self.manifest.path) as f:
+            f.seek(seq * self.chunk_size)
+            return f.read(self.chunk_size)
+
+    def readinto(self, buffer):
+        if self._pos >= self.size:
+            return 0
+        seq, offset = divmod(self._pos, self.chunk_size)
+        data = self._load_chunk(seq)
+        count = min(len(buffer), len(data) - offset)
+        if count <= 0:
+            return 0
+        buffer[:count] = data[offset:offset + count]
+        self._pos += count
+        return count
+
+    def iter_range(self, start, end):
+        """Yield the inclusive byte span [start, end] one chunk (or less) at a time"""
+        return iter_file_range(self, start, end, self.chunk_size)
+
+
+def iter_file_range(f, start, end, block_size=DEFAULT_CHUNK_SIZE):
+    """Yield the inclusive byte span [start, end] of a seekable file in blocks"""
+    f.seek(start)
+    remaining = end - start + 1
+    while remaining > 0:
+        data = f.read(min(remaining, block_size))
+        if not data:
+            break
+        remaining -= len(data)
+        yield data
+
+
+# Leading bytes of the formats we accept as uploads
+MAGIC_NUMBERS = [
+    (b'%PDF-', 'application/pdf'),
+    (b'\xff\xd8\xff', 'image/jpeg'),
+    (b'\x89PNG\r\n\x1a\n', 'image/png'),
+    (b'GIF87a', 'image/gif'),
+    (b'GIF89a', 'image/gif'),
+]
+
+
+def sniff_content_type(head, name):
+    """Guess a content type from the first bytes of a file, falling back to its name"""
+    for magic, content_type in MAGIC_NUMBERS:
+        if head.startswith(magic):
+            return content_type
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return 'image/webp'
+    return mimetypes.guess_type(name)[0] or 'application/octet-stream'
+
+
+def hash_content(content):
+    """Return (sha256 hexdigest, first bytes) of a seekable file without storing it"""
+    digest = hashlib.sha256()
+    head = b''
+    for piece in content.chunks():
+        if not head:
+            head = bytes(piece[:16])
+        digest.update(piece)
+    return digest.hexdigest(), head
+
+
+class ContentStats:
+    """Size, SHA-256 and first bytes of content, measured as it streams past"""
+
+    def __init__(self):
+        self.size = 0
+        self.head = b''
+        self._digest = hashlib.sha256()
+
+    @property
+    def checksum(self):
+        return self._digest.hexdigest()
+
+    def track(self, chunks):
+        for chunk in chunks:
+            if not self.head:
+                self.head = bytes(chunk[:16])
+            self._digest.update(chunk)
+            self.size += len(chunk)
+            yield chunk
+
+
+def write_chunks(manifest, chunks):
+    """
+    Write an iterable of byte chunks as DatabaseFileChunk rows for `manifest`.
+
+    Input is re-blocked into manifest.chunk_size rows, so memory stays
+    bounded by one chunk whatever the upload size.
+    Returns (stored bytes, number of chunk rows).
+    """
+    chunk_size = manifest.chunk_size
+    buffer = bytearray()
+    stored_size = 0
+    seq = 0
+
+    for piece in chunks:
+        stored_size += len(piece)
+        buffer += piece
+        while len(buffer) >= chunk_size:
+            DatabaseFileChunk.objects.create(manifest=manifest, seq=seq, data=bytes(buffer[:chunk_size]))
+            del buffer[:chunk_size]
+            seq += 1
+    if buffer:
+        DatabaseFileChunk.objects.create(manifest=manifest, seq=seq, data=bytes(buffer))
+        seq += 1
+    return stored_size, seq
+
+
+def iter_manifest_chunks(manifest):
+    """Yield the chunk rows of a database manifest in order, one query per chunk to keep memory at a single chunk"""
+    for seq in range(manifest.chunk_count):
+        yield bytes(DatabaseFileChunk.objects.filter(manifest=manifest, seq=seq).values_list('data', flat=True).get())
+
+
+def _is_seekable(content):
+    try:
+        return content.seekable()
+    except AttributeError:
+        return False
+
+
+def _add_reference(checksum):
+    """Take a reference on the manifest holding `checksum`, if there is one"""
+    manifest = DatabaseFileManifest.objects.select_for_update().filter(checksum=checksum).first()
+    if manifest:
+        DatabaseFileManifest.objects.filter(pk=manifest.pk).update(ref_count=F('ref_count') + 1)
+    return manifest
+
+
+def store_content(content, blob_store=None, codec=CODEC_NONE):
+    """
+    Return (manifest, first bytes) for `content`, sharing an existing manifest
+    when the same bytes are already stored. The payload is written to
+    `blob_store` when one is given, else to chunk rows, compressed with
+    `codec` if that pays off and the content is not read by range. Must run inside a transaction; a blob file
+    written by one that rolls back is left unreferenced until
+    sweep_orphan_blobs() (`manage.py sweep_blobs`) removes it.
+    """
+    # Hash local uploads first so a re-upload of known content writes nothing
+    if _is_seekable(content):
+        checksum, head = hash_content(content)
+        manifest = _add_reference(checksum)
+        if manifest:
+            return manifest, head
+
+    chunk_size = get_chunk_size()
+    pieces = content.chunks(chunk_size)
+    first = next(pieces, b'')
+    if codec and (sniff_content_type(first, '') in RANGE_SERVED_TYPES or not worth_compressing(codec, first)):
+        codec = CODEC_NONE
+    stats = ContentStats()
+    stored = encode_chunks(stats.track(itertools.chain([first], pieces)), codec)
+
+    manifest = DatabaseFileManifest.objects.create(size=0, chunk_size=chunk_size, ref_count=1, codec=codec)
+    if blob_store:
+        manifest.path, manifest.stored_size = blob_store.write(stored, suffix=f'.{codec}' if codec else '')
+        manifest.location = LOCATION_FS
+    else:
+        manifest.stored_size, manifest.chunk_count = write_chunks(manifest, stored)
+    manifest.size = stats.size
+    manifest.save(update_fields=['size', 'stored_size', 'chunk_count', 'location', 'path'])
+    checksum, head = stats.checksum, stats.head
+
+    existing = _add_reference(checksum)
+    if existing is None:
+        manifest.checksum = checksum
+        try:
+            with transaction.atomic():
+                manifest.save(update_fields=['checksum'])
+            return manifest, head
+        except IntegrityError:
+            # A concurrent upload stored the same bytes first
+            existing = _add_reference(checksum)
+    manifest.delete()
+    if blob_store and not DatabaseFileManifest.objects.filter(location=LOCATION_FS, path=manifest.path).exists():
+        # Blob paths are content-addressed, so only drop ours if nobody else uses it
+        blob_store.delete(manifest.path)
+    return existing, head
+
+
+def seal_manifest(manifest, blob_store=None, expected_checksum=None):
+    """
+    Finish a manifest whose chunk rows were written one request at a time
+    (resumable uploads): hash the content, then either share an existing
+    manifest with the same bytes or record the checksum, moving the payload
+    to `blob_store` when one is given. Raises ValueError if the content does
+    not match `expected_checksum`.
+
+    Returns (manifest, first bytes). When the content was already stored the
+    existing manifest is returned with a reference taken for the caller, and
+    the pending one should be deleted once nothing points at it. Must run
+    inside a transaction.
+    """
+    stats = ContentStats()
+    chunks = stats.track(iter_manifest_chunks(manifest))
+    path = None
+    if blob_store:
+        path, _ = blob_store.write(chunks)
+    else:
+        for _ in chunks:
+            pass
+    checksum, head = stats.checksum, stats.head
+
+    mismatch = bool(expected_checksum) and checksum != expected_checksum
+    existing = None if mismatch else _add_reference(checksum)
+    if path and (mismatch or existing) and not DatabaseFileManifest.objects.filter(location=LOCATION_FS, path=path).exists():
+        # Blob paths are content-addressed, so only drop ours if nobody else uses it
+        blob_store.delete(path)
+    if mismatch:
+        raise ValueError(f"Uploaded content does not match its checksum ({checksum} != {expected_checksum})")
+    if existing:
+        return existing, head
+
+    manifest.size = manifest.stored_size = stats.size
+    manifest.checksum = checksum
+    manifest.ref_count = 1
+    if path:
+        manifest.location, manifest.path = LOCATION_FS, path
+    manifest.save(update_fields=['size', 'stored_size', 'checksum', 'ref_count', 'location', 'path'])
+    if path:
+        manifest.chunks.all().delete()
+    return manifest, head
+
+
+def release_manifest(manifest_id):
+    """Drop one reference to a manifest, freeing its payload when none remain"""
+    DatabaseFileManifest.objects.filter(pk=manifest_id).update(ref_count=F('ref_count') - 1)
+    orphan = DatabaseFileManifest.objects.filter(
+        pk=manifest_id, ref_count__lte=0, files__isnull=True, upload_sessions__isnull=True
+    )
+    paths = list(orphan.filter(location=LOCATION_FS).values_list('path', flat=True))
+    # Chunks are removed by the manifest's cascade
+    orphan.delete()
+    blob_store = get_blob_store()
+    if paths and blob_store:
+        transaction.on_commit(lambda: [blob_store.delete(path) for path in paths])
+
+
+def sweep_orphan_blobs(blob_store, older_than, dry_run=False, batch_size=500):
+    """
+    Delete blob files no manifest points to (written by transactions that
+    rolled back, or left by a crash mid-write) last modified before
+    `older_than`, a timestamp: newer files may belong to a transaction still
+    running. Returns the number of files deleted (or found, with dry_run).
+    """
+    swept = 0
+    paths = blob_store.iter_paths(older_than)
+    while batch := list(itertools.islice(paths, batch_size)):
+        used = set(
+            DatabaseFileManifest.objects.filter(location=LOCATION_FS, path__in=batch).values_list('path', flat=True)
+        )
+        for path in batch:
+            if path not in used:
+                swept += 1
+                if not dry_run:
+                    blob_store.delete(path)
+    return swept
+
+
+def open_stored(db_file):
+    """
+    Open the stored (possibly compressed) bytes of a DatabaseFile as a seekable
+    binary file: a local file for blob-store payloads, else a DatabaseFileReader.
+    """
+    manifest = db_file.manifest
+    blob_store = get_blob_store()
+    if manifest and manifest.location == LOCATION_FS and blob_store:
+        return blob_store.open(manifest.path)
+    return DatabaseFileReader(db_file)
+
+
+def open_payload(db_file):
+    """Open the content of a DatabaseFile, decompressing it as it is read"""
+    stored = open_stored(db_file)
+    manifest = db_file.manifest
+    if manifest and manifest.codec:
+        return DecodingReader(stored, manifest.codec, size=manifest.size)
+    return stored
+
 
 @deconstructible
 class DatabaseStorage(Storage):
     def _open(self, name, mode='rb'):
         try:
-            f = DatabaseFile.objects.get(name=name)
-            return ContentFile(f.content, name=name)
+            f = DatabaseFile.objects.select_related('manifest').get(name=name)
         except DatabaseFile.DoesNotExist:
             return None
+        cache = get_file_cache()
+        cached_path = cache.get(name, f.checksum) if cache and f.checksum else None
+        if cached_path:
+            try:
+                return File(open(cached_path, 'rb'), name=name)
+            except FileNotFoundError:
+                pass  # Evicted between lookup and open
+        payload = open_payload(f)
+        if isinstance(payload, io.RawIOBase):
+            # Buffer so read(n) returns n bytes like a regular file (PyPDF2, Pillow rely on it)
+            payload = io.BufferedReader(payload, buffer_size=get_chunk_size())
+        stored_file = File(payload, name=name)
+        stored_file.size = f.size
+        return stored_file
+
+    def _blob_store_for(self, name):
+        """Blob store that should hold the payload of `name`, or None for chunk rows"""
+        return None
+
+    def _codec_for(self, name):
+        """Compression codec configured for the prefix of `name` ('' for none)"""
+        for prefix, codec in (getattr(settings, 'DATABASE_STORAGE_COMPRESSION', None) or {}).items():
+            if name.startswith(prefix):
+                return codec
+        return CODEC_NONE
 
     def _save(self, name, content):
-        name = self.get_available_name(name)
-        content_bytes = content.read()
-        
-        # Determine content type if possible, or store generic
-        # For now, simplistic.
-        
-        DatabaseFile.objects.create(
-            name=name,
-            content=content_bytes,
-            size=len(content_bytes)
-        )
+        # Write chunk by chunk inside one transaction so a failed upload leaves nothing behind
+        with transaction.atomic():
+            manifest, head = store_content(content, self._blob_store_for(name), self._codec_for(name))
+            return self.save_manifest(name, manifest, sniff_content_type(head, name))
+
+    def save_manifest(self, name, manifest, content_type=None):
+        """
+        Save `name` for content that is already stored in `manifest`, taking
+        over the caller's reference to it. Returns the name actually used.
+        """
+        with transaction.atomic():
+            if getattr(settings, 'DATABASE_STORAGE_HASHED_NAMES', False):
+                name = hashed_name(name, manifest.checksum)
+            name = self.get_available_name(name, max_length=NAME_MAX_LENGTH)
+            DatabaseFile.objects.create(
+                name=name,
+                manifest=manifest,
+                size=manifest.size,
+                content_type=content_type or sniff_content_type(b'', name),
+                checksum=manifest.checksum
+            )
         return name
 
+    def seal_upload(self, name, manifest, expected_checksum=None):
+        """Seal a manifest filled by a resumable upload that will be saved as `name`"""
+        return seal_manifest(manifest, self._blob_store_for(name), expected_checksum)
+
     def exists(self, name):
         return DatabaseFile.objects.filter(name=name).exists()
 
+    def _metadata(self, name, field):
+        value = DatabaseFile.objects.filter(name=name).values_list(field, flat=True).first()
+        if value is None:
+            raise FileNotFoundError(f"No stored file named '{name}'")
+        return value
+
+    def size(self, name):
+        return self._metadata(name, 'size')
+
+    def get_created_time(self, name):
+        return self._metadata(name, 'created_at')
+
+    def get_modified_time(self, name):
+        return self._metadata(name, 'modified_at')
+
+    def listdir(self, path):
+        """List the directories and files directly under `path` from file names alone"""
+        prefix = path.strip('/')
+        prefix = f'{prefix}/' if prefix else ''
+        directories, files = set(), []
+        names = DatabaseFile.objects.filter(name__startswith=prefix).values_list('name', flat=True)
+        for name in names.order_by('name').iterator():
+            rest = name[len(prefix):]
+            if '/' in rest:
+                directories.add(rest.split('/', 1)[0])
+            else:
+                files.append(rest)
+        return sorted(directories), files
+
+    def iter_content(self, name, chunk_size=DEFAULT_CHUNK_SIZE):
+        """Stream the bytes of a stored file, one chunk at a time"""
+        f = self._open(name)
+        if f is None:
+            raise FileNotFoundError(f"No stored file named '{name}'")
+        with f:
+            yield from f.chunks(chunk_size)
+
     def url(self, name):
         # We need a view to serve this file
         return reverse('serve-db-file', args=[name])
 
     def delete(self, name):
-        DatabaseFile.objects.filter(name=name).delete()
+        with transaction.atomic():
+            db_file = DatabaseFile.objects.select_for_update().filter(name=name).only('id', 'manifest_id').first()
+            if db_file is None:
+                return
+            db_file.delete()
+            if db_file.manifest_id:
+                # Chunks are removed by the manifest's cascade
+                release_manifest(db_file.manifest_id)
+
+
+@deconstructible
+class HybridStorage(DatabaseStorage):
+    """
+    DatabaseStorage that keeps payloads for some name prefixes in the
+    filesystem blob store. Names, metadata and url() are unchanged, so
+    files can move between the two locations without breaking links.
+    """
+
+    def _blob_store_for(self, name):
+        prefixes = get_blob_store_prefixes()
+        if prefixes and name.startswith(prefixes):
+            return get_blob_store()
+        return None
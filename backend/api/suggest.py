@@ -0,0 +1,294 @@
+"""
+Search-box suggestions
+
+Completions of what the user is typing, drawn from titles, authors, tags
+and ISBNs and ranked by popularity (views + 2 x downloads, summed over
+the books a suggestion stands for). Each worker keeps them in memory as
+one sorted array of normalized keys: a title is reachable from the start
+of each of its words, an ISBN from its digits. A prefix is two binary
+searches; small ranges are ranked on the spot, while prefixes covering
+more than SCAN_LIMIT keys keep a precomputed top list, maintained as
+books change.
+
+Kept current like the other in-memory indexes (api/index_holder.py):
+signals update it in place, and a periodic rebuild picks up view and
+download counts.
+"""
+
+import re
+import heapq
+import threading
+import unicodedata
+from bisect import bisect_left
+from operator import attrgetter
+from .index_holder import IndexHolder
+
+KIND_TITLE = 'title'
+KIND_AUTHOR = 'author'
+KIND_TAG = 'tag'
+KIND_ISBN = 'isbn'
+
+DEFAULT_LIMIT = 8
+MAX_LIMIT = 20
+# Largest key range ranked per request; wider prefixes use a precomputed list
+SCAN_LIMIT = 256
+# Title words from which a title is also reachable ("learning" -> "Machine Learning")
+MAX_WORD_KEYS = 6
+MAX_KEY_LENGTH = 100
+
+STOPWORDS = frozenset('a an and for in of on the to with'.split())
+
+_NON_WORD_RE = re.compile(r'[\W_]+', re.UNICODE)
+_SORT_END = '\uffff'
+
+
+def normalize(text):
+    """Lowercase, accents removed, punctuation runs turned into single spaces"""
+    text = unicodedata.normalize('NFKD', (text or '').lower())
+    text = ''.join(char for char in text if not unicodedata.combining(char))
+    return _NON_WORD_RE.sub(' ', text).strip()[:MAX_KEY_LENGTH]
+
+
+def get_weight(views, downloads):
+    return (views or 0) + 2 * (downloads or 0)
+
+
+class Suggestion:
+    __slots__ = ('text', 'kind', 'weight', 'books', 'keys')
+
+    def __init__(self, text, kind, keys):
+        self.text = text
+        self.kind = kind
+        self.keys = keys
+        self.weight = 0
+        self.books = {}          # book id -> that book's weight
+
+
+def suggestion_keys(kind, text):
+    """The normalized keys a suggestion can be reached from"""
+    if kind == KIND_ISBN:
+        digits = re.sub(r'[^0-9x]', '', text.lower())
+        return (digits,) if digits else ()
+    key = normalize(text)
+    if not key:
+        return ()
+    keys = [key]
+    if kind in (KIND_TITLE, KIND_AUTHOR):
+        words = key.split(' ')
+        starts = [i for i, word in enumerate(words) if i and word not in STOPWORDS]
+        keys.extend(' '.join(words[i:]) for i in starts[:MAX_WORD_KEYS])
+    return tuple(dict.fromkeys(keys))
+
+
+def book_suggestions(values):
+    """(identity, kind, text) of the suggestions of a book given its field values"""
+    pairs = []
+    if values.get('title'):
+        pairs.append((KIND_TITLE, values['title'].strip()))
+    if values.get('author'):
+        pairs.append((KIND_AUTHOR, values['author'].strip()))
+    for tag in (values.get('tags') or '').split(','):
+        if tag.strip():
+            pairs.append((KIND_TAG, tag.strip()))
+    if values.get('isbn'):
+        pairs.append((KIND_ISBN, values['isbn'].strip()))
+    # Spellings differing only in case or punctuation are one suggestion
+    suggestions = {}
+    for kind, text in pairs:
+        suggestions.setdefault((kind, normalize(text)), (kind, text))
+    return [(identity, kind, text) for identity, (kind, text) in suggestions.items()]
+
+
+class SuggestIndex:
+    def __init__(self):
+        self.keys = []            # sorted normalized keys
+        self.targets = []         # Suggestion of each key
+        self.suggestions = {}     # (kind, normalized text) -> Suggestion
+        self.book_entries = {}    # book id -> suggestion identities
+        self.top = {}             # wide prefix -> best Suggestions, at most MAX_LIMIT
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self.book_entries)
+
+    @classmethod
+    def from_books(cls, rows):
+        """Bulk build from (book_id, values, weight) rows: one sort instead of many inserts"""
+        index = cls()
+        for book_id, values, weight in rows:
+            entries = index.book_entries[book_id] = []
+            for identity, kind, text in book_suggestions(values):
+                suggestion = index.suggestions.get(identity)
+                if suggestion is None:
+                    keys = suggestion_keys(kind, text)
+                    if not keys:
+                        continue
+                    suggestion = index.suggestions[identity] = Suggestion(text, kind, keys)
+                suggestion.books[book_id] = weight
+                suggestion.weight += weight
+                entries.append(identity)
+        pairs = sorted((key, id(s), s) for s in index.suggestions.values() for key in s.keys)
+        index.keys = [key for key, _, _ in pairs]
+        index.targets = [s for _, _, s in pairs]
+        index._precompute_top()
+        return index
+
+    # Incremental updates
+
+    def add(self, book_id, values, weight):
+        """Index (or re-index) a book; a book already indexed only moves the weights that changed"""
+        with self._lock:
+            current = set(self.book_entries.get(book_id, ()))
+            entries = []
+            for identity, kind, text in book_suggestions(values):
+                suggestion = self.suggestions.get(identity)
+                if suggestion is None:
+                    keys = suggestion_keys(kind, text)
+                    if not keys:
+                        continue
+                    suggestion = self.suggestions[identity] = Suggestion(text, kind, keys)
+                    for key in keys:
+                        i = bisect_left(self.keys, key)
+                        self.keys.insert(i, key)
+                        self.targets.insert(i, suggestion)
+                change = weight - suggestion.books.get(book_id, 0)
+                suggestion.books[book_id] = weight
+                suggestion.weight += change
+                if change or identity not in current:
+                    self._update_top(suggestion, decreased=change < 0)
+                entries.append(identity)
+            self.book_entries[book_id] = entries
+            self._detach(book_id, current.difference(entries))
+
+    def remove(self, book_id):
+        with self._lock:
+            self._detach(book_id, self.book_entries.pop(book_id, ()))
+
+    def _detach(self, book_id, identities):
+        for identity in identities:
+            suggestion = self.suggestions[identity]
+            suggestion.weight -= suggestion.books.pop(book_id, 0)
+            if not suggestion.books:
+                del self.suggestions[identity]
+                for key in suggestion.keys:
+                    i = bisect_left(self.keys, key)
+                    while self.targets[i] is not suggestion:
+                        i += 1
+                    del self.keys[i]
+                    del self.targets[i]
+            self._update_top(suggestion, decreased=True, removed=not suggestion.books)
+
+    def _update_top(self, suggestion, decreased=False, removed=False):
+        """Keep the top lists of the prefixes of `suggestion` in line with its new weight"""
+        for key in suggestion.keys:
+            for length in range(1, len(key) + 1):
+                prefix = key[:length]
+                best = self.top.get(prefix)
+                if best is None:
+                    continue
+                listed = suggestion in best
+                if listed and decreased and len(best) == MAX_LIMIT:
+                    # Something outside the list may now rank higher; rank the prefix again when asked
+                    del self.top[prefix]
+                    continue
+                if listed:
+                    best.remove(suggestion)
+                if not removed and (len(best) < MAX_LIMIT or suggestion.weight > best[-1].weight):
+                    best.append(suggestion)
+                    best.sort(key=attrgetter('weight'), reverse=True)
+                    del best[MAX_LIMIT:]
+
+    # Lookups
+
+    def _rank(self, lo, hi, limit):
+        unique = {id(target): target for target in self.targets[lo:hi]}
+        return heapq.nlargest(limit, unique.values(), key=attrgetter('weight'))
+
+    def _precompute_top(self):
+        """Top lists of every prefix whose key range is wider than SCAN_LIMIT"""
+        self.top = {}
+        keys = self.keys
+        stack = [('', 0, len(keys))]
+        while stack:
+            prefix, lo, hi = stack.pop()
+            if prefix:
+                self.top[prefix] = self._rank(lo, hi, MAX_LIMIT)
+            depth = len(prefix)
+            i = lo
+            while i < hi:
+                if len(keys[i]) <= depth:
+                    i += 1
+                    continue
+                child = keys[i][:depth + 1]
+                j = bisect_left(keys, child + _SORT_END, i, hi)
+                if j - i > SCAN_LIMIT:
+                    stack.append((child, i, j))
+                i = j
+
+    def suggest(self, query, limit=DEFAULT_LIMIT):
+        """The `limit` most popular suggestions starting with `query`"""
+        limit = max(1, min(limit, MAX_LIMIT))
+        prefix = normalize(query)
+        digits = re.sub(r'[\s-]', '', query.lower())
+        if digits.isdigit():
+            # Typing an ISBN, with or without hyphens
+            prefix = digits
+        if not prefix:
+            return []
+        with self._lock:
+            best = self.top.get(prefix)
+            if best is None:
+                lo = bisect_left(self.keys, prefix)
+                hi = bisect_left(self.keys, prefix + _SORT_END, lo)
+                if hi - lo <= SCAN_LIMIT:
+                    return self._rank(lo, hi, limit)
+                best = self.top[prefix] = self._rank(lo, hi, MAX_LIMIT)
+            return best[:limit]
+
+
+SUGGEST_FIELDS = ('title', 'author', 'tags', 'isbn')
+
+
+def build_index():
+    """Index the catalog from one streamed query"""
+    from .models import Book
+    rows = Book.objects.order_by().values_list('id', *SUGGEST_FIELDS, 'views', 'downloads').iterator(chunk_size=2000)
+    return SuggestIndex.from_books(
+        (book_id, dict(zip(SUGGEST_FIELDS, values)), get_weight(views, downloads))
+        for book_id, *values, views, downloads in rows
+    )
+
+
+_holder = IndexHolder('suggest', build_index, 'SUGGEST_INDEX_MAX_AGE')
+
+
+def get_suggest_index():
+    return _holder.get()
+
+
+def suggest(query, limit=DEFAULT_LIMIT):
+    """[{'text', 'type', 'bookId'}] completions of `query`, most popular first"""
+    return [
+        {
+            'text': suggestion.text,
+            'type': suggestion.kind,
+            # Lets the client open the book directly when there is only one
+            'bookId': next(iter(suggestion.books)) if len(suggestion.books) == 1 else None,
+        }
+        for suggestion in get_suggest_index().suggest(query, limit)
+    ]
+
+
+# Signal receivers, connected in ApiConfig.ready()
+
+def book_saved(sender, instance, **kwargs):
+    if instance.deleted_at is not None:
+        # Soft-deleted: only its tombstone remains
+        book_deleted(sender, instance)
+        return
+    values = {field: getattr(instance, field) for field in SUGGEST_FIELDS}
+    _holder.apply_on_commit('add', instance.pk, values, get_weight(instance.views, instance.downloads))
+
+
+def book_deleted(sender, instance, **kwargs):
+    _holder.apply_on_commit('remove', instance.pk)
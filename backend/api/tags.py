@@ -0,0 +1,119 @@
+"""
+Book tags
+
+Book.tags stays the comma-separated text admins edit; set_book_tags()
+mirrors it into Tag / BookTag rows in the caller's transaction, adding
+and removing only the tags that changed and moving Tag.book_count by
+the same amount; a hard-deleted book uncounts its tags from a pre_delete
+receiver, before its BookTag rows go by cascade. Tag filters and facets then read the (tag, book) index
+of BookTag instead of scanning Book.tags, and the unfiltered tag counts
+are the stored book_count values.
+"""
+
+import re
+from collections import Counter
+from django.db import transaction
+from django.db.models import Count, F
+from .models import Book, BookTag, Tag
+
+MAX_TAG_LENGTH = 50
+BATCH_SIZE = 1000
+
+_SPACE_RE = re.compile(r'\s+')
+
+
+def normalize_tag(name):
+    return _SPACE_RE.sub(' ', name).strip().lower()[:MAX_TAG_LENGTH]
+
+
+def parse_tags(text):
+    """Distinct normalized tag names of a comma-separated list"""
+    names = (normalize_tag(name) for name in (text or '').split(','))
+    return list(dict.fromkeys(name for name in names if name))
+
+
+def set_book_tags(book):
+    """Bring a book's BookTag rows and the tag counts in line with book.tags (in a transaction)"""
+    # Concurrent updates of the book would otherwise count the same change twice
+    list(Book.all_objects.select_for_update().filter(pk=book.pk).values_list('pk', flat=True))
+    names = set(parse_tags(book.tags))
+    current = dict(BookTag.objects.filter(book_id=book.pk).values_list('tag__name', 'tag_id'))
+    added = names.difference(current)
+    removed = [current[name] for name in set(current).difference(names)]
+
+    if added:
+        Tag.objects.bulk_create([Tag(name=name) for name in added], ignore_conflicts=True)
+        added_ids = list(Tag.objects.filter(name__in=added).values_list('id', flat=True))
+        BookTag.objects.bulk_create(
+            [BookTag(book_id=book.pk, tag_id=tag_id) for tag_id in added_ids], ignore_conflicts=True
+        )
+        Tag.objects.filter(pk__in=added_ids).update(book_count=F('book_count') + 1)
+    if removed:
+        BookTag.objects.filter(book_id=book.pk, tag_id__in=removed).delete()
+        Tag.objects.filter(pk__in=removed).update(book_count=F('book_count') - 1)
+
+
+def remove_book_tags(book_id):
+    """Untag a book about to be deleted, so the counts only cover live books"""
+    tag_ids = list(BookTag.objects.filter(book_id=book_id).values_list('tag_id', flat=True))
+    if tag_ids:
+        BookTag.objects.filter(book_id=book_id).delete()
+        Tag.objects.filter(pk__in=tag_ids).update(book_count=F('book_count') - 1)
+
+
+def book_deleting(sender, instance, **kwargs):
+    """pre_delete receiver: uncount the tags of a book deleted for good (soft deletes go through remove_book_tags)"""
+    Tag.objects.filter(pk__in=BookTag.objects.filter(book_id=instance.pk).values('tag_id')).update(
+        book_count=F('book_count') - 1
+    )
+
+
+def filter_by_tags(queryset, tags, match_all=True):
+    """Books tagged with every one (match_all) or any of the comma-separated `tags`"""
+    names = parse_tags(tags)
+    if not names:
+        return queryset
+    tag_ids = list(Tag.objects.filter(name__in=names).values_list('id', flat=True))
+    if not tag_ids or (match_all and len(tag_ids) < len(names)):
+        return queryset.none()
+    if not match_all:
+        return queryset.filter(pk__in=BookTag.objects.filter(tag_id__in=tag_ids).values('book_id'))
+    for tag_id in tag_ids:
+        queryset = queryset.filter(pk__in=BookTag.objects.filter(tag_id=tag_id).values('book_id'))
+    return queryset
+
+
+def tag_counts(queryset):
+    """[(tag name, book count)] over the books of `queryset`, most used first"""
+    if queryset.query.where == Book.objects.all().query.where:
+        # The whole (live) catalog: the maintained counts, no join needed
+        rows = Tag.objects.filter(book_count__gt=0).values_list('name', 'book_count')
+    else:
+        # Grouped from the book side: search backends may add raw SQL naming the book table
+        counts = dict(
+            queryset.order_by().values('book_tags__tag_id').annotate(book_count=Count('*'))
+            .values_list('book_tags__tag_id', 'book_count')
+        )
+        counts.pop(None, None)   # untagged books
+        names = dict(Tag.objects.filter(pk__in=counts).values_list('id', 'name')) if counts else {}
+        rows = [(names[tag_id], count) for tag_id, count in counts.items() if tag_id in names]
+    return sorted(rows, key=lambda row: (-row[1], row[0]))
+
+
+def rebuild_tags():
+    """Recreate every BookTag row and count from Book.tags; returns the number of tags"""
+    book_tags = {
+        book_id: parse_tags(tags)
+        for book_id, tags in Book.objects.exclude(tags__isnull=True).exclude(tags='').values_list('id', 'tags').iterator()
+    }
+    counts = Counter(name for names in book_tags.values() for name in names)
+    with transaction.atomic():
+        BookTag.objects.all().delete()
+        Tag.objects.all().delete()
+        Tag.objects.bulk_create([Tag(name=name, book_count=count) for name, count in counts.items()], batch_size=BATCH_SIZE)
+        tag_ids = dict(Tag.objects.values_list('name', 'id'))
+        BookTag.objects.bulk_create((
+            BookTag(book_id=book_id, tag_id=tag_ids[name])
+            for book_id, names in book_tags.items() for name in names
+        ), batch_size=BATCH_SIZE)
+    return len(counts)
@@ -335,3 +335,45 @@ def send_weekly_admin_report():
     except Exception as e:
         logger.error(f"Error sending weekly report: {str(e)}")
         return f"Error: {str(e)}"
+
+
+@shared_task
+def split_book_pages(book_id):
+    """Split a book PDF into per-page segments for lazy reading"""
+    from .pdf_pages import split_book_pdf
+    page_count = split_book_pdf(book_id)
+    logger.info(f"Split book {book_id} into {page_count} page(s)")
+    return page_count
+
+
+@shared_task
+def process_book_pdf(book_id):
+    """Optimize a newly uploaded book PDF, then split it into page segments"""
+    from .pdf_optimize import optimize_book_pdf
+    from .pdf_pages import split_book_pdf
+    try:
+        optimize_book_pdf(book_id)
+    except Exception as e:
+        # Serving the PDF as uploaded is fine; still split it
+        logger.error(f"Error optimizing PDF of book {book_id}: {e}")
+    page_count = split_book_pdf(book_id)
+    logger.info(f"Processed PDF of book {book_id}: {page_count} page(s)")
+    return page_count
+
+
+@shared_task
+def resize_book_cover(book_id):
+    """Generate the WebP / JPEG width variants of a book cover"""
+    from .covers import generate_cover_variants
+    count = generate_cover_variants(book_id, force=True)
+    logger.info(f"Generated {count} cover variant(s) for book {book_id}")
+    return count
+
+
+@shared_task
+def extract_book_content(book_id):
+    """Extract the per-page text of a book PDF for in-book search"""
+    from .book_text import extract_book_text
+    page_count = extract_book_text(book_id, force=True)
+    logger.info(f"Extracted text of {page_count} page(s) from book {book_id}")
+    return page_count
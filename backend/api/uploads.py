@@ -0,0 +1,53 @@
+"""
+Resumable uploads
+
+A client creates an UploadSession, PUTs the file as numbered chunks of the
+session's chunk size (each written straight into a DatabaseFileChunk row,
+so no request carries more than one chunk), then completes the session.
+A dropped connection only loses the chunk in flight: the session reports
+the last confirmed offset and the client carries on from there.
+"""
+
+import uuid
+
+from django.core.files.storage import default_storage
+from django.db import transaction
+
+from .models import DatabaseFileManifest, UploadSession
+from .storage import get_chunk_size, release_manifest
+
+
+def create_upload_session(name, size, created_by, checksum=''):
+    with transaction.atomic():
+        manifest = DatabaseFileManifest.objects.create(size=size, chunk_size=get_chunk_size())
+        return UploadSession.objects.create(
+            id=str(uuid.uuid4()), name=name, size=size, checksum=checksum, manifest=manifest, created_by=created_by
+        )
+
+
+def discard_upload_session(session):
+    """Delete a session and whatever it has stored so far"""
+    with transaction.atomic():
+        session = UploadSession.objects.select_for_update().filter(pk=session.pk).first()
+        if session is None:
+            return
+        manifest_id, completed = session.manifest_id, session.completed
+        session.delete()
+        if completed:
+            # A sealed manifest may be shared with other files
+            release_manifest(manifest_id)
+        else:
+            # Chunks are removed by the manifest's cascade
+            DatabaseFileManifest.objects.filter(pk=manifest_id).delete()
+
+
+def attach_upload(session):
+    """
+    Save a completed upload under its storage name and return that name, ready
+    to assign to a FileField. The session's reference passes to the new file.
+    """
+    with transaction.atomic():
+        session = UploadSession.objects.select_for_update().select_related('manifest').get(pk=session.pk, completed=True)
+        name = default_storage.save_manifest(session.name, session.manifest, session.content_type)
+        session.delete()
+    return name
@@ -9,7 +9,13 @@ from .views_books import (
     get_book_details, 
     update_book, 
     delete_book, 
-    check_book_access
+    check_book_access,
+    get_book_pages,
+    get_book_page,
+    search_books_content,
+    suggest_books,
+    catalog_snapshot,
+    book_changes
 )
 from .views_payments import (
     initiate_payment,
@@ -38,7 +44,8 @@ from .views_users import (
     sync_user
 )
 from .views_admin import register_admin, get_admin_details
-from .views_files import serve_database_file
+from .views_files import serve_database_file, serve_signed_file, get_file_cache_stats
+from .views_uploads import create_pdf_upload, pdf_upload_status, put_pdf_upload_chunk, complete_pdf_upload
 
 urlpatterns = [
     # Health check
@@ -60,11 +67,21 @@ urlpatterns = [
     
     # Book Management
     path('books/upload/', upload_book, name='upload-book'),
+    path('books/uploads/', create_pdf_upload, name='create-pdf-upload'),
+    path('books/uploads/<str:upload_id>/', pdf_upload_status, name='pdf-upload-status'),
+    path('books/uploads/<str:upload_id>/chunks/<int:seq>/', put_pdf_upload_chunk, name='put-pdf-upload-chunk'),
+    path('books/uploads/<str:upload_id>/complete/', complete_pdf_upload, name='complete-pdf-upload'),
     path('books/', list_books, name='list-books'),
+    path('books/search-content/', search_books_content, name='search-books-content'),
+    path('books/suggest/', suggest_books, name='suggest-books'),
+    path('books/snapshot/', catalog_snapshot, name='catalog-snapshot'),
+    path('books/changes/', book_changes, name='book-changes'),
     path('books/<str:book_id>/', get_book_details, name='get-book-details'),
     path('books/<str:book_id>/update/', update_book, name='update-book'),
     path('books/<str:book_id>/delete/', delete_book, name='delete-book'),
     path('books/<str:book_id>/access/', check_book_access, name='check-book-access'),
+    path('books/<str:book_id>/pages/', get_book_pages, name='get-book-pages'),
+    path('books/<str:book_id>/pages/<int:page>/', get_book_page, name='get-book-page'),
     path('books/<str:book_id>/track-view/', track_book_view, name='track-book-view'),
     path('books/<str:book_id>/track-download/', track_book_download, name='track-book-download'),
     
@@ -89,5 +106,7 @@ urlpatterns = [
     path('admin/users/<str:user_id>/history/', get_user_session_history, name='get-user-session-history'),
 
     # File Serving
+    path('admin/storage/cache-stats/', get_file_cache_stats, name='file-cache-stats'),
+    path('media/signed/<str:token>/', serve_signed_file, name='serve-signed-file'),
     path('media/<path:filename>', serve_database_file, name='serve-db-file'),
 ]
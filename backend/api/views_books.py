@@ -2,8 +2,29 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
 from rest_framework import status
+from django.db import transaction
 from django.db.models import Q
-from .models import Book, Purchase, UserProfile
+from django.http import HttpResponse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
+from django.core.files.storage import default_storage
+from .models import Book, BookPageSegment, Purchase, UploadSession, UserProfile
+from .uploads import attach_upload
+from .delivery import sign_media_url
+from .background import enqueue
+from .pdf_pages import delete_page_segments, get_pages_per_segment
+from .covers import cover_srcset, delete_cover_variants
+from .pagination import InvalidCursor, get_page_size, paginate_newest_first
+from .facets import apply_facet_filters, facet_counts, parse_facets
+from .tags import filter_by_tags, parse_tags, remove_book_tags, set_book_tags
+from .search import FuzzyMatches, fuzzy_search_books, index_book, remove_book, search_books
+from .book_text import delete_book_text, search_book_content
+from .suggest import DEFAULT_LIMIT as SUGGEST_DEFAULT_LIMIT, suggest
+from .response_cache import cached_response
+from .views_files import _accepts_encoding, serve_database_file
+from .catalog_snapshot import get_catalog_snapshot
+from .book_changes import CursorExpired, changed_books
 import uuid
 import os
 import logging
@@ -11,6 +32,9 @@ from django.conf import settings
 
 logger = logging.getLogger(__name__)
 
+# Largest PDF accepted, whether sent whole or through a resumable upload
+MAX_PDF_SIZE = 25 * 1024 * 1024
+
 @api_view(['POST'])
 @permission_classes([AllowAny])
 def upload_book(request):
@@ -40,17 +64,23 @@ def upload_book(request):
         if not all([title, author, department, semester]):
             return Response({'error': 'Missing required fields'}, status=status.HTTP_400_BAD_REQUEST)
         
-        # Get uploaded files
+        # Get uploaded files. The PDF may instead come from a completed resumable upload.
         cover_image = request.FILES.get('coverImage')
         pdf_file = request.FILES.get('pdfFile')
+        pdf_upload_id = request.data.get('pdfUploadId')
+        pdf_upload = None
+        if pdf_upload_id and not pdf_file:
+            pdf_upload = UploadSession.objects.filter(id=pdf_upload_id, completed=True).first()
+            if pdf_upload is None:
+                return Response({'error': 'PDF upload not found or not completed'}, status=status.HTTP_400_BAD_REQUEST)
         
-        if not cover_image or not pdf_file:
+        if not cover_image or not (pdf_file or pdf_upload):
             return Response({'error': 'Both cover image and PDF file are required'}, status=status.HTTP_400_BAD_REQUEST)
 
         # Validate PDF size (max 25 MB)
-        MAX_PDF_SIZE = 25 * 1024 * 1024
-        if pdf_file.size > MAX_PDF_SIZE:
-            size_mb = pdf_file.size / (1024 * 1024)
+        pdf_size = pdf_file.size if pdf_file else pdf_upload.size
+        if pdf_size > MAX_PDF_SIZE:
+            size_mb = pdf_size / (1024 * 1024)
             return Response({
                 'error': f'PDF file is too large ({size_mb:.1f} MB). Maximum allowed size is 25 MB. Please compress or split your PDF.'
             }, status=status.HTTP_400_BAD_REQUEST)
@@ -65,25 +95,34 @@ def upload_book(request):
         
         # Create Book
         book_id = str(uuid.uuid4())
-        file_size_mb = round(pdf_file.size / (1024 * 1024), 2)
+        file_size_mb = round(pdf_size / (1024 * 1024), 2)
         
-        book = Book.objects.create(
-            id=book_id,
-            title=title,
-            author=author,
-            description=description,
-            isbn=isbn,
-            department=department,
-            semester=semester,
-            is_premium=is_premium,
-            price=price,
-            tags=tags,
-            featured=featured,
-            uploaded_by=request.user_data.get('uid', 'unknown'),
-            file_size=f'{file_size_mb} MB',
-            cover_image=cover_image,
-            pdf_file=pdf_file
-        )
+        with transaction.atomic():
+            if pdf_upload:
+                pdf_file = attach_upload(pdf_upload)
+            book = Book.objects.create(
+                id=book_id,
+                title=title,
+                author=author,
+                description=description,
+                isbn=isbn,
+                department=department,
+                semester=semester,
+                is_premium=is_premium,
+                price=price,
+                tags=tags,
+                featured=featured,
+                uploaded_by=request.user_data.get('uid', 'unknown'),
+                file_size=f'{file_size_mb} MB',
+                cover_image=cover_image,
+                pdf_file=pdf_file
+            )
+            index_book(book)
+            set_book_tags(book)
+            # Optimize and split into per-page PDFs, and resize the cover, once the book is committed
+            enqueue('process_book_pdf', book.id)
+            enqueue('resize_book_cover', book.id)
+            enqueue('extract_book_content', book.id)
         
         # Return book data
         book_data = {
@@ -110,58 +149,250 @@ def upload_book(request):
 @permission_classes([AllowAny])
 def list_books(request):
     """
-    List all books with optional filtering
+    List all books with optional filtering.
+    `search` matches title, author, description, ISBN and tags through the
+    full-text index, most relevant first (newest first when paginated).
+    With `fuzzy=true` it instead tolerates typos in titles and authors and
+    returns the `limit` (at most 100) most similar books, best first.
+    Pass `limit` and/or `cursor` (the previous page's nextCursor) to page
+    through the catalog newest first; without them every match is returned.
+    `tags=ai,python` keeps books with all of those tags (`tagMatch=any`:
+    at least one). `facets=department,semester,isPremium,tags` adds value
+    counts over all matches (see api/facets.py).
     """
     try:
-        department = request.GET.get('department')
-        semester = request.GET.get('semester')
-        is_premium = request.GET.get('isPremium')
-        search = request.GET.get('search', '')
-        featured = request.GET.get('featured')
+        try:
+            facets = parse_facets(request.GET.get('facets'))
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            response_data = cached_response(request, 'list_books', lambda: _book_list_data(request, facets))
+        except InvalidCursor as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(response_data, status=status.HTTP_200_OK)
+        
+    except Exception as e:
+        logger.error(f"Error listing books: {e}")
+        return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+def _book_list_data(request, facets):
+    """The list_books response data (never user-specific, so cached); raises InvalidCursor"""
+    department = request.GET.get('department')
+    semester = request.GET.get('semester')
+    is_premium = request.GET.get('isPremium')
+    search = request.GET.get('search', '')
+    featured = request.GET.get('featured')
+    tags = request.GET.get('tags')
+    fuzzy = bool(search) and request.GET.get('fuzzy', '').lower() == 'true'
+    
+    books_queryset = Book.objects.all().order_by('-uploaded_at')
+    
+    if featured is not None:
+        featured_bool = featured.lower() == 'true'
+        books_queryset = books_queryset.filter(featured=featured_bool)
+    if tags:
+        match_all = request.GET.get('tagMatch', 'all').lower() != 'any'
+        books_queryset = filter_by_tags(books_queryset, tags, match_all)
+    if fuzzy:
+        # Matched once filtered (below), so the best matches are those passing every filter
+        unranked_queryset = books_queryset
+        matches = FuzzyMatches(search)
+    elif search:
+        books_queryset = search_books(books_queryset, search)
+
+    # Facet counts leave out their own filter, so they are computed before these
+    facet_filters = {}
+    if department:
+        facet_filters['department'] = department
+    if semester:
+        facet_filters['semester'] = semester
+    if is_premium is not None:
+        facet_filters['isPremium'] = is_premium.lower() == 'true'
+    if fuzzy and facets:
+        books_queryset = fuzzy_search_books(unranked_queryset, search, matches=matches)
+    facet_results = facet_counts(books_queryset, facets, facet_filters)
+    books_queryset = apply_facet_filters(books_queryset, facet_filters)
+    if fuzzy:
+        books_queryset = fuzzy_search_books(apply_facet_filters(unranked_queryset, facet_filters), search, matches=matches)
+
+    limit = request.GET.get('limit')
+    cursor = request.GET.get('cursor')
+    next_cursor = None
+    if fuzzy:
+        # Ranked by similarity, one page only
+        books_queryset = books_queryset.order_by('-search_rank', '-uploaded_at')
+        if limit:
+            books_queryset = books_queryset[:get_page_size(limit)]
+    else:
+        if search and not (limit or cursor):
+            books_queryset = books_queryset.order_by('-search_rank', '-uploaded_at')
+        if limit or cursor:
+            books_queryset, next_cursor = paginate_newest_first(
+                books_queryset, cursor, get_page_size(limit), 'uploaded_at'
+            )
         
-        books_queryset = Book.objects.all().order_by('-uploaded_at')
+    books_list = [_book_list_item(request, book) for book in books_queryset]
         
-        if department:
-            books_queryset = books_queryset.filter(department=department)
-        if semester:
-            books_queryset = books_queryset.filter(semester=semester)
-        if is_premium is not None:
-            is_premium_bool = is_premium.lower() == 'true'
-            books_queryset = books_queryset.filter(is_premium=is_premium_bool)
-        if featured is not None:
-             featured_bool = featured.lower() == 'true'
-             books_queryset = books_queryset.filter(featured=featured_bool)
-        if search:
-            books_queryset = books_queryset.filter(
-                Q(title__icontains=search) | 
-                Q(author__icontains=search) | 
-                Q(isbn__icontains=search)
+    response_data = {
+        'books': books_list,
+        'count': len(books_list),
+        'nextCursor': next_cursor
+    }
+    if facets:
+        response_data['facets'] = facet_results
+    return response_data
+
+
+def _book_list_item(request, book):
+    """A book as list_books and book_changes return it"""
+    return {
+        'id': book.id,
+        'title': book.title,
+        'author': book.author,
+        'department': book.department,
+        'semester': book.semester,
+        'coverImageUrl': request.build_absolute_uri(book.cover_image.url) if book.cover_image else None,
+        'coverImageSrcset': cover_srcset(request, book),
+        'pdfUrl': request.build_absolute_uri(book.pdf_file.url) if book.pdf_file else None,
+        'isPremium': book.is_premium,
+        'price': book.price,
+        'featured': book.featured,
+        'fileSize': book.file_size,
+        'uploadedAt': book.uploaded_at
+    }
+
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def book_changes(request):
+    """
+    Books added, edited or deleted after `since`, the nextCursor of a previous
+    call (omit it for a first sync: every book). Call again with nextCursor
+    while hasMore is true; a 410 means the cursor expired and the client
+    must sync from scratch.
+    """
+    try:
+        try:
+            books, next_cursor, has_more = changed_books(
+                request.GET.get('since'), get_page_size(request.GET.get('limit'))
             )
-            
-        books_list = []
-        for book in books_queryset:
-            books_list.append({
-                'id': book.id,
+        except CursorExpired as e:
+            return Response({'error': str(e)}, status=status.HTTP_410_GONE)
+        except InvalidCursor as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        changes = []
+        deleted = []
+        for book in books:
+            if book.deleted_at is not None:
+                deleted.append(book.id)
+            else:
+                changes.append({**_book_list_item(request, book), 'updatedAt': book.updated_at})
+
+        return Response({
+            'changes': changes,
+            'deleted': deleted,
+            'nextCursor': next_cursor,
+            'hasMore': has_more
+        }, status=status.HTTP_200_OK)
+
+    except Exception as e:
+        logger.error(f"Error listing book changes: {e}")
+        return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def search_books_content(request):
+    """
+    Search inside book PDFs: the best matching pages with a text snippet.
+    `q` is required; `bookId` restricts the search to one book. Only books
+    the user has access to (see _check_access) are searched.
+    """
+    try:
+        query = request.GET.get('q', '').strip()
+        if not query:
+            return Response({'error': 'Query parameter q is required'}, status=status.HTTP_400_BAD_REQUEST)
+        book_id = request.GET.get('bookId')
+
+        # Pages, scores and snippets reveal the text: only books the user may open are searched
+        matches = search_book_content(
+            query, limit=get_page_size(request.GET.get('limit')), book_id=book_id, books=_readable_books(request)
+        )
+        books = Book.objects.in_bulk({match['book_id'] for match in matches})
+        results = []
+        for match in matches:
+            book = books.get(match['book_id'])
+            if book is None:
+                continue
+            results.append({
+                'bookId': book.id,
                 'title': book.title,
                 'author': book.author,
-                'department': book.department,
-                'semester': book.semester,
-                'coverImageUrl': request.build_absolute_uri(book.cover_image.url) if book.cover_image else None,
-                'pdfUrl': request.build_absolute_uri(book.pdf_file.url) if book.pdf_file else None,
                 'isPremium': book.is_premium,
-                'price': book.price,
-                'featured': book.featured,
-                'fileSize': book.file_size,
-                'uploadedAt': book.uploaded_at
+                'page': match['page'],
+                'snippet': match['snippet'],
+                'score': match['score']
             })
-            
+
         return Response({
-            'books': books_list,
-            'count': len(books_list)
+            'results': results,
+            'count': len(results)
         }, status=status.HTTP_200_OK)
-        
+
     except Exception as e:
-        logger.error(f"Error listing books: {e}")
+        logger.error(f"Error searching book content: {e}")
+        return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def suggest_books(request):
+    """
+    Search-box completions of `q` from titles, authors, tags and ISBNs,
+    most viewed / downloaded first. `limit` defaults to 8 (max 20).
+    """
+    try:
+        query = request.GET.get('q', '').strip()
+        try:
+            limit = int(request.GET.get('limit', SUGGEST_DEFAULT_LIMIT))
+        except ValueError:
+            limit = SUGGEST_DEFAULT_LIMIT
+
+        return Response({
+            'suggestions': suggest(query, limit) if query else []
+        }, status=status.HTTP_200_OK)
+
+    except Exception as e:
+        logger.error(f"Error suggesting books: {e}")
+        return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def catalog_snapshot(request):
+    """
+    The whole catalog as columnar JSON ({'format', 'count', 'columns': {'id': [...], ...}}),
+    gzip-encoded for clients that accept it. Revalidate with If-None-Match.
+    """
+    try:
+        snapshot = get_catalog_snapshot()
+        gzipped = _accepts_encoding(request, 'gzip')
+        etag = quote_etag(snapshot.digest + ('-gzip' if gzipped else ''))
+
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = HttpResponse(snapshot.gzipped if gzipped else snapshot.body, content_type='application/json')
+            if gzipped:
+                response['Content-Encoding'] = 'gzip'
+        response['ETag'] = etag
+        response['Vary'] = 'Accept-Encoding'
+        response['Cache-Control'] = 'public, no-cache'
+        return response
+
+    except Exception as e:
+        logger.error(f"Error serving catalog snapshot: {e}")
         return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
@@ -172,12 +403,32 @@ def get_book_details(request, book_id):
     Get detailed information about a specific book
     """
     try:
-        try:
-            book = Book.objects.get(id=book_id)
-        except Book.DoesNotExist:
-             return Response({'error': 'Book not found'}, status=status.HTTP_404_NOT_FOUND)
+        cached = cached_response(request, f'book:{book_id}', lambda: _book_details_data(request, book_id))
+        if cached is None:
+            return Response({'error': 'Book not found'}, status=status.HTTP_404_NOT_FOUND)
+
+        # Access depends on the user: checked on every request, never cached
+        book = Book(id=book_id, is_premium=cached['book']['isPremium'], pdf_file=cached['pdfFile'])
+        has_access, access_reason = _check_access(request, book)
+                
+        return Response({
+            'book': cached['book'],
+            'hasAccess': has_access,
+            'accessReason': access_reason,
+            'signedPdfUrl': _signed_pdf_url(request, book) if has_access else None
+        }, status=status.HTTP_200_OK)
         
-        book_data = {
+    except Exception as e:
+         return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+def _book_details_data(request, book_id):
+    """get_book_details data shared by every user, plus the PDF name for access checks; None if no such book"""
+    book = Book.objects.filter(id=book_id).first()
+    if book is None:
+        return None
+    return {
+        'book': {
             'id': book.id,
             'title': book.title,
             'author': book.author,
@@ -186,25 +437,16 @@ def get_book_details(request, book_id):
             'department': book.department,
             'semester': book.semester,
             'coverImageUrl': request.build_absolute_uri(book.cover_image.url) if book.cover_image else None,
+            'coverImageSrcset': cover_srcset(request, book),
             'pdfUrl': request.build_absolute_uri(book.pdf_file.url) if book.pdf_file else None,
             'isPremium': book.is_premium,
             'price': book.price,
             'featured': book.featured,
             'fileSize': book.file_size,
-            'tags': book.tags.split(',') if book.tags else []
-        }
-        
-        # Check access
-        has_access, access_reason = _check_access(request, book)
-                
-        return Response({
-            'book': book_data,
-            'hasAccess': has_access,
-            'accessReason': access_reason
-        }, status=status.HTTP_200_OK)
-        
-    except Exception as e:
-         return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+            'tags': parse_tags(book.tags)
+        },
+        'pdfFile': book.pdf_file.name,
+    }
 
 
 def _check_access(request, book):
@@ -234,6 +476,22 @@ def _check_access(request, book):
     return False, 'not-purchased'
 
 
+def _readable_books(request):
+    """The books _check_access grants the user of `request`, as a queryset (keep the two in line)"""
+    user_id = getattr(request, 'user_data', {}).get('uid')
+    if not user_id:
+        return Book.objects.filter(is_premium=False)
+    if not UserProfile.objects.filter(uid=user_id).exclude(id_proof='').exclude(id_proof__isnull=True).exists():
+        return Book.objects.none()
+    return Book.objects.filter(Q(is_premium=False) | Q(purchases__user__uid=user_id)).distinct()
+
+
+def _signed_pdf_url(request, book):
+    """Short-lived signed URL for the book's PDF; only issue it after _check_access succeeds"""
+    url = sign_media_url(book.pdf_file.name) if book.pdf_file else None
+    return request.build_absolute_uri(url) if url else None
+
+
 @api_view(['PUT'])
 @permission_classes([AllowAny])
 def update_book(request, book_id):
@@ -264,17 +522,40 @@ def update_book(request, book_id):
         if 'featured' in request.data:
             book.featured = request.data['featured'].lower() == 'true' if isinstance(request.data['featured'], str) else request.data['featured']
 
-        # Optional file replacement
+        # Optional file replacement. The old files are released only after the
+        # new ones are stored, so re-uploading identical content reuses its blob.
+        replaced_files = []
         if 'coverImage' in request.FILES:
             if book.cover_image:
-                book.cover_image.delete(save=False)  # remove old DatabaseFile row
+                replaced_files.append(book.cover_image.name)
+            replaced_files.extend(variant['name'] for variant in book.cover_variants)
             book.cover_image = request.FILES['coverImage']
+            book.cover_variants = []
         if 'pdfFile' in request.FILES:
             if book.pdf_file:
-                book.pdf_file.delete(save=False)  # remove old DatabaseFile row
+                replaced_files.append(book.pdf_file.name)
+            if book.original_pdf_file:
+                replaced_files.append(book.original_pdf_file.name)
             book.pdf_file = request.FILES['pdfFile']
+            book.original_pdf_file = None
+            book.pdf_optimizer = ''
+            book.pdf_original_size = book.pdf_optimized_size = book.pdf_optimized_at = None
             
-        book.save()
+        with transaction.atomic():
+            book.save()
+            index_book(book)
+            if 'tags' in request.data:
+                set_book_tags(book)
+            if 'pdfFile' in request.FILES:
+                # The old text no longer matches the PDF; extract the new one
+                delete_book_text(book.id)
+                enqueue('extract_book_content', book.id)
+        for name in replaced_files:
+            default_storage.delete(name)  # remove old DatabaseFile row
+        if 'pdfFile' in request.FILES:
+            enqueue('process_book_pdf', book.id)
+        if 'coverImage' in request.FILES:
+            enqueue('resize_book_cover', book.id)
         
         return Response({
             'message': 'Book updated successfully',
@@ -301,12 +582,25 @@ def delete_book(request, book_id):
             
         try:
             book = Book.objects.get(id=book_id)
-            # Clean up stored files from DatabaseStorage before deleting the record
+            # Clean up stored files from DatabaseStorage; the record stays as a
+            # tombstone so clients syncing books/changes/ learn about the deletion
             if book.pdf_file:
                 book.pdf_file.delete(save=False)
+            if book.original_pdf_file:
+                book.original_pdf_file.delete(save=False)
             if book.cover_image:
                 book.cover_image.delete(save=False)
-            book.delete()
+            delete_cover_variants(book.cover_variants)
+            delete_page_segments(book.id)
+            delete_book_text(book.id)
+            with transaction.atomic():
+                remove_book(book.id)
+                remove_book_tags(book.id)
+                book.cover_variants = []
+                book.page_count = None
+                book.content_indexed_at = None
+                book.deleted_at = timezone.now()
+                book.save()
         except Book.DoesNotExist:
              return Response({'error': 'Book not found'}, status=status.HTTP_404_NOT_FOUND)
              
@@ -332,8 +626,67 @@ def check_book_access(request, book_id):
         
         return Response({
             'hasAccess': has_access,
-            'reason': access_reason # Frontend expects 'reason'
+            'reason': access_reason, # Frontend expects 'reason'
+            'signedPdfUrl': _signed_pdf_url(request, book) if has_access else None
         }, status=status.HTTP_200_OK)
         
     except Exception as e:
         return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def get_book_pages(request, book_id):
+    """
+    Page manifest for lazy reading: page count and the stored segments
+    """
+    try:
+        book = Book.objects.filter(id=book_id).only('id', 'page_count').first()
+        if book is None:
+            return Response({'error': 'Book not found'}, status=status.HTTP_404_NOT_FOUND)
+
+        segments = BookPageSegment.objects.filter(book_id=book_id).values('first_page', 'last_page', 'size')
+        return Response({
+            'bookId': book.id,
+            'ready': book.page_count is not None,
+            'pageCount': book.page_count,
+            'pagesPerSegment': get_pages_per_segment(),
+            'segments': [
+                {'firstPage': s['first_page'], 'lastPage': s['last_page'], 'size': s['size']}
+                for s in segments
+            ]
+        }, status=status.HTTP_200_OK)
+
+    except Exception as e:
+        return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def get_book_page(request, book_id, page):
+    """
+    Serve the PDF segment holding page `page` (1-based) of a book
+    """
+    try:
+        try:
+            book = Book.objects.get(id=book_id)
+        except Book.DoesNotExist:
+             return Response({'error': 'Book not found'}, status=status.HTTP_404_NOT_FOUND)
+
+        has_access, access_reason = _check_access(request, book)
+        if not has_access:
+            return Response({'error': 'Access denied', 'reason': access_reason}, status=status.HTTP_403_FORBIDDEN)
+
+        segment = BookPageSegment.objects.filter(
+            book_id=book_id, first_page__lte=page, last_page__gte=page
+        ).values_list('file', flat=True).first()
+        if segment is None:
+            if book.page_count is None:
+                return Response({'error': 'Pages are not ready yet, use pdfUrl'}, status=status.HTTP_404_NOT_FOUND)
+            return Response({'error': 'Page not found'}, status=status.HTTP_404_NOT_FOUND)
+
+        # Ranges, ETags and caching come from the regular media view
+        return serve_database_file(request._request, segment)
+
+    except Exception as e:
+        return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -1,23 +1,304 @@
-from django.http import HttpResponse, Http404, FileResponse
-from django.shortcuts import get_object_or_404
+from django.core import signing
+from django.http import HttpResponse, Http404, StreamingHttpResponse, FileResponse, JsonResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe, quote_etag
 from .models import DatabaseFile
+from .storage import is_content_addressed, iter_file_range, open_payload, open_stored
+from .file_cache import get_file_cache
+from .blob_store import LOCATION_FS
+from .compression import HTTP_ENCODINGS
+from .delivery import get_signed_url_ttl, offload_headers, read_media_token
 import mimetypes
-import io
+import uuid
+
+# Columns needed to answer a request without reading the payload
+METADATA_FIELDS = (
+    'id', 'name', 'size', 'content_type', 'checksum', 'modified_at',
+    'manifest__id', 'manifest__size', 'manifest__stored_size', 'manifest__chunk_size',
+    'manifest__codec', 'manifest__location', 'manifest__path',
+)
+
+# Refuse pathological Range headers (PDF.js asks for one span at a time)
+MAX_RANGES = 16
+
+
+def _parse_range_header(header, size):
+    """
+    Parse a 'bytes=' Range header into a list of inclusive (start, end) spans.
+
+    Returns None when the header should be ignored (malformed or unsupported
+    unit) and an empty list when no span can be satisfied.
+    """
+    if not header or not header.startswith('bytes='):
+        return None
+
+    spans = []
+    for part in header[len('bytes='):].split(','):
+        part = part.strip()
+        if '-' not in part:
+            return None
+        first, last = part.split('-', 1)
+        first, last = first.strip(), last.strip()
+        try:
+            if first == '':
+                # Suffix range: last N bytes
+                suffix = int(last)
+                if suffix <= 0:
+                    continue
+                start, end = max(size - suffix, 0), size - 1
+            else:
+                start = int(first)
+                end = int(last) if last else size - 1
+                if last and end < start:
+                    return None
+                end = min(end, size - 1)
+        except ValueError:
+            return None
+        if start < size:
+            spans.append((start, end))
+
+    if len(spans) > MAX_RANGES:
+        return None
+
+    # Merge overlapping/adjacent spans so a client can't request the same bytes twice
+    spans.sort()
+    merged = []
+    for start, end in spans:
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def _if_range_matches(request, etag, last_modified):
+    """Check the If-Range validator against the stored file"""
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if not if_range:
+        return True
+    if if_range.startswith(('"', 'W/')):
+        # Range requests need a strong validator
+        return etag is not None and if_range == etag
+    if_range_date = parse_http_date_safe(if_range)
+    return if_range_date is not None and if_range_date == last_modified
+
+
+def _accepts_encoding(request, encoding):
+    """True if the Accept-Encoding header allows `encoding`"""
+    for item in request.META.get('HTTP_ACCEPT_ENCODING', '').split(','):
+        token, _, params = item.strip().partition(';')
+        if token.strip().lower() == encoding:
+            return params.replace(' ', '') not in ('q=0', 'q=0.0', 'q=0.00', 'q=0.000')
+    return False
+
+
+def _set_validators(response, etag, last_modified, immutable):
+    if etag:
+        response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    if immutable:
+        response['Cache-Control'] = 'max-age=31536000, immutable'
+    else:
+        response['Cache-Control'] = 'no-cache'
+
+
+def _iter_multipart(source, spans, size, content_type, boundary):
+    """Yield a multipart/byteranges body for several spans"""
+    for start, end in spans:
+        yield (
+            f'--{boundary}\r\n'
+            f'Content-Type: {content_type}\r\n'
+            f'Content-Range: bytes {start}-{end}/{size}\r\n\r\n'
+        ).encode('latin-1')
+        yield from iter_file_range(source, start, end)
+        yield b'\r\n'
+    yield f'--{boundary}--\r\n'.encode('latin-1')
+
+
+class ClosingIterator:
+    """
+    Iterate `chunks` and close `source` (and `chunks`) once done.
+    StreamingHttpResponse calls close() when the response is closed, even if
+    the client went away before the body was read.
+    """
+
+    def __init__(self, chunks, source):
+        self.chunks = chunks
+        self.source = source
+
+    def __iter__(self):
+        return iter(self.chunks)
+
+    def close(self):
+        try:
+            if hasattr(self.chunks, 'close'):
+                self.chunks.close()
+        finally:
+            self.source.close()
+
+
+def _set_content_disposition(response, request, filename):
+    response['Content-Disposition'] = f'inline; filename="{filename}"'
+
+    if params := request.GET.get('download'):
+         response['Content-Disposition'] = f'attachment; filename="{filename}"'
+
 
 def serve_database_file(request, filename):
+    """
+    Serve a file from DatabaseStorage.
+    Honours Range / If-Range so PDF.js can fetch the pages it needs first;
+    only the chunks covering the requested byte spans are read from the database.
+    Conditional requests are answered with 304 from metadata alone, and
+    zlib-compressed payloads go out as-is to clients that accept 'deflate'.
+    """
     try:
-        db_file = get_object_or_404(DatabaseFile, name=filename)
-        
-        # Guess content type
-        content_type, encoding = mimetypes.guess_type(filename)
-        content_type = content_type or 'application/octet-stream'
-        
-        response = HttpResponse(db_file.content, content_type=content_type)
-        response['Content-Disposition'] = f'inline; filename="{filename}"'
-        
-        if params := request.GET.get('download'):
-             response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        db_file = DatabaseFile.objects.select_related('manifest').only(*METADATA_FIELDS).get(name=filename)
+    except DatabaseFile.DoesNotExist:
+        raise Http404("File not found")
+
+    manifest = db_file.manifest
+    codec = manifest.codec if manifest else ''
+    http_encoding = HTTP_ENCODINGS.get(codec)
+    if http_encoding and ('HTTP_RANGE' in request.META or not _accepts_encoding(request, http_encoding)):
+        http_encoding = None
+
+    etag = quote_etag(db_file.checksum + (f'-{http_encoding}' if http_encoding else '')) if db_file.checksum else None
+    last_modified = int(db_file.modified_at.timestamp())
+    immutable = is_content_addressed(filename, db_file.checksum)
+
+    not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if not_modified is not None:
+        _set_validators(not_modified, etag, last_modified, immutable)
+        if codec:
+            not_modified['Vary'] = 'Accept-Encoding'
+        return not_modified
 
+    # Prefer the type sniffed at upload time, else guess from the name
+    content_type = db_file.content_type or mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+
+    size = db_file.size
+
+    spans = None
+    if request.method in ('GET', 'HEAD') and _if_range_matches(request, etag, last_modified):
+        spans = _parse_range_header(request.META.get('HTTP_RANGE', ''), size)
+
+    if spans == []:
+        # Nothing to read
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+        response['Accept-Ranges'] = 'bytes'
+        _set_validators(response, etag, last_modified, immutable)
+        if codec:
+            response['Vary'] = 'Accept-Encoding'
         return response
-    except Exception as e:
-        raise Http404("File not found")
+
+    # Read from the local disk cache when the file is there
+    cache = get_file_cache() if db_file.checksum and not http_encoding else None
+    cached_path = cache.get(filename, db_file.checksum) if cache else None
+    local_file = None
+    if cached_path:
+        try:
+            local_file = open(cached_path, 'rb')
+        except FileNotFoundError:
+            pass  # Evicted between lookup and open
+    if local_file is None:
+        source = open_stored(db_file) if http_encoding else open_payload(db_file)
+        if manifest and manifest.location == LOCATION_FS:
+            # Payload lives in the filesystem blob store, no need to cache it
+            cache = None
+            if not codec:
+                local_file = source
+        elif cache and spans:
+            cache.fill_in_background(filename, db_file.checksum, lambda: open_payload(db_file))
+    source = local_file or source
+
+    if spans and len(spans) == 1:
+        start, end = spans[0]
+        response = StreamingHttpResponse(
+            ClosingIterator(iter_file_range(source, start, end), source), status=206, content_type=content_type
+        )
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+        response['Content-Length'] = str(end - start + 1)
+    elif spans:
+        boundary = uuid.uuid4().hex
+        response = StreamingHttpResponse(
+            ClosingIterator(_iter_multipart(source, spans, size, content_type, boundary), source),
+            status=206,
+            content_type=f'multipart/byteranges; boundary={boundary}'
+        )
+    elif http_encoding:
+        # Already-deflated bytes go out unchanged
+        response = StreamingHttpResponse(
+            ClosingIterator(iter_file_range(source, 0, manifest.stored_size - 1), source), content_type=content_type
+        )
+        response['Content-Encoding'] = http_encoding
+        response['Content-Length'] = str(manifest.stored_size)
+    elif local_file:
+        # FileResponse lets the WSGI server use sendfile()
+        response = FileResponse(source, content_type=content_type)
+    else:
+        chunks = iter_file_range(source, 0, size - 1)
+        if cache:
+            chunks = cache.tee(filename, db_file.checksum, chunks)
+        response = StreamingHttpResponse(ClosingIterator(chunks, source), content_type=content_type)
+        response['Content-Length'] = str(size)
+
+    response['Accept-Ranges'] = 'bytes'
+    _set_validators(response, etag, last_modified, immutable)
+    if codec:
+        response['Vary'] = 'Accept-Encoding'
+    _set_content_disposition(response, request, filename)
+
+    return response
+
+
+def serve_signed_file(request, token):
+    """
+    Serve a file through a signed URL from sign_media_url().
+    The signature is checked without touching the database. Files with a
+    local copy (file cache or blob store) are handed to the front proxy via
+    X-Accel-Redirect / X-Sendfile; everything else, or every file when
+    offloading is off, is streamed by serve_database_file().
+    """
+    try:
+        payload = read_media_token(token)
+    except signing.SignatureExpired:
+        return JsonResponse({'error': 'Link expired'}, status=403)
+    except signing.BadSignature:
+        return JsonResponse({'error': 'Invalid link'}, status=403)
+
+    filename, checksum = payload['n'], payload['c']
+    headers = offload_headers(filename, checksum, payload['p'])
+    if headers is None:
+        # A streamed full read also fills the file cache, so the next request can be offloaded
+        return serve_database_file(request, filename)
+
+    etag = quote_etag(checksum) if checksum else None
+    not_modified = get_conditional_response(request, etag=etag)
+    if not_modified is not None:
+        return not_modified
+
+    # The proxy serves the bytes, including Range requests; we only send headers
+    content_type = payload['t'] or mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    response = HttpResponse(content_type=content_type)
+    for header, value in headers.items():
+        response[header] = value
+    if etag:
+        response['ETag'] = etag
+    response['Cache-Control'] = f'private, max-age={get_signed_url_ttl()}'
+    _set_content_disposition(response, request, filename)
+    return response
+
+
+def get_file_cache_stats(request):
+    """Hit / miss / eviction counters of this worker's file cache (admin only)"""
+    user_role = getattr(request, 'user_data', {}).get('role')
+    if user_role != 'admin':
+        return JsonResponse({'error': 'Unauthorized. Admin access required.'}, status=403)
+
+    cache = get_file_cache()
+    return JsonResponse({
+        'enabled': cache is not None,
+        'stats': cache.stats() if cache else None
+    })
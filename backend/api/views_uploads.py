@@ -0,0 +1,206 @@
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import AllowAny
+from rest_framework.response import Response
+from rest_framework import status
+from django.core.files.storage import default_storage
+from django.db import transaction
+from .models import Book, DatabaseFileChunk, UploadSession
+from .storage import sniff_content_type
+from .uploads import create_upload_session, discard_upload_session
+from .views_books import MAX_PDF_SIZE
+import hashlib
+import re
+import logging
+
+logger = logging.getLogger(__name__)
+
+SHA256_PATTERN = re.compile(r'^[0-9a-f]{64}$')
+
+
+def _is_admin(request):
+    return getattr(request, 'user_data', {}).get('role') == 'admin'
+
+
+def _session_data(session):
+    chunk_size = session.manifest.chunk_size
+    return {
+        'uploadId': session.id,
+        'size': session.size,
+        'chunkSize': chunk_size,
+        'chunkCount': -(-session.size // chunk_size),
+        'offset': session.received,
+        'nextChunk': -(-session.received // chunk_size),
+        'completed': session.completed,
+    }
+
+
+@api_view(['POST'])
+@permission_classes([AllowAny])
+def create_pdf_upload(request):
+    """
+    Start a resumable PDF upload
+    Admin only endpoint. Body: filename, size, optional checksum (SHA-256 hex)
+    """
+    try:
+        if not _is_admin(request):
+            return Response({'error': 'Unauthorized. Admin access required.'}, status=status.HTTP_403_FORBIDDEN)
+
+        filename = request.data.get('filename')
+        checksum = (request.data.get('checksum') or '').lower()
+        try:
+            size = int(request.data.get('size'))
+        except (TypeError, ValueError):
+            size = 0
+        if not filename or size <= 0:
+            return Response({'error': 'filename and a positive size are required'}, status=status.HTTP_400_BAD_REQUEST)
+        if checksum and not SHA256_PATTERN.match(checksum):
+            return Response({'error': 'checksum must be a SHA-256 hex digest'}, status=status.HTTP_400_BAD_REQUEST)
+        if size > MAX_PDF_SIZE:
+            size_mb = size / (1024 * 1024)
+            return Response({
+                'error': f'PDF file is too large ({size_mb:.1f} MB). Maximum allowed size is 25 MB. Please compress or split your PDF.'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        name = Book._meta.get_field('pdf_file').generate_filename(None, filename)
+        session = create_upload_session(name, size, request.user_data.get('uid', 'unknown'), checksum)
+        return Response(_session_data(session), status=status.HTTP_201_CREATED)
+
+    except Exception as e:
+        logger.error(f"Error creating upload session: {e}")
+        return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+@api_view(['GET', 'DELETE'])
+@permission_classes([AllowAny])
+def pdf_upload_status(request, upload_id):
+    """
+    GET: report the confirmed offset so an interrupted upload can resume
+    DELETE: abandon the upload
+    """
+    try:
+        if not _is_admin(request):
+            return Response({'error': 'Unauthorized. Admin access required.'}, status=status.HTTP_403_FORBIDDEN)
+
+        session = UploadSession.objects.select_related('manifest').filter(id=upload_id).first()
+        if session is None:
+            return Response({'error': 'Upload not found'}, status=status.HTTP_404_NOT_FOUND)
+
+        if request.method == 'DELETE':
+            discard_upload_session(session)
+            return Response({'message': 'Upload discarded'}, status=status.HTTP_200_OK)
+        return Response(_session_data(session), status=status.HTTP_200_OK)
+
+    except Exception as e:
+        return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+@api_view(['PUT'])
+@permission_classes([AllowAny])
+def put_pdf_upload_chunk(request, upload_id, seq):
+    """
+    Store chunk `seq` of an upload. The body is the raw chunk bytes, with
+    headers Upload-Offset (seq * chunkSize) and Upload-Checksum (SHA-256 hex
+    of the chunk). Chunks must arrive in order; resending a confirmed chunk
+    is accepted, so a retry after a lost response is harmless.
+    """
+    try:
+        if not _is_admin(request):
+            return Response({'error': 'Unauthorized. Admin access required.'}, status=status.HTTP_403_FORBIDDEN)
+
+        session = UploadSession.objects.select_related('manifest').filter(id=upload_id).first()
+        if session is None:
+            return Response({'error': 'Upload not found'}, status=status.HTTP_404_NOT_FOUND)
+
+        chunk_size = session.manifest.chunk_size
+        start = seq * chunk_size
+        if start >= session.size:
+            return Response({'error': 'Chunk is past the end of the upload'}, status=status.HTTP_400_BAD_REQUEST)
+        expected_length = min(chunk_size, session.size - start)
+        # Check the declared length before reading, so an oversized body is never buffered
+        if int(request.META.get('CONTENT_LENGTH') or 0) != expected_length:
+            return Response({'error': f'Chunk {seq} must be exactly {expected_length} bytes'}, status=status.HTTP_400_BAD_REQUEST)
+        if request.META.get('HTTP_UPLOAD_OFFSET') != str(start):
+            return Response({'error': f'Upload-Offset must be {start} for chunk {seq}'}, status=status.HTTP_400_BAD_REQUEST)
+
+        data = request.body
+        checksum = hashlib.sha256(data).hexdigest()
+        if len(data) != expected_length or checksum != request.META.get('HTTP_UPLOAD_CHECKSUM', '').lower():
+            return Response({'error': 'Chunk checksum mismatch, please resend it'}, status=status.HTTP_400_BAD_REQUEST)
+
+        with transaction.atomic():
+            session = UploadSession.objects.select_for_update().select_related('manifest').get(pk=session.pk)
+            manifest = session.manifest
+            if session.completed:
+                return Response({'error': 'Upload already completed', **_session_data(session)}, status=status.HTTP_409_CONFLICT)
+
+            if seq < manifest.chunk_count:
+                stored = DatabaseFileChunk.objects.filter(manifest=manifest, seq=seq).values_list('data', flat=True).get()
+                if hashlib.sha256(stored).hexdigest() != checksum:
+                    return Response({'error': f'Chunk {seq} was already stored with different content', **_session_data(session)},
+                                    status=status.HTTP_409_CONFLICT)
+            elif seq > manifest.chunk_count:
+                return Response({'error': 'Chunks must be sent in order; resume from offset', **_session_data(session)},
+                                status=status.HTTP_409_CONFLICT)
+            else:
+                DatabaseFileChunk.objects.create(manifest=manifest, seq=seq, data=data)
+                manifest.chunk_count += 1
+                manifest.stored_size += len(data)
+                manifest.save(update_fields=['chunk_count', 'stored_size'])
+                session.received += len(data)
+                session.save(update_fields=['received', 'updated_at'])
+
+        return Response(_session_data(session), status=status.HTTP_200_OK)
+
+    except Exception as e:
+        logger.error(f"Error storing upload chunk: {e}")
+        return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+@api_view(['POST'])
+@permission_classes([AllowAny])
+def complete_pdf_upload(request, upload_id):
+    """
+    Seal an upload once every chunk is confirmed. The whole file is checked
+    against the checksum given at creation (on a mismatch the received chunks
+    are dropped and the upload restarts from offset 0); the returned uploadId
+    can then be passed to books/upload/ as pdfUploadId instead of a pdfFile.
+    """
+    try:
+        if not _is_admin(request):
+            return Response({'error': 'Unauthorized. Admin access required.'}, status=status.HTTP_403_FORBIDDEN)
+
+        with transaction.atomic():
+            session = UploadSession.objects.select_for_update().select_related('manifest').filter(id=upload_id).first()
+            if session is None:
+                return Response({'error': 'Upload not found'}, status=status.HTTP_404_NOT_FOUND)
+            if session.completed:
+                return Response(_session_data(session), status=status.HTTP_200_OK)
+            if session.received != session.size:
+                return Response({'error': 'Upload is incomplete', **_session_data(session)}, status=status.HTTP_409_CONFLICT)
+
+            pending = session.manifest
+            try:
+                manifest, head = default_storage.seal_upload(session.name, pending, session.checksum or None)
+            except ValueError as e:
+                # One of the chunks is wrong and we cannot tell which: restart the upload from offset 0
+                DatabaseFileChunk.objects.filter(manifest=pending).delete()
+                pending.chunk_count = pending.stored_size = 0
+                pending.save(update_fields=['chunk_count', 'stored_size'])
+                session.received = 0
+                session.save(update_fields=['received', 'updated_at'])
+                return Response({'error': f'{e}; send the file again from offset 0', **_session_data(session)},
+                                status=status.HTTP_400_BAD_REQUEST)
+
+            session.manifest = manifest
+            session.completed = True
+            session.content_type = sniff_content_type(head, session.name)
+            session.save(update_fields=['manifest', 'completed', 'content_type', 'updated_at'])
+            if manifest.pk != pending.pk:
+                # Same bytes were already stored; drop the duplicate chunks
+                pending.delete()
+
+        return Response(_session_data(session), status=status.HTTP_200_OK)
+
+    except Exception as e:
+        logger.error(f"Error completing upload: {e}")
+        return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
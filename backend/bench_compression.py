@@ -0,0 +1,82 @@
+"""
+Benchmark compression at rest for DatabaseStorage payloads.
+
+Usage: python bench_compression.py [file ...]
+
+Without arguments it uses the sample PDF and images shipped in the repo.
+For each codec it reports bytes stored, bytes sent (deflate pass-through
+for zlib, decoded bytes otherwise) and the CPU time spent compressing and
+decompressing. Files where the codec does not pay off are stored raw, as
+DatabaseStorage does.
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from api.compression import CODECS, HTTP_ENCODINGS, decode_chunks, encode_chunks, worth_compressing
+
+CHUNK_SIZE = 256 * 1024
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_CORPUS = [
+    os.path.join(REPO_ROOT, 'Project requirement _260212_191015.pdf'),
+    os.path.join(REPO_ROOT, 'frontend', 'public', 'sgi logo.jpg'),
+    os.path.join(REPO_ROOT, 'frontend', 'public', 'logo.svg'),
+    os.path.join(REPO_ROOT, 'frontend', 'src', 'images', 'Must-Have-Digital-Library-Tools-1.jpeg.webp'),
+]
+
+
+def read_chunks(path):
+    with open(path, 'rb') as f:
+        yield from iter(lambda: f.read(CHUNK_SIZE), b'')
+
+
+def bench_file(path, codec):
+    raw_size = os.path.getsize(path)
+    with open(path, 'rb') as f:
+        sample = f.read(CHUNK_SIZE)
+    if not worth_compressing(codec, sample):
+        return raw_size, raw_size, raw_size, 0.0, 0.0, False
+
+    start = time.process_time()
+    stored = b''.join(encode_chunks(read_chunks(path), codec))
+    encode_cpu = time.process_time() - start
+
+    start = time.process_time()
+    decoded_size = sum(len(chunk) for chunk in decode_chunks([stored], codec))
+    decode_cpu = time.process_time() - start
+    assert decoded_size == raw_size
+
+    # zlib goes out as Content-Encoding: deflate with no decode on the server
+    sent = len(stored) if codec in HTTP_ENCODINGS else raw_size
+    if codec in HTTP_ENCODINGS:
+        decode_cpu = 0.0
+    return raw_size, len(stored), sent, encode_cpu, decode_cpu, True
+
+
+def main():
+    corpus = [path for path in (sys.argv[1:] or DEFAULT_CORPUS) if os.path.isfile(path)]
+    if not corpus:
+        print("No sample files found.")
+        return
+
+    print(f"{'file':40} {'codec':6} {'raw':>10} {'stored':>10} {'sent':>10} {'enc ms':>8} {'dec ms':>8}")
+    for codec in CODECS:
+        totals = [0, 0, 0, 0.0, 0.0]
+        for path in corpus:
+            raw, stored, sent, enc, dec, compressed = bench_file(path, codec)
+            label = os.path.basename(path)[:38] + ('' if compressed else ' *')
+            print(f"{label:40} {codec:6} {raw:>10} {stored:>10} {sent:>10} {enc * 1000:>8.1f} {dec * 1000:>8.1f}")
+            for i, value in enumerate((raw, stored, sent, enc, dec)):
+                totals[i] += value
+        raw, stored, sent, enc, dec = totals
+        print(f"{'TOTAL':40} {codec:6} {raw:>10} {stored:>10} {sent:>10} {enc * 1000:>8.1f} {dec * 1000:>8.1f}"
+              f"   stored {stored / raw:.0%} of raw")
+        print()
+    print("* stored raw: compressing the first chunk saved too little")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+"""
+Benchmark typo-tolerant (fuzzy=true) title / author search at catalog scale.
+
+Usage: python bench_fuzzy.py [--titles 100000] [--queries 200]
+
+Builds the trigram index over synthetic titles and authors and looks up
+misspelled words of random titles, reporting build time and lookup
+latency, and how often the misspelled book is among the results. For
+comparison it also times the trigram similarity scan over every title
+that the index avoids.
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from api.fuzzy_index import DEFAULT_THRESHOLD, TrigramIndex, normalize, trigrams
+
+SYLLABLES = (
+    'al go rith net work da ta base sys tem com pi ler the o ry sig nal cir cuit ma chine lear ning neu ral '
+    'graph phy sics che mis try bio lo gy eco no mics struc ture pro cess ing de sign ana ly sis mod ern '
+    'quan tum ther mo dy nam ic fluid me chan ics elec tron vlsi cloud se cur i ty web ap pli ca tion'
+).split()
+FIRST_NAMES = ['Ravi', 'Anita', 'Thomas', 'Andrew', 'Priya', 'Donald', 'Sneha', 'Alan', 'Grace', 'Vikram']
+
+
+def make_catalog(count, seed=7):
+    rng = random.Random(seed)
+    vocabulary = sorted({''.join(rng.choices(SYLLABLES, k=rng.randint(2, 4))) for _ in range(30000)})
+    surnames = sorted({''.join(rng.choices(SYLLABLES, k=3)).title() for _ in range(5000)})
+    catalog = []
+    for i in range(count):
+        title = ' '.join(rng.choices(vocabulary, k=rng.randint(2, 6))).title()
+        author = f'{rng.choice(FIRST_NAMES)} {rng.choice(surnames)}'
+        catalog.append((f'book-{i:06d}', title, author))
+    return catalog
+
+
+def misspell(word, rng):
+    """Drop, double or swap one letter"""
+    if len(word) < 4:
+        return word
+    i = rng.randrange(1, len(word) - 1)
+    edit = rng.choice(('drop', 'double', 'swap'))
+    if edit == 'drop':
+        return word[:i] + word[i + 1:]
+    if edit == 'double':
+        return word[:i] + word[i] + word[i:]
+    return word[:i] + word[i + 1] + word[i] + word[i + 2:]
+
+
+def scan(catalog_grams, query):
+    """Similarity of the query against every title word, without the index"""
+    query_grams = [trigrams(word) for word in normalize(query)]
+    best = []
+    for book_id, words in catalog_grams:
+        total = 0
+        for grams in query_grams:
+            total += max((len(grams & other) / len(grams | other) for other in words), default=0)
+        if total / len(query_grams) >= DEFAULT_THRESHOLD:
+            best.append((book_id, total))
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--titles', type=int, default=100000)
+    parser.add_argument('--queries', type=int, default=200)
+    args = parser.parse_args()
+
+    catalog = make_catalog(args.titles)
+    index = TrigramIndex()
+    start = time.perf_counter()
+    for book_id, title, author in catalog:
+        index.add(book_id, {'title': title, 'author': author})
+    build_time = time.perf_counter() - start
+    print(f'{args.titles} titles: index built in {build_time:.1f}s, '
+          f'{len(index.words)} distinct words, {len(index.postings)} trigrams')
+
+    rng = random.Random(1)
+    timings, found = [], 0
+    queries = []
+    for _ in range(args.queries):
+        book_id, title, author = rng.choice(catalog)
+        words = normalize(title)[:2]
+        query = ' '.join(misspell(word, rng) for word in words)
+        queries.append(query)
+        start = time.perf_counter()
+        results = index.search(query, limit=20)
+        timings.append((time.perf_counter() - start) * 1000)
+        found += any(result[0] == book_id for result in results)
+
+    timings.sort()
+    p99 = timings[min(len(timings) - 1, int(len(timings) * 0.99))]
+    print(f'indexed lookup: median {statistics.median(timings):.2f} ms, p99 {p99:.2f} ms, max {timings[-1]:.2f} ms; '
+          f'misspelled book in top 20 for {found}/{len(queries)} queries')
+
+    catalog_grams = [
+        (book_id, [trigrams(word) for word in normalize(f'{title} {author}')])
+        for book_id, title, author in catalog
+    ]
+    start = time.perf_counter()
+    for query in queries[:5]:
+        scan(catalog_grams, query)
+    print(f'full scan (no index): {(time.perf_counter() - start) * 1000 / 5:.0f} ms per query')
+
+
+if __name__ == '__main__':
+    main()
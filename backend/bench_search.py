@@ -0,0 +1,158 @@
+"""
+Benchmark the full-text book search against the icontains scan.
+
+Usage: python bench_search.py [--books 50000] [--repeat 5]
+
+Runs against a throwaway test database created from the current settings
+(an in-memory SQLite FTS5 index under USE_SQLITE, a FULLTEXT index on
+MySQL), fills it with synthetic books and times list_books-style queries
+through both backends. It then builds the in-process BM25 index
+(SEARCH_BACKEND = 'memory') and reports its build, snapshot and lookup
+times.
+"""
+
+import os
+import sys
+import time
+import random
+import itertools
+import argparse
+import tempfile
+import statistics
+import django
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'library_system.settings')
+django.setup()
+
+from django.db import connection, transaction
+from api.models import Book
+from api.search import BasicSearchBackend, get_search_backend
+from api.search_index import InvertedIndex, build_index
+
+SYLLABLES = 'al go rith net work data base sys tem com pile the ory sig nal cir cuit mach ine lear ning neu ral graph'.split()
+AUTHORS = ['Kumar', 'Sharma', 'Knuth', 'Tanenbaum', 'Cormen', 'Stallings', 'Haykin', 'Patel', 'Singh', 'Rao']
+
+
+def make_vocabulary(rng, size=20000):
+    words = set()
+    while len(words) < size:
+        words.add(''.join(rng.choices(SYLLABLES, k=rng.randint(2, 4))))
+    return sorted(words)
+
+
+def populate(count, seed=42):
+    """
+    Insert `count` books whose words follow a Zipf-like distribution, as
+    natural text does: a few words are everywhere, most are rare.
+    Returns the vocabulary, most frequent first.
+    """
+    rng = random.Random(seed)
+    vocabulary = make_vocabulary(rng)
+    rng.shuffle(vocabulary)
+    cum_weights = list(itertools.accumulate(1 / rank for rank in range(1, len(vocabulary) + 1)))
+
+    def words(k):
+        return rng.choices(vocabulary, cum_weights=cum_weights, k=k)
+
+    batch = []
+    for i in range(count):
+        batch.append(Book(
+            id=f'bench-{i:06d}',
+            title=' '.join(words(4)).title(),
+            author=f'{rng.choice(AUTHORS)} {rng.choice(AUTHORS)}',
+            description=' '.join(words(60)),
+            isbn=f'978-81-{rng.randrange(10000):04d}-{rng.randrange(1000):03d}-{i % 10}',
+            department='CSE', semester='all',
+            tags=', '.join(words(3)),
+            uploaded_by='bench',
+        ))
+        if len(batch) == 2000:
+            Book.objects.bulk_create(batch)
+            batch = []
+    Book.objects.bulk_create(batch)
+    return vocabulary
+
+
+def make_queries(vocabulary):
+    """Common, mid-frequency and rare words, a two-word query, a prefix, an author and an ISBN"""
+    return [
+        vocabulary[0], vocabulary[100], vocabulary[5000],
+        f'{vocabulary[20]} {vocabulary[300]}', vocabulary[50][:5], 'Tanenbaum', '978-81-1234',
+    ]
+
+
+def time_query(backend, query, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        # First page as list_books serves it, plus the total match count
+        queryset = backend.filter(Book.objects.all(), query)
+        if backend.name == BasicSearchBackend.name:
+            queryset = queryset.order_by('-uploaded_at')
+        else:
+            queryset = queryset.order_by('-search_rank', '-uploaded_at')
+        rows = list(queryset.values_list('id', flat=True)[:50])
+        count = queryset.count()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000, len(rows), count
+
+
+def bench_memory_index(queries, repeat):
+    start = time.perf_counter()
+    index = build_index()
+    build_time = time.perf_counter() - start
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'search-index.pickle')
+        index.save(path)
+        snapshot_size = os.path.getsize(path)
+        start = time.perf_counter()
+        index = InvertedIndex.load(path)
+        load_time = time.perf_counter() - start
+    print(f'\nmemory index: build {build_time:.1f}s, snapshot {snapshot_size / 1024 / 1024:.1f} MB loaded in {load_time:.2f}s')
+
+    print(f'{"query":<28}{"median ms":>12}{"max ms":>10}{"matches":>9}')
+    for query in queries:
+        timings = []
+        for _ in range(repeat * 20):
+            start = time.perf_counter()
+            index.search(query, limit=50)
+            timings.append((time.perf_counter() - start) * 1000)
+        matches = len(index.search(query))
+        print(f'{query:<28}{statistics.median(timings):>12.3f}{max(timings):>10.3f}{matches:>9}')
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--books', type=int, default=50000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    old_name = connection.creation.create_test_db(verbosity=0, keepdb=False)
+    try:
+        start = time.perf_counter()
+        with transaction.atomic():
+            vocabulary = populate(args.books)
+        populate_time = time.perf_counter() - start
+
+        backend = get_search_backend()
+        start = time.perf_counter()
+        with transaction.atomic():
+            backend.rebuild()
+        index_time = time.perf_counter() - start
+        print(f'{args.books} books on {connection.vendor}: insert {populate_time:.1f}s, index rebuild {index_time:.1f}s')
+
+        basic = BasicSearchBackend()
+        print(f'{"query":<28}{"icontains ms":>14}{"matches":>9}{backend.name + " ms":>14}{"matches":>9}{"speedup":>9}')
+        for query in make_queries(vocabulary):
+            basic_ms, _, basic_count = time_query(basic, query, args.repeat)
+            search_ms, _, search_count = time_query(backend, query, args.repeat)
+            print(f'{query:<28}{basic_ms:>14.1f}{basic_count:>9}{search_ms:>14.1f}{search_count:>9}{basic_ms / search_ms:>8.1f}x')
+
+        bench_memory_index(make_queries(vocabulary), args.repeat)
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+if __name__ == '__main__':
+    main()
@@ -8,13 +8,16 @@ from api.models import DatabaseFile
 
 def list_files():
     print("Listing Database Files:")
-    files = DatabaseFile.objects.all()
-    if not files:
+    # Metadata only: never pulls file payloads
+    files = DatabaseFile.objects.values_list(
+        'id', 'name', 'size', 'manifest__location', 'manifest__codec', 'manifest__ref_count'
+    ).order_by('id')
+    if not files.exists():
         print("No files found in database.")
         return
 
-    for f in files:
-        print(f"ID: {f.id} | Name: '{f.name}' | Size: {f.size}")
+    for file_id, name, size, location, codec, refs in files.iterator():
+        print(f"ID: {file_id} | Name: '{name}' | Size: {size} | Location: {location or 'legacy'} | Codec: {codec or '-'} | Refs: {refs}")
 
 if __name__ == '__main__':
     list_files()
@@ -8,6 +8,7 @@ import json
 from dotenv import load_dotenv
 import firebase_admin
 from firebase_admin import credentials
+from corsheaders.defaults import default_headers
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -143,7 +144,7 @@ MEDIA_ROOT = os.path.join(BASE_DIR, 'media')  # Keep for fallback or static tool
 
 STORAGES = {
     "default": {
-        "BACKEND": "api.storage.DatabaseStorage",
+        "BACKEND": "api.storage.HybridStorage",
     },
     "staticfiles": {
         "BACKEND": "whitenoise.storage.CompressedManifestStaticFilesStorage",
@@ -155,7 +156,88 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 # File upload size limits (must be > PDF limit of 25 MB for multipart form totals)
 DATA_UPLOAD_MAX_MEMORY_SIZE = 30 * 1024 * 1024   # 30 MB
-FILE_UPLOAD_MAX_MEMORY_SIZE = 30 * 1024 * 1024   # 30 MB
+# Uploads above this are spooled to a temp file instead of held in memory;
+# DatabaseStorage then streams them into the database chunk by chunk
+FILE_UPLOAD_MAX_MEMORY_SIZE = int(2.5 * 1024 * 1024)   # 2.5 MB
+
+# DatabaseStorage chunk row size
+DATABASE_STORAGE_CHUNK_SIZE = 256 * 1024   # 256 KB
+# Embed a content hash in stored file names so they can be cached as immutable
+DATABASE_STORAGE_HASHED_NAMES = True
+# Optional local disk cache in front of DatabaseStorage (disabled when LOCATION is empty)
+DATABASE_STORAGE_CACHE = {
+    'LOCATION': os.getenv('FILE_CACHE_DIR', ''),
+    'MAX_BYTES': int(os.getenv('FILE_CACHE_MAX_BYTES', 1024 * 1024 * 1024)),   # 1 GB
+}
+# Optional filesystem blob store used by HybridStorage for these prefixes
+# (payloads stay in MySQL when LOCATION is empty)
+DATABASE_STORAGE_BLOB_STORE = {
+    'LOCATION': os.getenv('BLOB_STORE_DIR', ''),
+    'PREFIXES': ['books/pdfs/', 'books/pages/', 'books/covers/', 'id-proofs/'],
+}
+# Opt-in compression at rest per name prefix ('zlib' or 'lzma'),
+# e.g. {'exports/': 'zlib'}. Files that don't compress are stored raw, and so
+# are PDFs: PDF.js reads them by Range, and every range of a compressed file
+# costs decoding it from the start, O(file size) per request.
+DATABASE_STORAGE_COMPRESSION = {}
+# Pages per stored segment when book PDFs are split for lazy reading
+# (1 = one small PDF per page)
+PDF_PAGES_PER_SEGMENT = 1
+# Widths (px) of the WebP and JPEG cover variants generated for srcset
+COVER_VARIANT_WIDTHS = [160, 320, 640]
+
+# Catalog search: '' picks the database's full-text engine (MySQL FULLTEXT or
+# SQLite FTS5); 'memory' uses an in-process BM25 index, loaded from
+# SEARCH_INDEX_SNAPSHOT when that file exists (see `manage.py rebuild_search_index`)
+SEARCH_BACKEND = os.getenv('SEARCH_BACKEND', '')
+SEARCH_INDEX_SNAPSHOT = os.getenv('SEARCH_INDEX_SNAPSHOT', '')
+# The server's innodb_ft_min_token_size: shorter words are not in the
+# FULLTEXT index, so MySQL searches do not require them
+MYSQL_FT_MIN_TOKEN_SIZE = int(os.getenv('MYSQL_FT_MIN_TOKEN_SIZE', 3))
+# `fuzzy=true` searches: minimum trigram similarity (0-1) of a title / author
+# match, and how often (seconds) workers rebuild the trigram index to pick
+# up changes made through other workers
+FUZZY_SEARCH_THRESHOLD = 0.3
+FUZZY_INDEX_MAX_AGE = 300
+# Seconds between rebuilds of each worker's suggestion index, which also
+# refreshes the view / download counts suggestions are ranked by
+SUGGEST_INDEX_MAX_AGE = 300
+
+# Cache of catalog responses (list_books, get_book_details; see
+# api/response_cache.py). It must be shared by every instance serving the
+# API, so a change made through one invalidates them all: a table in the
+# database by default (created by migration 0020, or `manage.py
+# createcachetable`), or e.g. CACHE_BACKEND=
+# django.core.cache.backends.redis.RedisCache with CACHE_LOCATION=redis://...
+# The per-process LocMemCache is only right for a single process.
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND', 'django.core.cache.backends.db.DatabaseCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', 'api_cache'),
+    }
+}
+CATALOG_CACHE_TIMEOUT = int(os.getenv('CATALOG_CACHE_TIMEOUT', 300))   # seconds
+# Seconds a worker serves its books/snapshot/ copy before rebuilding it even
+# without a visible catalog change (changes are seen through the catalog
+# version in the shared cache; this bounds staleness if it is lost)
+CATALOG_SNAPSHOT_MAX_AGE = 300
+# books/changes/ sends changes of the last CHANGES_SETTLE_SECONDS again on
+# the next sync, so books saved by transactions committing late are not
+# missed; deleted books are kept BOOK_TOMBSTONE_RETENTION_DAYS for it
+# (`manage.py purge_deleted_books`)
+CHANGES_SETTLE_SECONDS = 60
+BOOK_TOMBSTONE_RETENTION_DAYS = 90
+
+# Short-lived signed media URLs, handed off to a front proxy when OFFLOAD is set:
+# 'x-accel-redirect' (nginx: internal locations aliasing the file cache and blob
+# store directories at the prefixes below) or 'x-sendfile' (Apache/lighttpd).
+# Without OFFLOAD, signed URLs are streamed by Django.
+MEDIA_DELIVERY = {
+    'SIGNED_URL_TTL': int(os.getenv('SIGNED_URL_TTL', 300)),   # seconds
+    'OFFLOAD': os.getenv('MEDIA_OFFLOAD', ''),
+    'ACCEL_CACHE_PREFIX': '/internal/file-cache/',
+    'ACCEL_BLOB_PREFIX': '/internal/blobs/',
+}
 
 # CORS settings
 _frontend_url = os.getenv('FRONTEND_URL', 'http://localhost:3000')
@@ -186,6 +268,12 @@ X_FRAME_OPTIONS = 'ALLOWALL'
 
 CORS_ALLOW_CREDENTIALS = True
 
+# Let PDF.js read partial-content headers on cross-origin range requests
+CORS_EXPOSE_HEADERS = ['Accept-Ranges', 'Content-Range', 'Content-Length']
+
+# Headers sent with each chunk of a resumable upload
+CORS_ALLOW_HEADERS = (*default_headers, 'upload-offset', 'upload-checksum')
+
 # REST Framework settings
 REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
@@ -262,3 +350,11 @@ CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = 'Asia/Kolkata'
 CELERY_ENABLE_UTC = False
+
+# Where api.background.enqueue() runs upload processing jobs: 'thread' on a
+# background thread of the web process, after the response; 'celery' on a
+# worker (falling back to a thread if the broker is unreachable); 'inline'
+# in the request once it commits, making uploads wait for the work. A
+# serverless host (Vercel) may stop a thread before its job ran: schedule
+# `manage.py process_pending_books` there, or use Celery.
+BACKGROUND_TASKS = os.getenv('BACKGROUND_TASKS', 'thread')
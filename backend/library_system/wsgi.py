@@ -10,4 +10,10 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'library_system.settings')
 
 application = get_wsgi_application()
 
+from django.conf import settings  # noqa: E402
+
+if settings.SEARCH_BACKEND == 'memory':
+    from api.search_index import warm_up_search_index  # noqa: E402
+    warm_up_search_index()
+
 app = application
@@ -0,0 +1,109 @@
+"""
+Checks of the MySQL FULLTEXT search path.
+
+Usage: python test_search_mysql.py
+
+First checks the boolean-mode queries built for common searches: stopwords
+("to", "of") and words shorter than innodb_ft_min_token_size ("os", "c")
+are never required, since InnoDB leaves them out of the index and a +word
+would then match nothing. Then, on a throwaway test database created from
+the current settings (MySQL FULLTEXT in production settings, SQLite FTS5
+under USE_SQLITE), runs real searches through search_books() and checks
+that titles with such words and hyphenated ISBNs are found.
+"""
+
+import os
+import sys
+import django
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'library_system.settings')
+django.setup()
+
+from django.db import connection, transaction
+from api.models import Book
+from api.search import MySQLFullTextBackend, get_search_backend, isbn_prefix, search_books, tokenize_query
+
+BOOLEAN_QUERIES = {
+    'Introduction to Algorithms': '+introduction +algorithms*',
+    'Theory of Computation': '+theory +computation*',
+    'introduction to al': '+introduction al*',
+    'Operating Systems OS': '+operating +systems os*',
+    'the art of': '+art of*',
+    'C programming': '+programming*',
+    'os': None,
+    'to the': None,
+}
+
+ISBN_PREFIXES = {
+    '978-0-262-03384-8': '9780262033848',
+    '978 0 262': '9780262',
+    'ISBN 0-262-03384-4': '0262033844',
+    '0-8044-2957-X': '080442957X',
+    '2019': None,
+    'Algorithms 978': None,
+}
+
+BOOKS = [
+    ('Introduction to Algorithms', 'Thomas Cormen', '978-0-262-03384-8'),
+    ('Theory of Computation', 'Michael Sipser', '978-1-133-18779-0'),
+    ('Modern Operating Systems', 'Andrew Tanenbaum', '978-0-13-359162-0'),
+    ('The C Programming Language', 'Brian Kernighan', '978-0-13-110362-7'),
+    ('Digital Signal Processing', 'John Proakis', '978-0-13-187374-2'),
+]
+
+SEARCHES = {
+    'Introduction to Algorithms': {'Introduction to Algorithms'},
+    'Theory of Computation': {'Theory of Computation'},
+    'introduction to al': {'Introduction to Algorithms'},
+    'C programming': {'The C Programming Language'},
+    '978-0-262-03384-8': {'Introduction to Algorithms'},
+    '9780262033848': {'Introduction to Algorithms'},
+    '978-0-13': {'Modern Operating Systems', 'The C Programming Language', 'Digital Signal Processing'},
+}
+
+
+def check(label, got, expected, failures):
+    if got != expected:
+        failures.append(f'{label}: expected {expected!r}, got {got!r}')
+
+
+def check_queries(failures):
+    for query, expected in BOOLEAN_QUERIES.items():
+        check(f'boolean query {query!r}', MySQLFullTextBackend.boolean_query(tokenize_query(query)), expected, failures)
+    for query, expected in ISBN_PREFIXES.items():
+        check(f'ISBN prefix {query!r}', isbn_prefix(query), expected, failures)
+
+
+def check_searches(failures):
+    old_name = connection.creation.create_test_db(verbosity=0, keepdb=False)
+    try:
+        # Committed before searching: InnoDB only indexes committed rows
+        with transaction.atomic():
+            Book.objects.bulk_create([
+                Book(id=f'search-{i}', title=title, author=author, isbn=isbn, department='CSE', semester='all',
+                     uploaded_by='test')
+                for i, (title, author, isbn) in enumerate(BOOKS)
+            ])
+            get_search_backend().rebuild()
+        print(f'searching through the {get_search_backend().name} backend on {connection.vendor}')
+        for query, expected in SEARCHES.items():
+            titles = set(search_books(Book.objects.all(), query).values_list('title', flat=True))
+            check(f'search {query!r}', titles, expected, failures)
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+def main():
+    failures = []
+    check_queries(failures)
+    check_searches(failures)
+    for failure in failures:
+        print(f'FAIL {failure}')
+    if failures:
+        sys.exit(1)
+    print('OK')
+
+
+if __name__ == '__main__':
+    main()
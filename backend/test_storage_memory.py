@@ -0,0 +1,53 @@
+import os
+import tempfile
+import tracemalloc
+import django
+from django.core.files import File
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'library_system.settings')
+django.setup()
+
+from django.core.files.storage import default_storage
+from api.storage import get_chunk_size
+
+FILE_SIZE = 20 * 1024 * 1024  # 20 MB, close to the 25 MB PDF limit
+
+def test_storage_memory():
+    print("Testing DatabaseStorage memory profile...")
+    chunk_size = get_chunk_size()
+
+    # Build the upload on disk, like a TemporaryUploadedFile
+    with tempfile.TemporaryFile() as tmp:
+        block = os.urandom(1024 * 1024)
+        for _ in range(FILE_SIZE // len(block)):
+            tmp.write(block)
+        tmp.seek(0)
+
+        tracemalloc.start()
+        name = default_storage.save('test_memory_upload.bin', File(tmp, name='test_memory_upload.bin'))
+        _, save_peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    print(f"Saved {FILE_SIZE} bytes as {name}; peak traced memory {save_peak / 1024:.0f} KB")
+
+    tracemalloc.start()
+    read_size = 0
+    for piece in default_storage.open(name).chunks():
+        read_size += len(piece)
+    _, read_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print(f"Read back {read_size} bytes; peak traced memory {read_peak / 1024:.0f} KB")
+
+    default_storage.delete(name)
+    print("Cleaned up test file.")
+
+    # A flat profile stays within a few chunks, independent of the file size
+    limit = 8 * chunk_size
+    if save_peak < limit and read_peak < limit and read_size == FILE_SIZE:
+        print(f"SUCCESS: Memory stayed under {limit / 1024:.0f} KB.")
+    else:
+        print(f"ERROR: Memory exceeded {limit / 1024:.0f} KB or size mismatch.")
+
+if __name__ == '__main__':
+    test_storage_memory()
@@ -0,0 +1,116 @@
+"""
+Latency check of the books/suggest/ index: p99 of a lookup must stay under 2 ms.
+
+Usage: python test_suggest_latency.py [--books 50000] [--queries 5000]
+
+Builds the suggestion index over synthetic books (popularity skewed like a
+real catalog), then looks up prefixes typed one character at a time from
+random titles, authors, tags and ISBNs while books keep being re-saved with
+new view counts, and compares a sample of answers with a brute-force scan.
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from api.suggest import SuggestIndex, get_weight, normalize
+
+P99_LIMIT_MS = 2.0
+
+WORDS = (
+    'algorithms networks database systems compiler theory signal circuit machine learning neural graph '
+    'physics chemistry biology economics structures processing design analysis modern quantum thermal '
+    'dynamics fluid mechanics electronics vlsi cloud security web applications operating distributed '
+    'introduction advanced principles practical engineering mathematics discrete linear algebra calculus'
+).split()
+TAGS = ['ai', 'cse', 'ece', 'mechanical', 'civil', 'physics', 'maths', 'gate', 'placement', 'python', 'java', 'dbms']
+FIRST_NAMES = ['Ravi', 'Anita', 'Thomas', 'Andrew', 'Priya', 'Donald', 'Sneha', 'Alan', 'Grace', 'Vikram']
+SURNAMES = ['Kumar', 'Sharma', 'Cormen', 'Tanenbaum', 'Knuth', 'Iyer', 'Rao', 'Patel', 'Silberschatz', 'Stallings']
+
+
+def make_books(count, seed=11):
+    rng = random.Random(seed)
+    books = []
+    for i in range(count):
+        title = ' '.join(rng.choices(WORDS, k=rng.randint(2, 5))).title() + f' {rng.randint(1, 9999)}'
+        values = {
+            'title': title,
+            'author': f'{rng.choice(FIRST_NAMES)} {rng.choice(SURNAMES)} {rng.randint(1, 2000)}',
+            'tags': ','.join(rng.sample(TAGS, rng.randint(0, 3))),
+            'isbn': f'978-{rng.randint(0, 9)}-{rng.randint(10000, 99999)}-{rng.randint(100, 999)}-{i % 10}',
+        }
+        # Few books get most of the views
+        views = int(rng.paretovariate(1.2) * 10)
+        books.append((f'book-{i:06d}', values, get_weight(views, views // 5)))
+    return books
+
+
+def typed_prefixes(books, count, seed=13):
+    rng = random.Random(seed)
+    prefixes = []
+    while len(prefixes) < count:
+        _, values, _ = rng.choice(books)
+        text = values[rng.choice(('title', 'title', 'author', 'tags', 'isbn'))] or values['title']
+        prefixes.extend(text[:length] for length in range(1, min(len(text), 12) + 1))
+    return prefixes[:count]
+
+
+def brute_force(index, query, limit):
+    prefix = normalize(query)
+    digits = query.lower().replace('-', '').replace(' ', '')
+    if digits.isdigit():
+        prefix = digits
+    matches = {id(s): s for key, s in zip(index.keys, index.targets) if key.startswith(prefix)}
+    return sorted(suggestion.weight for suggestion in matches.values())[::-1][:limit]
+
+
+def test_suggest_latency(book_count=50000, query_count=5000):
+    books = make_books(book_count)
+    start = time.perf_counter()
+    index = SuggestIndex.from_books(books)
+    print(f"Built index of {len(index)} books, {len(index.keys)} keys, "
+          f"{len(index.top)} precomputed prefixes in {time.perf_counter() - start:.2f} s")
+
+    rng = random.Random(17)
+    timings = []
+    update_timings = []
+    for i, prefix in enumerate(typed_prefixes(books, query_count)):
+        if i % 10 == 0:
+            # A book being viewed / edited meanwhile
+            book_id, values, weight = rng.choice(books)
+            start = time.perf_counter()
+            index.add(book_id, values, weight + rng.randint(1, 500))
+            update_timings.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        index.suggest(prefix, 8)
+        timings.append(time.perf_counter() - start)
+
+    timings.sort()
+    p50 = statistics.median(timings) * 1000
+    p99 = timings[int(len(timings) * 0.99)] * 1000
+    update_timings.sort()
+    print(f"Lookups: median {p50:.3f} ms, p99 {p99:.3f} ms, max {timings[-1] * 1000:.3f} ms")
+    print(f"Updates: median {statistics.median(update_timings) * 1000:.3f} ms, "
+          f"max {update_timings[-1] * 1000:.3f} ms")
+
+    # Precomputed and incrementally maintained top lists give the same answers as a scan
+    for prefix in typed_prefixes(books, 200, seed=19):
+        expected = brute_force(index, prefix, 8)
+        assert [s.weight for s in index.suggest(prefix, 8)] == expected, f"Wrong suggestions for {prefix!r}"
+    print("Suggestions match a full scan.")
+
+    assert p99 < P99_LIMIT_MS, f"p99 {p99:.3f} ms is over {P99_LIMIT_MS} ms"
+    print(f"SUCCESS: p99 under {P99_LIMIT_MS} ms.")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--books', type=int, default=50000)
+    parser.add_argument('--queries', type=int, default=5000)
+    args = parser.parse_args()
+    test_suggest_latency(args.books, args.queries)
@@ -102,6 +102,7 @@ const Search = () => {
     const [loading, setLoading] = useState(false);
     const [searched, setSearched] = useState(false);
     const [total, setTotal] = useState(0);
+    const [facets, setFacets] = useState({});   // facet -> { value: count }, from the server
 
     const [selectedBook, setSelectedBook] = useState(null);
     const [detailsOpen, setDetailsOpen] = useState(false);
@@ -117,17 +118,28 @@ const Search = () => {
             if (q) params.set('search', q);
             if (dept) params.set('department', dept);
             if (sem) params.set('semester', sem);
+            params.set('facets', 'department,semester,isPremium');
 
             const token = currentUser ? await currentUser.getIdToken() : null;
             const headers = token ? { Authorization: `Bearer ${token}` } : {};
 
             const res = await fetch(`${API_URL}/books/?${params.toString()}`, { headers });
-            const data = await res.json();
+            let data = await res.json();
+            if (q && !(data.books || []).length) {
+                // Nothing matched exactly: retry tolerating typos ("machne lerning")
+                params.set('fuzzy', 'true');
+                const fuzzyRes = await fetch(`${API_URL}/books/?${params.toString()}`, { headers });
+                data = await fuzzyRes.json();
+            }
             setBooks(data.books || []);
             setTotal((data.books || []).length);
+            setFacets(Object.fromEntries(Object.entries(data.facets || {}).map(
+                ([name, values]) => [name, Object.fromEntries(values.map(v => [String(v.value), v.count]))]
+            )));
         } catch (err) {
             console.error('Search error:', err);
             setBooks([]);
+            setFacets({});
         } finally {
             setLoading(false);
         }
@@ -166,6 +178,11 @@ const Search = () => {
     /* ── helpers ── */
     const handleClear = () => { setQuery(''); setDepartment(''); setSemester(''); setType('all'); setSort('latest'); setBooks([]); setSearched(false); };
     const handleBookClick = (book) => { setSelectedBook(book); setDetailsOpen(true); };
+    // " (12)" after a filter option, once results are loaded
+    const facetLabel = (name, value) => {
+        if (!searched || !facets[name]) return '';
+        return ` (${facets[name][String(value)] || 0})`;
+    };
 
     const hasFilters = query || department || semester || type !== 'all' || sort !== 'latest';
 
@@ -238,7 +255,7 @@ const Search = () => {
                                 <Select value={department} label="Department" onChange={e => setDepartment(e.target.value)}
                                     sx={{ color: darkMode ? G.text : 'text.primary', bgcolor: darkMode ? 'rgba(255,255,255,.05)' : 'white' }}>
                                     <MenuItem value=""><em>All Departments</em></MenuItem>
-                                    {DEPARTMENTS.map(d => <MenuItem key={d.code} value={d.code}>{d.name}</MenuItem>)}
+                                    {DEPARTMENTS.map(d => <MenuItem key={d.code} value={d.code}>{d.name}{facetLabel('department', d.code)}</MenuItem>)}
                                 </Select>
                             </FormControl>
                         </Grid>
@@ -248,7 +265,7 @@ const Search = () => {
                                 <Select value={semester} label="Semester" onChange={e => setSemester(e.target.value)}
                                     sx={{ color: darkMode ? G.text : 'text.primary', bgcolor: darkMode ? 'rgba(255,255,255,.05)' : 'white' }}>
                                     <MenuItem value=""><em>All</em></MenuItem>
-                                    {SEMESTERS.map(s => <MenuItem key={s} value={String(s)}>Semester {s}</MenuItem>)}
+                                    {SEMESTERS.map(s => <MenuItem key={s} value={String(s)}>Semester {s}{facetLabel('semester', s)}</MenuItem>)}
                                 </Select>
                             </FormControl>
                         </Grid>
@@ -258,8 +275,8 @@ const Search = () => {
                                 <Select value={type} label="Type" onChange={e => setType(e.target.value)}
                                     sx={{ color: darkMode ? G.text : 'text.primary', bgcolor: darkMode ? 'rgba(255,255,255,.05)' : 'white' }}>
                                     <MenuItem value="all">All Books</MenuItem>
-                                    <MenuItem value="free">🟢 Free Only</MenuItem>
-                                    <MenuItem value="premium">⭐ Premium Only</MenuItem>
+                                    <MenuItem value="free">🟢 Free Only{facetLabel('isPremium', false)}</MenuItem>
+                                    <MenuItem value="premium">⭐ Premium Only{facetLabel('isPremium', true)}</MenuItem>
                                 </Select>
                             </FormControl>
                         </Grid>